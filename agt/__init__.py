@@ -0,0 +1,3 @@
+'''
+AGT gateway services: sampling, storage and database access shared by the scripts and tools.
+'''
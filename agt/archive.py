@@ -0,0 +1,110 @@
+import argparse
+import logging
+import os
+import re
+from datetime import date, timedelta
+from logging import getLogger
+
+from . import codec, timecodes
+from .store import READ_FILES_DIR, day_files, iter_records
+
+_DEFAULT_KEEP_DAYS = 2
+_DAY_FOLDER = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+_LOGGER = getLogger(__name__)
+
+def archive_path(root, day):
+    '''Return the path of the archive of a date string (YYYY-MM-DD)'''
+    return os.path.join(root, day, f'AGT-{day}{codec.ARCHIVE_SUFFIX}')
+
+def archive_day(day, root=READ_FILES_DIR):
+    '''
+    Replace the read files of a closed day with one compressed archive
+
+    The records of the day, including those of an earlier archive, are encoded with
+    agt.codec and written next to the read files. Once the archive is synced and
+    decodes to the same readings, with the same Timestamp, MAC, fields and missing
+    values, the read files and their time indexes are removed.
+    The archive keeps the mtime of the newest read file, so a columnar day compacted
+    from them stays up to date.
+
+    Return (readings, bytes before, bytes after), or None when the day is already archived.
+    Raise ValueError when the readings cannot be archived without loss.
+    '''
+    target = archive_path(root, day)
+    paths = day_files(root, day)
+    if not paths or paths == [target]:
+        return None
+
+    records = [record for path in paths for record in iter_records(path)]
+    data = codec.encode(records)
+    source_bytes = sum(os.path.getsize(path) for path in paths)
+    source_mtime = max(os.path.getmtime(path) for path in paths)
+
+    temp_path = target + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    # Every column and missing value is checked before the read files are removed
+    if codec.read_records(temp_path) != [_stored(record) for record in records]:
+        os.remove(temp_path)
+        raise ValueError('Archive of {} does not decode to its readings'.format(day))
+    os.utime(temp_path, (source_mtime, source_mtime))
+    os.replace(temp_path, target)
+
+    for path in paths:
+        if path == target:
+            continue
+        os.remove(path)
+        index = path + '.idx'
+        if os.path.exists(index):
+            os.remove(index)
+    return len(records), source_bytes, len(data)
+
+def _stored(record):
+    '''Return a reading record as an archive decodes it: a timecode, the MAC and every field, None when missing'''
+    stored = {'Timestamp': timecodes.parse(record['Timestamp']), 'MAC': record['MAC']}
+    stored.update((field, record.get(field)) for field in codec.FIELDS)
+    return stored
+
+def archive(root=READ_FILES_DIR, keep_days=_DEFAULT_KEEP_DAYS, today=None):
+    '''
+    Archive every day older than `keep_days` days that still has plain read files
+
+    Days whose readings cannot be archived are logged and left as they are.
+    Return a dict of date: (readings, bytes before, bytes after) for the archived days.
+    '''
+    today = date.today() if today is None else today
+    last = (today - timedelta(days=keep_days)).isoformat()
+    try:
+        days = sorted(name for name in os.listdir(root) if _DAY_FOLDER.match(name) and name < last)
+    except FileNotFoundError:
+        return {}
+
+    archived = {}
+    for day in days:
+        try:
+            result = archive_day(day, root)
+        except ValueError as exception:
+            _LOGGER.warning('Not archiving %s: %s', day, exception)
+            continue
+        if result is not None:
+            archived[day] = result
+            _LOGGER.info('Archived %d readings of %s, %d bytes to %d', result[0], day, result[1], result[2])
+    return archived
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive the read files of closed days into compressed columns.')
+    parser.add_argument('--keep-days', type=int, default=_DEFAULT_KEEP_DAYS,
+                        help='Leave the read files of the last KEEP_DAYS days as they are')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    archived = archive(keep_days=args.keep_days)
+    before = sum(result[1] for result in archived.values())
+    after = sum(result[2] for result in archived.values())
+    print(f"Archived {len(archived)} days, {before} bytes to {after} bytes")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+import struct
+import zlib
+from logging import getLogger
+
+import numpy as np
+
+from . import timecodes
+
+ARCHIVE_SUFFIX = '.agtz'
+FIELDS = ('Temperature', 'Moisture', 'Light', 'Conductivity')
+
+_MAGIC = b'AGTZ'
+_VERSION = 1
+_ZLIB = 0
+_ZSTD = 1
+_ZSTD_LEVEL = 19
+# magic, version, compression, number of readings
+_HEADER = struct.Struct('<4sBBI')
+# NumPy dtype string, raw length, compressed length
+_COLUMN = struct.Struct('<4sII')
+
+# Temperatures are stored in tenths of a degree, the resolution of the devices
+_TEMPERATURE_SCALE = 10
+_FIELD_DTYPES = {'Temperature': '<i2', 'Moisture': 'u1', 'Light': '<u4', 'Conductivity': '<u2'}
+
+_LOGGER = getLogger(__name__)
+
+def encode(records):
+    '''
+    Encode reading records into the archive format and return its bytes
+
+    The archive stores one compressed column per value, in record order:
+    - Timestamp as delta-of-delta timecodes, which are mostly zero for a fixed cadence
+    - MAC as indexes into a dictionary of the MAC addresses of the archive
+    - Temperature in tenths of a degree, Moisture, Light and Conductivity as integers,
+      with a bit mask of the values that are present
+    Columns are compressed with zstd, or zlib when the zstandard package is missing.
+
+    Raise ValueError for records the format cannot hold without loss, such as records
+    with other keys, a missing Timestamp or MAC, temperatures finer than a tenth or
+    values out of the range of their column.
+    '''
+    columns = set(('Timestamp', 'MAC') + FIELDS)
+    for record in records:
+        if not columns.issuperset(record):
+            raise ValueError('Cannot archive record with keys {}'.format(sorted(set(record) - columns)))
+        if record.get('Timestamp') is None or record.get('MAC') is None:
+            raise ValueError('Cannot archive record without Timestamp or MAC')
+
+    timestamps = timecodes.parse_many([record['Timestamp'] for record in records])
+    # [t0, t1 - 2 t0, (t2 - t1) - (t1 - t0), ...]: two cumulative sums restore the timecodes
+    delta_of_delta = np.diff(np.diff(timestamps, prepend=0), prepend=0)
+    macs, mac_index = np.unique(np.array([record['MAC'] for record in records], dtype='U17'), return_inverse=True)
+
+    arrays = [
+        macs.astype('S17'),
+        mac_index.astype('u1' if len(macs) <= 256 else '<u2'),
+        delta_of_delta[:2].astype('<i8'),
+        _narrow(delta_of_delta[2:]),
+    ]
+    present = []
+    for field in FIELDS:
+        values = [record.get(field) for record in records]
+        mask = np.array([value is not None for value in values], dtype=bool)
+        filled = np.array([0 if value is None else value for value in values], dtype='f8')
+        if field == 'Temperature':
+            scaled = np.round(filled * _TEMPERATURE_SCALE)
+            if np.any(np.abs(scaled - filled * _TEMPERATURE_SCALE) > 1e-6):
+                raise ValueError('Cannot archive temperatures finer than a tenth of a degree')
+            filled = scaled
+        stored = filled.astype(_FIELD_DTYPES[field])
+        if np.any(stored != filled):
+            raise ValueError('Cannot archive {} values outside of {}'.format(field, stored.dtype))
+        arrays.append(stored)
+        present.append(mask)
+    arrays.append(np.packbits(np.array(present)))
+
+    compression, compress = _compressor()
+    parts = [_HEADER.pack(_MAGIC, _VERSION, compression, len(records))]
+    for array in arrays:
+        raw = np.ascontiguousarray(array).tobytes()
+        compressed = compress(raw)
+        parts.append(_COLUMN.pack(array.dtype.str.encode('ascii'), len(raw), len(compressed)))
+        parts.append(compressed)
+    return b''.join(parts)
+
+def decode(data):
+    '''
+    Return (columns, present) decoded from archive bytes
+
+    `columns` maps the column names of the read files to NumPy arrays: Timestamp as
+    int64 timecodes, MAC as strings, Temperature as float64 and the other fields as
+    integers. `present` maps each field to the mask of the values that are not missing.
+    '''
+    magic, version, compression, count = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError('Not a reading archive')
+    decompress = _decompressor(compression)
+
+    arrays = []
+    offset = _HEADER.size
+    while offset < len(data):
+        dtype, raw_length, compressed_length = _COLUMN.unpack_from(data, offset)
+        offset += _COLUMN.size
+        raw = decompress(data[offset:offset + compressed_length], raw_length)
+        offset += compressed_length
+        arrays.append(np.frombuffer(raw, dtype=np.dtype(dtype.rstrip(b'\0').decode('ascii'))))
+
+    macs, mac_index, start, delta_of_delta = arrays[:4]
+    columns = {
+        'Timestamp': np.cumsum(np.cumsum(np.concatenate((start, delta_of_delta.astype(np.int64))))),
+        'MAC': macs.astype('U17')[mac_index],
+    }
+    for field, values in zip(FIELDS, arrays[4:8]):
+        columns[field] = values / _TEMPERATURE_SCALE if field == 'Temperature' else values
+    masks = np.unpackbits(arrays[8], count=len(FIELDS) * count).reshape(len(FIELDS), count).astype(bool)
+    return columns, dict(zip(FIELDS, masks))
+
+def read_columns(path):
+    '''Return (columns, present) of an archive file, see decode()'''
+    with open(path, 'rb') as f:
+        return decode(f.read())
+
+def read_records(path):
+    '''Return the reading records of an archive file, as they were before archiving'''
+    columns, present = read_columns(path)
+    timestamps = columns['Timestamp'].tolist()
+    macs = columns['MAC'].tolist()
+    fields = [(field, columns[field].tolist(), present[field].tolist()) for field in FIELDS]
+    records = []
+    for position, (timestamp, mac) in enumerate(zip(timestamps, macs)):
+        record = {'Timestamp': timestamp, 'MAC': mac}
+        for field, values, mask in fields:
+            if not mask[position]:
+                record[field] = None
+            elif field == 'Temperature':
+                record[field] = round(values[position], 1)
+            else:
+                record[field] = values[position]
+        records.append(record)
+    return records
+
+def _narrow(values):
+    '''Return int64 values in the smallest signed integer type that holds them'''
+    if not len(values):
+        return values.astype('i1')
+    low, high = values.min(), values.max()
+    for dtype in ('i1', '<i2', '<i4'):
+        info = np.iinfo(dtype)
+        if low >= info.min and high <= info.max:
+            return values.astype(dtype)
+    return values.astype('<i8')
+
+def _compressor():
+    '''Return (compression id, compress function), zstd when it is installed'''
+    try:
+        import zstandard
+    except ImportError:
+        _LOGGER.debug('zstandard is not installed, compressing archives with zlib')
+        return _ZLIB, lambda raw: zlib.compress(raw, 9)
+    return _ZSTD, zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compress
+
+def _decompressor(compression):
+    '''Return the function restoring a column from its compressed bytes and raw length'''
+    if compression == _ZSTD:
+        import zstandard
+        decompressor = zstandard.ZstdDecompressor()
+        return lambda compressed, raw_length: decompressor.decompress(compressed, max_output_size=raw_length)
+    if compression == _ZLIB:
+        return lambda compressed, raw_length: zlib.decompress(compressed)
+    raise ValueError('Unknown archive compression {}'.format(compression))
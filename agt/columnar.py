@@ -0,0 +1,250 @@
+import argparse
+import logging
+import os
+import re
+import shutil
+from datetime import datetime, timedelta
+from logging import getLogger
+
+import numpy as np
+
+from . import timecodes
+from .store import READ_FILES_DIR, day_files, iter_records
+
+COLUMNAR_DIR = 'files/columnar'
+COLUMNS = ('Timestamp', 'MAC', 'Temperature', 'Moisture', 'Light', 'Conductivity')
+
+_PART_FILE = 'part-0.parquet'
+_DATE_DIR = re.compile(r'^date=(\d{4}-\d{2}-\d{2})$')
+
+_LOGGER = getLogger(__name__)
+
+def _schema():
+    '''Return the Arrow schema of a partition file'''
+    import pyarrow as pa
+    return pa.schema([
+        ('Timestamp', pa.timestamp(timecodes.UNIT)),
+        ('MAC', pa.string()),
+        ('Temperature', pa.float32()),
+        ('Moisture', pa.uint8()),
+        ('Light', pa.uint32()),
+        ('Conductivity', pa.uint16()),
+    ])
+
+def mac_partition(mac):
+    '''Return the partition folder name of a MAC address'''
+    return 'mac=' + mac.replace(':', '').lower()
+
+def partition_dir(root, date):
+    '''Return the folder holding the partitions of a date string (YYYY-MM-DD)'''
+    return os.path.join(root, 'date=' + date)
+
+def compacted_dates(root=COLUMNAR_DIR):
+    '''Return the compacted dates under root, oldest first'''
+    try:
+        names = os.listdir(root)
+    except FileNotFoundError:
+        return []
+    # Staging folders (date=...tmp, date=...old) left by an interrupted compaction are not days
+    return sorted(match.group(1) for match in map(_DATE_DIR.match, names)
+                  if match and os.path.isdir(os.path.join(root, match.group(0))))
+
+def is_compacted(date, source_root=READ_FILES_DIR, root=COLUMNAR_DIR):
+    '''Return whether the partitions of a date are up to date with its read files'''
+    try:
+        compacted_at = os.path.getmtime(partition_dir(root, date))
+    except FileNotFoundError:
+        return False
+    return all(os.path.getmtime(path) <= compacted_at for path in day_files(source_root, date))
+
+def _table(records):
+    '''Convert reading records into an Arrow table of the partition schema, sorted by time'''
+    import pyarrow as pa
+    timestamps = timecodes.parse_many([record['Timestamp'] for record in records])
+    order = np.argsort(timestamps, kind='stable')
+    records = [records[position] for position in order]
+    schema = _schema()
+    arrays = [pa.array(timestamps[order], type=schema.field('Timestamp').type)]
+    arrays.extend(pa.array([record.get(column) for record in records], type=schema.field(column).type)
+                  for column in COLUMNS[1:])
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+def compact_day(date, source_root=READ_FILES_DIR, root=COLUMNAR_DIR):
+    '''
+    Convert the read files of one day into one Parquet file per MAC address
+
+    The day is written to a temporary folder which then replaces the previous
+    partitions of the day, so readers never see a half written day. Missing sensor
+    values are written as nulls. Return the number of readings written.
+    '''
+    import pyarrow.parquet as pq
+
+    paths = day_files(source_root, date)
+    source_mtime = max(os.path.getmtime(path) for path in paths) if paths else 0
+    records = []
+    skipped = 0
+    for path in paths:
+        for record in iter_records(path):
+            if record.get('Timestamp') is None or record.get('MAC') is None:
+                skipped += 1
+                continue
+            records.append(record)
+    if skipped:
+        _LOGGER.warning('Skipped %d incomplete readings of %s', skipped, date)
+
+    by_mac = {}
+    for record in records:
+        by_mac.setdefault(record['MAC'], []).append(record)
+
+    target = partition_dir(root, date)
+    staging = target + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for mac, mac_records in by_mac.items():
+        mac_dir = os.path.join(staging, mac_partition(mac))
+        os.makedirs(mac_dir)
+        pq.write_table(_table(mac_records), os.path.join(mac_dir, _PART_FILE))
+
+    previous = target + '.old'
+    if os.path.exists(target):
+        os.replace(target, previous)
+    os.replace(staging, target)
+    shutil.rmtree(previous, ignore_errors=True)
+    # Stamp the day with the source time read, so appends made during compaction mark it stale
+    os.utime(target, (source_mtime, source_mtime))
+    return len(records)
+
+def compact(source_root=READ_FILES_DIR, root=COLUMNAR_DIR, force=False):
+    '''
+    Compact every day of the read files that changed since it was last compacted
+
+    Return a dict of date: number of readings for the compacted days.
+    '''
+    try:
+        dates = sorted(name for name in os.listdir(source_root)
+                       if os.path.isdir(os.path.join(source_root, name)))
+    except FileNotFoundError:
+        return {}
+
+    compacted = {}
+    for date in dates:
+        if not day_files(source_root, date):
+            continue
+        if not force and is_compacted(date, source_root, root):
+            continue
+        compacted[date] = compact_day(date, source_root, root)
+        _LOGGER.info('Compacted %d readings of %s', compacted[date], date)
+    return compacted
+
+def partition_files(start=None, end=None, macs=None, root=COLUMNAR_DIR, dates=None):
+    '''
+    Return the partition files that may hold readings between start and end
+
+    `start` and `end` are datetimes or date strings, `macs` restricts the MAC
+    addresses and `dates` the days. Partitions are pruned on their folder names only.
+    '''
+    first = _date_key(start)
+    last = _date_key(end)
+    wanted = None if macs is None else {mac_partition(mac) for mac in macs}
+
+    paths = []
+    for date in compacted_dates(root):
+        if (first is not None and date < first) or (last is not None and date > last):
+            continue
+        if dates is not None and date not in dates:
+            continue
+        day_dir = partition_dir(root, date)
+        for name in sorted(os.listdir(day_dir)):
+            if wanted is not None and name not in wanted:
+                continue
+            path = os.path.join(day_dir, name, _PART_FILE)
+            if os.path.isfile(path):
+                paths.append(path)
+    return paths
+
+def load_table(start=None, end=None, macs=None, columns=None, root=COLUMNAR_DIR, dates=None):
+    '''
+    Return the compacted readings between start and end (inclusive) as an Arrow table
+
+    Only the partitions of the requested days and MAC addresses are opened and
+    only the requested columns are read from them.
+    '''
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    columns = list(COLUMNS if columns is None else columns)
+    filtered = start is not None or end is not None
+    read_columns = columns + ['Timestamp'] if filtered and 'Timestamp' not in columns else columns
+
+    schema = _schema()
+    read_schema = pa.schema([schema.field(column) for column in read_columns])
+    # Days compacted before timestamps were stored in microseconds are cast on read
+    tables = [pq.read_table(path, columns=read_columns).cast(read_schema)
+              for path in partition_files(start, end, macs, root, dates)]
+    if not tables:
+        return pa.schema([schema.field(column) for column in columns]).empty_table()
+    table = pa.concat_tables(tables)
+
+    conditions = []
+    if start is not None:
+        conditions.append(pc.greater_equal(table['Timestamp'], _scalar(_lower_bound(start))))
+    if end is not None:
+        upper, inclusive = _upper_bound(end)
+        compare = pc.less_equal if inclusive else pc.less
+        conditions.append(compare(table['Timestamp'], _scalar(upper)))
+    for condition in conditions:
+        table = table.filter(condition)
+    return table.select(columns)
+
+def load(start=None, end=None, macs=None, columns=None, root=COLUMNAR_DIR):
+    '''Return the compacted readings between start and end (inclusive) as a DataFrame'''
+    data = load_table(start, end, macs, columns, root).to_pandas()
+    if 'Temperature' in data:
+        data['Temperature'] = data['Temperature'].astype('float64').round(1)
+    return data
+
+def _date_key(bound):
+    '''Return the YYYY-MM-DD partition key of a datetime, date or timestamp string'''
+    if bound is None:
+        return None
+    return bound[:10] if isinstance(bound, str) else bound.strftime('%Y-%m-%d')
+
+def _lower_bound(bound):
+    '''Return the first datetime included by a start bound'''
+    if isinstance(bound, str):
+        return datetime.fromisoformat(bound)
+    if not isinstance(bound, datetime):
+        return datetime.combine(bound, datetime.min.time())
+    return bound
+
+def _upper_bound(bound):
+    '''
+    Return (datetime, inclusive) for an end bound
+
+    A bare date includes the whole day, so it becomes an exclusive bound at the next midnight.
+    '''
+    if isinstance(bound, str) and len(bound) == 10:
+        return datetime.strptime(bound, '%Y-%m-%d') + timedelta(days=1), False
+    if isinstance(bound, str):
+        return datetime.fromisoformat(bound), True
+    if not isinstance(bound, datetime):
+        return datetime.combine(bound + timedelta(days=1), datetime.min.time()), False
+    return bound, True
+
+def _scalar(value):
+    '''Return a datetime as an Arrow scalar comparable with the Timestamp column'''
+    import pyarrow as pa
+    return pa.scalar(value, type=pa.timestamp(timecodes.UNIT))
+
+def main():
+    parser = argparse.ArgumentParser(description='Compact the daily read files into the columnar store.')
+    parser.add_argument('--force', action='store_true', help='Recompact days that are already up to date')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    compacted = compact(force=args.force)
+    print(f"Compacted {sum(compacted.values())} readings from {len(compacted)} days into {COLUMNAR_DIR}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import ast
+import configparser
+
+from . import timecodes
+from .db import get_database
+from .loader import READINGS_TABLE
+from .session import SessionArchive
+from .sync import SyncWorker
+from .writer import BackgroundWriter, MySQLSink
+
+CONFIG_FILE = 'setup.cfg'
+
+def load_config(path=CONFIG_FILE):
+    '''Return the parsed setup.cfg'''
+    config = configparser.ConfigParser()
+    config.read(path)
+    return config
+
+def load_device_macs(config):
+    '''Return the list of device MAC addresses from the DEVICE section'''
+    device_macs = ast.literal_eval(config['DEVICE']['macs'])
+    if not isinstance(device_macs, list):
+        raise ValueError('MAC addresses must be in list format')
+    return device_macs
+
+def load_interfaces(config):
+    '''Return the Bluetooth interfaces and connection slots per interface used to read devices'''
+    interfaces = ast.literal_eval(config.get('DEVICE', 'interfaces', fallback='["hci0"]'))
+    connections_per_interface = config.getint('DEVICE', 'connections_per_interface', fallback=1)
+    return interfaces, connections_per_interface
+
+def load_passive_timeout(config):
+    '''Return how long to listen for advertised readings before connecting (0 disables)'''
+    return config.getfloat('DEVICE', 'passive_timeout', fallback=0)
+
+def load_metadata_cache(config):
+    '''Create the firmware/battery metadata cache shared across read cycles'''
+    # flowercare needs bluepy, which the database and report tools do without
+    from flowercare import MetadataCache
+
+    return MetadataCache(
+        ttl=config.getint('CACHE', 'ttl', fallback=86400),
+        path=config.get('CACHE', 'path', fallback='files/cache/metadata.json'),
+        battery_ttl=config.getint('CACHE', 'battery_ttl', fallback=3600)
+    )
+
+def load_session_archive(config):
+    '''Create the session log archive from the rollover and retention limits of the SESSION section'''
+    return SessionArchive(
+        root=config.get('SESSION', 'archive_dir', fallback='files/sessions'),
+        max_bytes=config.getint('SESSION', 'max_bytes', fallback=8 * 1024 * 1024),
+        max_age=config.getfloat('SESSION', 'max_age_hours', fallback=24) * 60 * 60,
+        raw_days=config.getint('SESSION', 'raw_days', fallback=30),
+        hourly_days=config.getint('SESSION', 'hourly_days', fallback=365)
+    )
+
+def load_database(config):
+    '''Return the pooled database of the DB-CONNECT section, shared by the whole process'''
+    return get_database(config)
+
+def load_writer(config, store):
+    '''
+    Create the background writer of the WRITER section around a ReadingStore
+
+    With mysql enabled, readings are also inserted into mysql_table through the
+    connection pool of the process (see load_database()).
+    '''
+    sinks = []
+    if config.getboolean('WRITER', 'mysql', fallback=False):
+        sinks.append(MySQLSink(load_database(config), table=config.get('WRITER', 'mysql_table', fallback=READINGS_TABLE)))
+    return BackgroundWriter(
+        store,
+        sinks=sinks,
+        queue_size=config.getint('WRITER', 'queue_size', fallback=64),
+        batch_size=config.getint('WRITER', 'batch_size', fallback=512),
+        put_timeout=config.getfloat('WRITER', 'put_timeout', fallback=1.0),
+        spill_file=config.get('WRITER', 'spill_file', fallback='files/cache/pending.jsonl')
+    )
+
+def load_sync_worker(config):
+    '''Create the worker streaming the readings of the DEVICE macs into the MySQL table of the SYNC section'''
+    return SyncWorker(
+        load_database(config),
+        table=config.get('SYNC', 'table', fallback=READINGS_TABLE),
+        macs=load_device_macs(config),
+        interval=config.getfloat('SYNC', 'interval', fallback=5.0),
+        batch_size=config.getint('SYNC', 'batch_size', fallback=500),
+        max_backoff=config.getfloat('SYNC', 'max_backoff', fallback=300.0),
+        lookback=int(config.getfloat('SYNC', 'lookback_hours', fallback=24) * timecodes.PER_HOUR)
+    )
@@ -0,0 +1,139 @@
+import argparse
+import logging
+from logging import getLogger
+from threading import Event
+from time import monotonic
+
+from .config import load_config, load_session_archive, load_sync_worker, load_writer
+from .sampler import Sampler
+from .schedule import AdaptiveScheduler
+from .store import ReadingStore
+
+_DEFAULT_INTERVAL = 600
+
+_LOGGER = getLogger(__name__)
+
+class SamplingDaemon(object):
+    '''
+    Samples every configured device on a fixed cadence inside one long-lived process
+
+    Cycles are scheduled against a monotonic clock from the start of the first cycle,
+    so the time a cycle takes does not add up to the interval. If a cycle overruns
+    one or more intervals, the missed ticks are skipped rather than run back to back.
+
+    With an AdaptiveScheduler, each cycle only samples the devices that are due and the
+    daemon sleeps until the next device is due instead of using the fixed interval.
+
+    `store` is anything with append() and close(). from_config() saves through a
+    BackgroundWriter, so a cycle ends when its readings are queued, not when they are on disk.
+
+    A SyncWorker passed as `sync` streams the saved readings to MySQL while run() samples.
+    '''
+
+    def __init__(self, sampler, store, interval=_DEFAULT_INTERVAL, scheduler=None, sync=None):
+        self._sampler = sampler
+        self._store = store
+        self._interval = interval
+        self._scheduler = scheduler
+        self._sync = sync
+        self._stop = Event()
+        self.cycles = 0
+
+    @classmethod
+    def from_config(cls, config=None, interval=_DEFAULT_INTERVAL):
+        '''Create a daemon for the devices configured in setup.cfg'''
+        config = load_config() if config is None else config
+        sampler = Sampler.from_config(config)
+        scheduler = AdaptiveScheduler.from_config(config, sampler.macs, max_interval=interval)
+        store = load_writer(config, ReadingStore(archive=load_session_archive(config)))
+        # With sync enabled, readings reach MySQL within seconds instead of on the next update
+        sync = load_sync_worker(config) if config.getboolean('SYNC', 'enabled', fallback=False) else None
+        return cls(sampler, store, interval=interval, scheduler=scheduler, sync=sync)
+
+    @property
+    def interval(self):
+        '''Return the number of seconds between the start of two cycles'''
+        return self._interval
+
+    def run_once(self, macs=None):
+        '''Run one sample cycle over the given devices (all by default) and return the records handed to the store'''
+        records = self._sampler.sample(macs)
+        self._store.append(records)
+        self.cycles += 1
+        return records
+
+    def run(self, on_cycle=None):
+        '''
+        Run sample cycles until stop() is called
+
+        `on_cycle` is called after each cycle with the saved records and the seconds the
+        cycle took. An exception in a cycle is logged and does not stop the daemon.
+        '''
+        self._stop.clear()
+        next_run = monotonic()
+        if self._sync is not None:
+            self._sync.start()
+        try:
+            while not self._stop.is_set():
+                started = monotonic()
+                macs = None if self._scheduler is None else self._scheduler.due(started)
+                try:
+                    records = self.run_once(macs)
+                except Exception:
+                    _LOGGER.exception('Sample cycle failed')
+                    records = []
+
+                elapsed = monotonic() - started
+                if on_cycle is not None:
+                    on_cycle(records, elapsed)
+
+                if self._scheduler is not None:
+                    self._reschedule(macs, records)
+                    self._stop.wait(self._scheduler.next_due())
+                    continue
+
+                next_run += self._interval
+                now = monotonic()
+                if next_run < now:
+                    missed = int((now - next_run) // self._interval) + 1
+                    _LOGGER.warning('Sample cycle overran the interval, skipping %d cycle(s)', missed)
+                    next_run += missed * self._interval
+
+                _LOGGER.info('Next sample cycle in %.0f seconds', next_run - now)
+                self._stop.wait(next_run - now)
+        finally:
+            self._sampler.close()
+            self._store.close()
+            if self._sync is not None:
+                self._sync.stop(timeout=30)
+
+    def _reschedule(self, macs, records):
+        '''Feed the readings of an adaptive cycle back into the scheduler'''
+        now = monotonic()
+        read_macs = set()
+        for record in records:
+            self._scheduler.update(record['MAC'], record, now)
+            read_macs.add(record['MAC'])
+        for mac in macs:
+            if mac not in read_macs:
+                self._scheduler.missed(mac, now)
+
+    def stop(self):
+        '''Ask the run loop to exit after the current cycle'''
+        self._stop.set()
+
+def main():
+    parser = argparse.ArgumentParser(description='Sample all configured devices on a fixed cadence.')
+    parser.add_argument('--interval', type=int, default=_DEFAULT_INTERVAL, help='Seconds between sample cycles')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    daemon = SamplingDaemon.from_config(interval=args.interval)
+    try:
+        daemon.run(on_cycle=lambda records, elapsed: _LOGGER.info(
+            'Sampled %d readings in %.2f seconds', len(records), elapsed))
+    except KeyboardInterrupt:
+        _LOGGER.info('Sampling stopped after %d cycles', daemon.cycles)
+
+if __name__ == '__main__':
+    main()
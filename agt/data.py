@@ -0,0 +1,157 @@
+import os
+import re
+from logging import getLogger
+
+import numpy as np
+import pandas as pd
+
+from . import codec, timecodes
+from .columnar import (COLUMNAR_DIR, COLUMNS, compacted_dates, is_compacted, load_table,
+                       _date_key, _lower_bound, _upper_bound)
+from .store import READ_FILES_DIR, day_files, iter_records
+from .timeindex import read_range
+
+_DAY_FOLDER = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+_INTEGER_COLUMNS = ('Moisture', 'Light', 'Conductivity')
+
+_LOGGER = getLogger(__name__)
+
+def days(start=None, end=None, root=READ_FILES_DIR, columnar_root=COLUMNAR_DIR):
+    '''
+    Return the days holding readings between start and end (inclusive), oldest first
+
+    Days are found from the day folder names of the read files and of the columnar
+    store, so no file is opened.
+    '''
+    try:
+        names = {name for name in os.listdir(root)
+                 if _DAY_FOLDER.match(name) and os.path.isdir(os.path.join(root, name))}
+    except FileNotFoundError:
+        names = set()
+    names.update(compacted_dates(columnar_root))
+
+    first = _date_key(start)
+    last = _date_key(end)
+    return sorted(name for name in names
+                  if (first is None or name >= first) and (last is None or name <= last))
+
+def latest_date(root=READ_FILES_DIR, columnar_root=COLUMNAR_DIR):
+    '''Return the most recent day with readings, or None'''
+    all_days = days(root=root, columnar_root=columnar_root)
+    return all_days[-1] if all_days else None
+
+def load(start=None, end=None, macs=None, columns=None, root=READ_FILES_DIR, columnar_root=COLUMNAR_DIR):
+    '''
+    Return the readings between start and end (inclusive) as a typed DataFrame
+
+    `start` and `end` are datetimes, dates or timestamp strings (a bare date includes
+    the whole day), `macs` restricts the MAC addresses and `columns` the returned
+    columns. Only the days inside the range are touched. A day is read from the
+    columnar store when it is compacted and up to date, and from its read files otherwise.
+    Rows are sorted by Timestamp.
+    '''
+    columns = list(COLUMNS if columns is None else columns)
+    macs = None if macs is None else set(macs)
+    read_columns = columns if 'Timestamp' in columns else columns + ['Timestamp']
+
+    compacted = []
+    frames = []
+    for date in days(start, end, root, columnar_root):
+        if _columnar_available() and is_compacted(date, root, columnar_root):
+            compacted.append(date)
+        else:
+            frames.append(_typed(_load_read_files(date, start, end, macs, read_columns, root)))
+
+    if compacted:
+        _LOGGER.debug('Reading %d compacted days from %s', len(compacted), columnar_root)
+        table = load_table(start, end, macs, read_columns, columnar_root, dates=set(compacted))
+        frames.append(_typed(table.to_pandas()))
+
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return _typed(pd.DataFrame(columns=columns))
+
+    data = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    data = data.sort_values('Timestamp', kind='stable', ignore_index=True)
+    return data[columns]
+
+def load_arrays(start=None, end=None, macs=None, columns=None, root=READ_FILES_DIR, columnar_root=COLUMNAR_DIR):
+    '''Return the readings of load() as a dict of column name: NumPy array'''
+    data = load(start, end, macs, columns, root, columnar_root)
+    return {column: data[column].to_numpy() for column in data.columns}
+
+def _load_read_files(date, start, end, macs, columns, root):
+    '''Return the readings of one day read from its read files as a DataFrame'''
+    lower = None if start is None else timecodes.from_datetime(_lower_bound(start))
+    upper, inclusive = (None, True) if end is None else _upper_bound(end)
+    upper = None if upper is None else timecodes.from_datetime(upper)
+
+    records = []
+    frames = []
+    for path in day_files(root, date):
+        if path.endswith(codec.ARCHIVE_SUFFIX):
+            frames.append(_load_archive(path, lower, upper, inclusive, macs, columns))
+            continue
+        if path.endswith('.jsonl'):
+            # JSON Lines segments seek through their time index
+            records.extend(read_range(path, lower, upper, inclusive, macs))
+            continue
+        for record in iter_records(path):
+            timestamp = timecodes.parse(record.get('Timestamp'))
+            if timestamp is None:
+                continue
+            if lower is not None and timestamp < lower:
+                continue
+            if upper is not None and (timestamp > upper or (not inclusive and timestamp == upper)):
+                continue
+            if macs is not None and record.get('MAC') not in macs:
+                continue
+            records.append(record)
+    if not frames:
+        return pd.DataFrame.from_records(records, columns=columns)
+    if records:
+        frames.append(pd.DataFrame.from_records(records, columns=columns))
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+def _load_archive(path, lower, upper, inclusive, macs, columns):
+    '''Return the readings of a day archive between the lower and upper timecodes as a DataFrame'''
+    values, present = codec.read_columns(path)
+    timestamps = values['Timestamp']
+    keep = np.ones(len(timestamps), dtype=bool)
+    if lower is not None:
+        keep &= timestamps >= lower
+    if upper is not None:
+        keep &= timestamps <= upper if inclusive else timestamps < upper
+    if macs is not None:
+        keep &= np.isin(values['MAC'], list(macs))
+
+    frame = {}
+    for column in columns:
+        column_values = values[column]
+        if column in present and not present[column].all():
+            column_values = np.where(present[column], column_values, np.nan)
+        frame[column] = column_values[keep]
+    return pd.DataFrame(frame, columns=columns)
+
+def _typed(data):
+    '''Convert the columns of a readings DataFrame to their dtypes'''
+    if 'Timestamp' in data:
+        # Timecodes and legacy timestamp strings are converted in one vectorized pass
+        data['Timestamp'] = pd.to_datetime(timecodes.to_datetime64(data['Timestamp'])).astype('datetime64[ns]')
+    if 'MAC' in data:
+        data['MAC'] = data['MAC'].astype(str)
+    if 'Temperature' in data:
+        data['Temperature'] = pd.to_numeric(data['Temperature']).astype('float64').round(1)
+    for column in _INTEGER_COLUMNS:
+        if column in data:
+            values = pd.to_numeric(data[column])
+            data[column] = values.astype('float64' if values.isna().any() else 'int64')
+    return data
+
+def _columnar_available():
+    '''Return whether pyarrow is installed to read the columnar store'''
+    try:
+        import pyarrow
+    except ImportError:
+        return False
+    return True
@@ -0,0 +1,159 @@
+import time
+from contextlib import contextmanager
+from logging import getLogger
+from threading import Lock
+
+_SECTION = 'DB-CONNECT'
+_SETTINGS = ('host', 'port', 'user', 'password', 'database', 'auth_plugin')
+
+_DEFAULT_POOL_SIZE = 4
+_DEFAULT_RETRIES = 3
+_DEFAULT_BACKOFF = 0.5
+
+_LOGGER = getLogger(__name__)
+
+class Database(object):
+    '''
+    Hands out pooled connections to the AGT MySQL database
+
+    connection() checks a connection out of a mysql.connector pool of `pool_size`
+    connections, and engine() returns a SQLAlchemy engine for pandas. Both are
+    created on first use, so importing a tool costs no connect handshake.
+
+    A checked-out connection is pinged and reconnected if the server dropped it.
+    Connecting is retried `retries` times on transient errors, waiting `backoff`
+    seconds and then twice as long on every further attempt.
+    '''
+
+    def __init__(self, settings, pool_size=_DEFAULT_POOL_SIZE, retries=_DEFAULT_RETRIES, backoff=_DEFAULT_BACKOFF):
+        self._settings = dict(settings)
+        self._pool_size = pool_size
+        self._retries = retries
+        self._backoff = backoff
+        self._pool = None
+        self._engine = None
+        self._lock = Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        '''Create a database from the connection settings of the DB-CONNECT section'''
+        if not config.has_section(_SECTION):
+            raise KeyError('setup.cfg has no [{}] section'.format(_SECTION))
+        settings = {key: config.get(_SECTION, key) for key in _SETTINGS if config.get(_SECTION, key, fallback='')}
+        if 'port' in settings:
+            settings['port'] = int(settings['port'])
+        return cls(
+            settings,
+            pool_size=config.getint(_SECTION, 'pool_size', fallback=_DEFAULT_POOL_SIZE),
+            retries=config.getint(_SECTION, 'retries', fallback=_DEFAULT_RETRIES),
+            backoff=config.getfloat(_SECTION, 'backoff', fallback=_DEFAULT_BACKOFF)
+        )
+
+    @property
+    def name(self):
+        '''Return the name of the database'''
+        return self._settings.get('database')
+
+    @contextmanager
+    def connection(self):
+        '''
+        Yield a healthy pooled connection and return it to the pool afterwards
+
+        The transaction is rolled back when the block raises.
+        '''
+        connection = self._retry(self._checkout)
+        try:
+            yield connection
+        except Exception:
+            try:
+                connection.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            connection.close()
+
+    def engine(self):
+        '''Return the shared SQLAlchemy engine of the database'''
+        with self._lock:
+            if self._engine is None:
+                from sqlalchemy import create_engine
+                from sqlalchemy.engine import URL
+
+                settings = dict(self._settings)
+                url = URL.create('mysql+mysqlconnector', username=settings.pop('user', None),
+                                 password=settings.pop('password', None), host=settings.pop('host', None),
+                                 port=settings.pop('port', None), database=settings.pop('database', None))
+                self._engine = create_engine(url, connect_args=settings, pool_size=self._pool_size,
+                                             pool_pre_ping=True, pool_recycle=3600)
+            return self._engine
+
+    def ping(self):
+        '''Return whether the database can be reached'''
+        try:
+            with self.connection() as connection:
+                return connection.is_connected()
+        except Exception as exception:
+            _LOGGER.warning('Database %s is not reachable: %s', self.name, exception)
+            return False
+
+    def close(self):
+        '''Close the idle connections of the engine; pooled connections close with the process'''
+        with self._lock:
+            if self._engine is not None:
+                self._engine.dispose()
+                self._engine = None
+
+    def _checkout(self):
+        '''Return a connection of the pool, creating the pool on first use'''
+        from mysql.connector import pooling
+
+        with self._lock:
+            if self._pool is None:
+                self._pool = pooling.MySQLConnectionPool(pool_name='agt-{}'.format(id(self)),
+                                                         pool_size=self._pool_size, **self._settings)
+        connection = self._pool.get_connection()
+        try:
+            # Health check: a connection the server closed while it was idle is reopened
+            connection.ping(reconnect=True, attempts=1)
+        except Exception:
+            connection.close()
+            raise
+        return connection
+
+    def _retry(self, function):
+        '''Call function, retrying transient connection errors with exponential backoff'''
+        from mysql.connector import errors
+
+        delay = self._backoff
+        for attempt in range(self._retries + 1):
+            try:
+                return function()
+            except (errors.InterfaceError, errors.OperationalError, errors.PoolError) as exception:
+                if attempt == self._retries:
+                    raise
+                _LOGGER.warning('Connecting to %s failed (%s), retrying in %.1f seconds', self.name, exception, delay)
+                time.sleep(delay)
+                delay *= 2
+
+_database = None
+_database_lock = Lock()
+
+def get_database(config=None):
+    '''Return the database shared by the whole process, configured from setup.cfg on first use'''
+    global _database
+    with _database_lock:
+        if _database is None:
+            if config is None:
+                from .config import load_config
+                config = load_config()
+            _database = Database.from_config(config)
+        return _database
+
+def connection():
+    '''Yield a pooled connection of the shared database, see Database.connection()'''
+    return get_database().connection()
+
+def engine():
+    '''Return the SQLAlchemy engine of the shared database'''
+    return get_database().engine()
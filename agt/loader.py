@@ -0,0 +1,91 @@
+from itertools import islice
+from logging import getLogger
+
+from . import timecodes
+
+READINGS_TABLE = 'AGT_READINGS'
+# Table columns of Timestamp, MAC, Temperature, Moisture, Light and Conductivity
+READINGS_COLUMNS = ('TIMECODE', 'MAC', 'Temperature', 'Moisture', 'Light', 'Conductivity')
+
+_DEFAULT_BATCH_SIZE = 1000
+_UNIQUE_KEY = 'uq_reading'
+
+_LOGGER = getLogger(__name__)
+
+class BulkLoader(object):
+    '''
+    Inserts reading records into a MySQL readings table in batches
+
+    Each batch of `batch_size` records is sent as one multi-row INSERT IGNORE and
+    committed on its own. The table must hold a unique key on its time and MAC
+    columns (see ensure_unique_key()), so readings that are already loaded are
+    skipped by the database instead of being looked up first, and a load that
+    failed halfway can simply be run again.
+
+    `columns` names the table columns of Timestamp, MAC, Temperature, Moisture,
+    Light and Conductivity, in that order.
+    '''
+
+    def __init__(self, connection, table=READINGS_TABLE, columns=READINGS_COLUMNS, batch_size=_DEFAULT_BATCH_SIZE):
+        self._connection = connection
+        self._table = table
+        self._columns = tuple(columns)
+        self._batch_size = batch_size
+        self._sql = 'INSERT IGNORE INTO {} ({}) VALUES ({})'.format(
+            table, ', '.join(self._columns), ', '.join(['%s'] * len(self._columns)))
+
+    def load(self, records):
+        '''
+        Insert reading records, an iterable of any length, and return (inserted, skipped)
+
+        Skipped readings were already in the table.
+        '''
+        inserted = 0
+        total = 0
+        records = iter(records)
+        cursor = self._connection.cursor()
+        try:
+            while True:
+                batch = list(islice(records, self._batch_size))
+                if not batch:
+                    break
+                # mysql.connector sends an executemany INSERT as a single multi-row statement
+                cursor.executemany(self._sql, [_row(record) for record in batch])
+                self._connection.commit()
+                inserted += max(cursor.rowcount, 0)
+                total += len(batch)
+        finally:
+            cursor.close()
+        _LOGGER.debug('Loaded %d of %d readings into %s', inserted, total, self._table)
+        return inserted, total - inserted
+
+    def ensure_unique_key(self):
+        '''
+        Add the unique key on the time and MAC columns when the table has none
+
+        A unique key on (MAC, time), such as the primary key of the partitioned
+        readings table (see agt.schema), counts as well. Return whether the key was
+        added. Fails when the table already holds duplicate readings; they must be
+        removed first.
+        '''
+        cursor = self._connection.cursor()
+        try:
+            cursor.execute(
+                'SELECT INDEX_NAME FROM information_schema.STATISTICS '
+                'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND NON_UNIQUE = 0 '
+                'GROUP BY INDEX_NAME HAVING GROUP_CONCAT(UPPER(COLUMN_NAME) ORDER BY SEQ_IN_INDEX) IN (%s, %s)',
+                (self._table, ','.join(column.upper() for column in self._columns[:2]),
+                 ','.join(column.upper() for column in reversed(self._columns[:2]))))
+            if cursor.fetchall():
+                return False
+            _LOGGER.info('Adding unique key (%s, %s) to %s', self._columns[0], self._columns[1], self._table)
+            cursor.execute('ALTER TABLE {} ADD UNIQUE KEY {} ({}, {})'.format(
+                self._table, _UNIQUE_KEY, self._columns[0], self._columns[1]))
+            return True
+        finally:
+            cursor.close()
+
+def _row(record):
+    '''Return the table row of a reading record'''
+    return (timecodes.to_datetime(timecodes.parse(record['Timestamp'])), record['MAC'], record['Temperature'],
+            record['Moisture'], record['Light'], record['Conductivity'])
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+from logging import getLogger
+
+from . import codec
+from .store import iter_records
+
+MANIFEST_DIR = 'files/cache'
+
+_VERSION = 1
+_CHUNK_SIZE = 1024 * 1024
+
+_LOGGER = getLogger(__name__)
+
+class IngestManifest(object):
+    '''
+    Remembers how far each read file was ingested, so ingestion only reads what is new
+
+    For every file the manifest keeps its size, mtime and inode, the byte offset up
+    to which its records were ingested and the SHA-256 hash of the content up to that
+    offset. A file whose size and mtime did not change is skipped without being
+    opened. A JSON Lines log that grew is read from the offset on, once the hash shows
+    the ingested part is unchanged. A file that was rewritten, and any changed legacy
+    JSON list file, is read again from the start. A day archive holds the records of
+    the files of its day in order, so the records already ingested from those files
+    are skipped and the archive takes over their entries.
+
+    read() returns the new records with the state to mark() once they are stored, so
+    records are never marked as ingested before the caller committed them.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._files = {}
+        try:
+            with open(path, 'r') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            _LOGGER.warning('Ignoring unreadable ingestion manifest %s', path)
+            return
+        if stored.get('version') == _VERSION:
+            self._files = stored['files']
+
+    @classmethod
+    def named(cls, name, directory=MANIFEST_DIR):
+        '''Return the manifest of an ingestion target, stored as <directory>/ingest-<name>.json'''
+        return cls(os.path.join(directory, 'ingest-{}.json'.format(name)))
+
+    def read(self, path):
+        '''
+        Return (records, state) with the records of a read file that were not ingested yet
+
+        `state` is None when the file is unchanged. Pass it to mark() once the records
+        are stored.
+        '''
+        stat = os.stat(path)
+        entry = self._files.get(path)
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            return [], None
+
+        state = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'inode': stat.st_ino}
+        if path.endswith(codec.ARCHIVE_SUFFIX):
+            return self._read_archive(path, entry, state)
+        if not path.endswith('.jsonl'):
+            # A legacy JSON list file is rewritten as a whole, a touch alone leaves its hash unchanged
+            digest = _hash(path, stat.st_size).hexdigest()
+            if entry is not None and entry['hash'] == digest:
+                return [], dict(entry, **state)
+            records = list(iter_records(path))
+            return records, dict(state, offset=stat.st_size, hash=digest, records=len(records))
+
+        offset, ingested, digest = 0, 0, hashlib.sha256()
+        if entry is not None and entry['inode'] == stat.st_ino and entry['offset'] <= stat.st_size:
+            prefix = _hash(path, entry['offset'])
+            if prefix.hexdigest() == entry['hash']:
+                offset, ingested, digest = entry['offset'], entry['records'], prefix
+            else:
+                _LOGGER.info('%s was rewritten, ingesting it from the start', path)
+
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(stat.st_size - offset)
+        # Leave a line that is still being written for the next run
+        data = data[:data.rfind(b'\n') + 1]
+        digest.update(data)
+
+        records = []
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                _LOGGER.warning('Skipping unreadable line of %s', path)
+        return records, dict(state, offset=offset + len(data), hash=digest.hexdigest(),
+                             records=ingested + len(records))
+
+    def mark(self, path, state):
+        '''Record that the records returned by read() with `state` were stored'''
+        if state is None:
+            return
+        state = dict(state)
+        for replaced in state.pop('replaces', ()):
+            self._files.pop(replaced, None)
+        self._files[path] = state
+
+    def records(self, path):
+        '''Return the number of records of a read file marked as ingested'''
+        entry = self._files.get(path)
+        return 0 if entry is None else entry['records']
+
+    def _read_archive(self, path, entry, state):
+        '''Return (records, state) of a day archive, without the records ingested from the files it replaced'''
+        digest = _hash(path, state['size']).hexdigest()
+        if entry is not None and entry['hash'] == digest:
+            return [], dict(entry, **state)
+
+        stem = path[:-len(codec.ARCHIVE_SUFFIX)]
+        replaced = [source for source in (path, stem + '.json', stem + '.jsonl') if source in self._files]
+        ingested = sum(self._files[source]['records'] for source in replaced)
+        records = codec.read_records(path)
+        return records[ingested:], dict(state, offset=state['size'], hash=digest, records=len(records),
+                                        replaces=[source for source in replaced if source != path])
+
+    def save(self):
+        '''Atomically write the manifest'''
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'version': _VERSION, 'files': self._files}, f)
+        os.replace(temp_path, self.path)
+
+def _hash(path, size):
+    '''Return the SHA-256 hash object of the first `size` bytes of a file'''
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while size > 0:
+            chunk = f.read(min(_CHUNK_SIZE, size))
+            if not chunk:
+                break
+            digest.update(chunk)
+            size -= len(chunk)
+    return digest
@@ -0,0 +1,277 @@
+import mmap
+import os
+import struct
+from logging import getLogger
+from threading import Lock
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from . import timecodes
+
+RING_FILE = 'files/cache/sesh.ring'
+
+_DEFAULT_CAPACITY = 8192
+
+_MAGIC = b'AGTRING2'
+# magic, record size, capacity, sequence of the last record written
+_HEADER = struct.Struct('<8sIIQ')
+_HEADER_SIZE = 64
+_SEQUENCE_OFFSET = 16
+
+# One slot of the ring, 48 bytes. `sequence` is the sequence number of the record held
+# in the slot (0 while the slot is empty) and `timestamp` its timecode, the naive local
+# wall-clock time in microseconds since 1970-01-01 like the Timestamp of the read files.
+RING_DTYPE = np.dtype({
+    'names': ['sequence', 'timestamp', 'temperature', 'light', 'conductivity', 'moisture', 'mac'],
+    'formats': ['<u8', '<i8', '<f4', '<u4', '<u2', 'u1', 'S17'],
+    'offsets': [0, 8, 16, 20, 24, 26, 27],
+    'itemsize': 48,
+})
+
+_LOGGER = getLogger(__name__)
+
+class ReadingRing(object):
+    '''
+    Represents the live session window as a fixed-size memory-mapped ring of readings
+
+    The file holds a 64 byte header followed by `capacity` slots of RING_DTYPE. Every
+    appended reading gets the next sequence number and overwrites the oldest slot, and
+    the sequence of the last reading is published in the header after the slot is
+    written. Readers map the file read-only and fetch the readings after the last
+    sequence they saw, so a poll costs the new readings instead of the whole session.
+
+    Only one process writes at a time: appends hold an exclusive lock on the file.
+    '''
+
+    def __init__(self, path=RING_FILE, capacity=_DEFAULT_CAPACITY, writable=False):
+        self.path = path
+        self._writable = writable
+        self._file = None
+        self._map = None
+
+        if writable:
+            self._open_writer(capacity)
+        else:
+            self._open_reader()
+
+        header = _HEADER.unpack_from(self._map, 0) if len(self._map) >= _HEADER_SIZE else (None, 0, 0, 0)
+        magic, record_size, self.capacity, _ = header
+        if (magic != _MAGIC or record_size != RING_DTYPE.itemsize
+                or len(self._map) < _HEADER_SIZE + self.capacity * record_size):
+            self.close()
+            raise ValueError('{} is not a reading ring'.format(path))
+        self._slots = np.frombuffer(self._map, dtype=RING_DTYPE, count=self.capacity, offset=_HEADER_SIZE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def sequence(self):
+        '''Return the sequence number of the last reading written, 0 if none'''
+        return struct.unpack_from('<Q', self._map, _SEQUENCE_OFFSET)[0]
+
+    @property
+    def slots(self):
+        '''Return the zero-copy view of every slot, in slot order'''
+        return self._slots
+
+    def append(self, records):
+        '''Append reading records, overwriting the oldest ones when the ring is full'''
+        if not self._writable:
+            raise ValueError('{} was opened read-only'.format(self.path))
+        if not records:
+            return
+
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        try:
+            # Readings that would be overwritten within this append are skipped but still counted
+            sequence = self.sequence + max(0, len(records) - self.capacity)
+            for record in records[-self.capacity:]:
+                sequence += 1
+                slot = self._slots[sequence % self.capacity]
+                slot['sequence'] = 0
+                slot['timestamp'] = timecodes.parse(record['Timestamp'])
+                slot['mac'] = record['MAC'].encode()
+                slot['temperature'] = record['Temperature'] or 0.0
+                slot['moisture'] = record['Moisture'] or 0
+                slot['light'] = record['Light'] or 0
+                slot['conductivity'] = record['Conductivity'] or 0
+                slot['sequence'] = sequence
+            struct.pack_into('<Q', self._map, _SEQUENCE_OFFSET, sequence)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+
+    def read(self, since=0):
+        '''
+        Return (sequence, readings) with the readings written after sequence `since`
+
+        The readings are a copy of their slots in write order. When more than `capacity`
+        readings were written since `since`, only the newest ones still in the ring are
+        returned. Pass the returned sequence as `since` on the next call.
+        '''
+        sequence = self.sequence
+        first = max(since, sequence - self.capacity) + 1
+        if first > sequence:
+            return sequence, np.empty(0, dtype=RING_DTYPE)
+
+        wanted = np.arange(first, sequence + 1, dtype=np.uint64)
+        positions = wanted % self.capacity
+        # Seqlock: the writer zeroes the sequence of a slot before rewriting it and sets the
+        # new one after, so a copy is whole when the slot held `wanted` before and after it
+        before = self._slots['sequence'][positions]
+        readings = self._slots[positions]
+        after = self._slots['sequence'][positions]
+        readings = readings[(before == wanted) & (after == wanted)]
+        return sequence, readings
+
+    def records(self, since=0):
+        '''Return (sequence, reading records) as read() but as dicts like in the read files'''
+        sequence, readings = self.read(since)
+        return sequence, to_records(readings)
+
+    def close(self):
+        '''Unmap and close the ring file'''
+        self._slots = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open_writer(self, capacity):
+        '''Map the ring file for writing, creating it when it is missing or has another capacity'''
+        size = _HEADER_SIZE + capacity * RING_DTYPE.itemsize
+        if not _is_ring(self.path, capacity, size):
+            _LOGGER.info('Creating reading ring %s with %d slots', self.path, capacity)
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            # Replace the file rather than resizing it, so readers see a new file and reopen it
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, RING_DTYPE.itemsize, capacity, 0))
+                f.truncate(size)
+            os.replace(temp_path, self.path)
+
+        self._file = open(self.path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), size)
+
+    def _open_reader(self):
+        '''Map an existing ring file read-only'''
+        self._file = open(self.path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError('{} is not a reading ring'.format(self.path))
+
+class RingFollower(object):
+    '''
+    Keeps a copy of the readings of a ring up to date for a polling reader
+
+    Each poll() only copies the readings written since the previous poll. The ring
+    is opened on the first poll after it appears and reopened when it is recreated.
+    A follower can be shared by threads, such as the request threads of a web server.
+    '''
+
+    def __init__(self, path=RING_FILE):
+        self._path = path
+        self._ring = None
+        self._inode = None
+        self._sequence = 0
+        self._lock = Lock()
+        self.readings = np.empty(0, dtype=RING_DTYPE)
+
+    def poll(self):
+        '''Fetch the readings written since the last poll and return how many there were'''
+        with self._lock:
+            return self._poll()
+
+    def window(self, seconds):
+        '''Return the readings up to `seconds` before the latest one'''
+        with self._lock:
+            self._poll()
+            readings = self.readings
+        if not len(readings):
+            return readings
+        latest = readings['timestamp'].max()
+        return readings[readings['timestamp'] >= latest - seconds * timecodes.PER_SECOND]
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _poll(self):
+        ring = self._open()
+        if ring is None:
+            return 0
+
+        sequence, new = ring.read(self._sequence)
+        if sequence < self._sequence:
+            # The ring was reset, start over
+            sequence, new = ring.read(0)
+            self.readings = new
+        else:
+            self.readings = np.concatenate((self.readings, new))[-ring.capacity:]
+        self._sequence = sequence
+        return len(new)
+
+    def _close(self):
+        if self._ring is not None:
+            self._ring.close()
+            self._ring = None
+
+    def _open(self):
+        '''Return the ring, or None while the ring file does not exist'''
+        try:
+            inode = os.stat(self._path).st_ino
+        except FileNotFoundError:
+            self._close()
+            return None
+
+        if self._ring is None or inode != self._inode:
+            self._close()
+            try:
+                self._ring = ReadingRing(self._path)
+            except ValueError as exception:
+                _LOGGER.warning('Cannot read %s: %s', self._path, exception)
+                return None
+            self._inode = inode
+            self._sequence = 0
+            self.readings = np.empty(0, dtype=RING_DTYPE)
+        return self._ring
+
+def _is_ring(path, capacity, size):
+    '''Return whether path holds a ring of `capacity` slots'''
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER.size)
+            actual_size = os.fstat(f.fileno()).st_size
+    except FileNotFoundError:
+        return False
+    return (len(header) == _HEADER.size and actual_size == size
+            and _HEADER.unpack(header)[:3] == (_MAGIC, RING_DTYPE.itemsize, capacity))
+
+def to_records(readings):
+    '''Return ring readings as a list of reading records like in the read files'''
+    return [{
+        'Timestamp': int(timestamp),
+        'MAC': mac.decode(),
+        'Temperature': round(float(temperature), 1),
+        'Moisture': int(moisture),
+        'Light': int(light),
+        'Conductivity': int(conductivity)
+    } for timestamp, mac, temperature, moisture, light, conductivity in zip(
+        readings['timestamp'], readings['mac'], readings['temperature'], readings['moisture'],
+        readings['light'], readings['conductivity'])]
@@ -0,0 +1,106 @@
+from bluepy.btle import BTLEDisconnectError, BTLEException
+from logging import getLogger
+
+from flowercare import FlowerCareFleet, FlowerCareScanner
+
+from .config import load_device_macs, load_interfaces, load_metadata_cache, load_passive_timeout
+
+_SCAN_TIMEOUT = 10
+_SCAN_ATTEMPTS = 3
+
+_LOGGER = getLogger(__name__)
+
+class Sampler(object):
+    '''
+    Takes one reading of every configured device per call
+
+    Readings are first collected from the devices' advertisements; devices that were
+    not heard are found with a targeted scan and read over BLE connections. The
+    scanner, fleet and metadata cache are kept between calls.
+    '''
+
+    def __init__(self, macs, interfaces=('hci0',), connections_per_interface=1, cache=None,
+                 passive_timeout=0, scan_timeout=_SCAN_TIMEOUT):
+        self._macs = list(macs)
+        self._passive_timeout = passive_timeout
+        self._scan_timeout = scan_timeout
+        self._scanner = FlowerCareScanner(
+            interface=interfaces[0],
+            callback=lambda device: _LOGGER.debug('Discovered %s', device.addr)
+        )
+        self._fleet = FlowerCareFleet(
+            self._macs,
+            interfaces=interfaces,
+            connections_per_interface=connections_per_interface,
+            cache=cache
+        )
+
+    @classmethod
+    def from_config(cls, config):
+        '''Create a sampler for the devices configured in setup.cfg'''
+        interfaces, connections_per_interface = load_interfaces(config)
+        return cls(
+            load_device_macs(config),
+            interfaces=interfaces,
+            connections_per_interface=connections_per_interface,
+            cache=load_metadata_cache(config),
+            passive_timeout=load_passive_timeout(config)
+        )
+
+    @property
+    def macs(self):
+        '''Return the MAC addresses of the sampled devices'''
+        return list(self._macs)
+
+    def sample(self, macs=None):
+        '''Return a list of reading records, one per device that could be read'''
+        macs = self._macs if macs is None else list(macs)
+        entries = self._listen(macs)
+
+        pending_macs = [mac for mac in macs if mac not in entries]
+        found_macs = self._scan(pending_macs)
+        for mac in pending_macs:
+            if mac not in found_macs:
+                _LOGGER.warning('Device %s not found during scan', mac)
+
+        if found_macs:
+            read_entries, errors = self._fleet.sample(found_macs)
+            entries.update(read_entries)
+
+        return [entries[mac].to_record() for mac in macs if mac in entries]
+
+    def close(self):
+        '''Release the worker pool'''
+        self._fleet.close()
+
+    def _listen(self, macs):
+        '''Collect advertised readings of the given devices'''
+        entries = {}
+        if self._passive_timeout <= 0 or not macs:
+            return entries
+
+        try:
+            for entry in self._scanner.listen(timeout=self._passive_timeout, macs=macs):
+                entries[entry.mac] = entry
+                if len(entries) == len(macs):
+                    break
+        except BTLEException as exception:
+            _LOGGER.warning('Passive listening failed: %s. Falling back to connected reads', exception)
+        return entries
+
+    def _scan(self, macs):
+        '''Return the given devices that can be discovered'''
+        for attempt in range(_SCAN_ATTEMPTS):
+            if not macs:
+                return []
+            try:
+                devices, first_seen = self._scanner.scan_for(macs, timeout=self._scan_timeout)
+            except BTLEDisconnectError as exception:
+                _LOGGER.warning('BTLEDisconnectError occurred: %s. Restarting the scan', exception)
+                continue
+
+            for mac, latency in first_seen.items():
+                if latency is not None:
+                    _LOGGER.info('Discovered %s after %.2f seconds', mac, latency)
+            return [mac for mac in macs if first_seen[mac] is not None]
+        return []
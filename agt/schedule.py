@@ -0,0 +1,153 @@
+import ast
+from logging import getLogger
+from time import monotonic
+
+_FIELDS = ('Temperature', 'Moisture', 'Light', 'Conductivity')
+
+# Fields whose rate of change drives the sampling interval
+_RATE_FIELDS = ('Moisture', 'Temperature')
+
+# Span used to normalize changes when a device has no plant profile
+_DEFAULT_SPANS = {'Temperature': 10.0, 'Moisture': 20.0}
+
+_DEFAULT_MIN_INTERVAL = 60
+_DEFAULT_MAX_INTERVAL = 1800
+_DEFAULT_RESOLUTION = 0.05
+_DEFAULT_BACKOFF = 2.0
+
+_LOGGER = getLogger(__name__)
+
+class PlantProfile(object):
+    '''
+    Represents the sensor limits of a plant profile file (see tools/cherry-tomato)
+
+    The file holds one value per line: days, name, randomness, then baseline, amplitude
+    and period for temperature, moisture, light and conductivity, then the low and high
+    limit of each of the 4 sensors in the same order.
+    '''
+
+    def __init__(self, path):
+        with open(path, 'r') as f:
+            lines = [line.strip() for line in f if line.strip()]
+
+        values = [float(value) for value in lines[3:]]
+        if len(values) < 20:
+            raise ValueError('Plant profile {} has {} values, expected 20'.format(path, len(values)))
+
+        self.name = lines[1]
+        self.limits = {
+            field: (values[12 + 2 * i], values[13 + 2 * i]) for i, field in enumerate(_FIELDS)
+        }
+
+    def span(self, field):
+        '''Return the width of the allowed range of a sensor'''
+        low, high = self.limits[field]
+        return max(high - low, 1e-9)
+
+    def within_limits(self, record, fields=_FIELDS):
+        '''Return whether the `fields` values of a record (all sensors by default) are inside the limits'''
+        return all(low <= record[field] <= high for field, (low, high) in self.limits.items()
+                   if field in fields and record.get(field) is not None)
+
+class AdaptiveScheduler(object):
+    '''
+    Decides when each device is sampled next from how fast its readings change
+
+    After each reading the moisture and temperature change since the previous reading is
+    expressed as a fraction of the plant profile range per second. The next interval is
+    chosen so that a reading moves by about `resolution` of that range between samples:
+    a fast change (e.g. watering) shortens the interval at once, flat readings lengthen
+    it by at most `backoff` times per sample. Readings whose moisture or temperature is
+    outside the profile limits are sampled at the minimum interval; light and
+    conductivity swing outside them every day and do not drive the interval. Intervals
+    stay between min_interval and max_interval.
+    '''
+
+    def __init__(self, macs, profiles=None, min_interval=_DEFAULT_MIN_INTERVAL,
+                 max_interval=_DEFAULT_MAX_INTERVAL, resolution=_DEFAULT_RESOLUTION,
+                 backoff=_DEFAULT_BACKOFF):
+        self._profiles = profiles or {}
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._resolution = resolution
+        self._backoff = backoff
+
+        now = monotonic()
+        self._due = {mac: now for mac in macs}
+        self._intervals = {mac: min_interval for mac in macs}
+        self._last = {}
+
+    @classmethod
+    def from_config(cls, config, macs, max_interval=_DEFAULT_MAX_INTERVAL):
+        '''Create a scheduler from the SCHEDULE section of setup.cfg, or None if it is disabled'''
+        if not config.getboolean('SCHEDULE', 'adaptive', fallback=False):
+            return None
+
+        profile_paths = ast.literal_eval(config.get('SCHEDULE', 'profiles', fallback='{}'))
+        profiles = {mac: PlantProfile(path) for mac, path in profile_paths.items()}
+        return cls(
+            macs,
+            profiles=profiles,
+            min_interval=config.getint('SCHEDULE', 'min_interval', fallback=_DEFAULT_MIN_INTERVAL),
+            max_interval=config.getint('SCHEDULE', 'max_interval', fallback=max_interval),
+            resolution=config.getfloat('SCHEDULE', 'resolution', fallback=_DEFAULT_RESOLUTION),
+            backoff=config.getfloat('SCHEDULE', 'backoff', fallback=_DEFAULT_BACKOFF)
+        )
+
+    def interval(self, mac):
+        '''Return the current sampling interval of a device in seconds'''
+        return self._intervals[mac]
+
+    def due(self, now=None):
+        '''Return the devices that are due for sampling'''
+        now = monotonic() if now is None else now
+        return [mac for mac, due in self._due.items() if due <= now]
+
+    def next_due(self, now=None):
+        '''Return the number of seconds until the next device is due'''
+        now = monotonic() if now is None else now
+        return max(0.0, min(self._due.values()) - now)
+
+    def update(self, mac, record, now=None):
+        '''Record a reading of a device and schedule its next sample'''
+        now = monotonic() if now is None else now
+        interval = self._next_interval(mac, record, now)
+        self._last[mac] = (now, record)
+        self._reschedule(mac, interval, now)
+
+    def missed(self, mac, now=None):
+        '''Schedule the next attempt for a device that could not be read'''
+        now = monotonic() if now is None else now
+        self._reschedule(mac, self._intervals[mac], now)
+
+    def _reschedule(self, mac, interval, now):
+        if interval != self._intervals[mac]:
+            _LOGGER.info('Sampling %s every %.0f seconds', mac, interval)
+        self._intervals[mac] = interval
+        self._due[mac] = now + interval
+
+    def _next_interval(self, mac, record, now):
+        '''Return the interval that keeps the change between two readings near the resolution'''
+        profile = self._profiles.get(mac)
+        if profile is not None and not profile.within_limits(record, _RATE_FIELDS):
+            return self._min_interval
+
+        previous = self._last.get(mac)
+        if previous is None:
+            return self._min_interval
+
+        previous_time, previous_record = previous
+        elapsed = now - previous_time
+        if elapsed <= 0:
+            return self._intervals[mac]
+
+        rate = 0.0
+        for field in _RATE_FIELDS:
+            if record.get(field) is None or previous_record.get(field) is None:
+                continue
+            span = profile.span(field) if profile is not None else _DEFAULT_SPANS[field]
+            rate = max(rate, abs(record[field] - previous_record[field]) / span / elapsed)
+
+        longest = self._intervals[mac] * self._backoff
+        interval = self._resolution / rate if rate > 0 else longest
+        return min(max(min(interval, longest), self._min_interval), self._max_interval)
@@ -0,0 +1,261 @@
+import argparse
+import logging
+from datetime import date, datetime
+from logging import getLogger
+
+from . import timecodes
+from .loader import READINGS_COLUMNS, READINGS_TABLE
+
+# The per-year tables written before the partitioned readings table
+LEGACY_TABLES = ('AGT_2023_SENSOR_READINGS', 'AGT_2024_SENSOR_READINGS')
+
+# SQL of the start of the period of a time column. Without DATE_FORMAT, so the
+# statements hold no % besides their parameters
+PERIODS = {
+    'month': 'DATE_SUB(DATE({0}), INTERVAL DAYOFMONTH({0}) - 1 DAY)',
+    'day': 'DATE({0})',
+    'hour': 'TIMESTAMP(DATE({0}), MAKETIME(HOUR({0}), 0, 0))',
+}
+
+_FIRST_MONTH = date(2023, 1, 1)
+_MONTHS_AHEAD = 3
+_LAST_PARTITION = 'pmax'
+
+_LOGGER = getLogger(__name__)
+
+def create_readings_table(connection, table=READINGS_TABLE, first=_FIRST_MONTH):
+    '''
+    Create the readings table, range partitioned by month, unless it exists
+
+    The primary key (MAC, TIMECODE) keeps the readings of a device together in time
+    order and lets BulkLoader skip readings already loaded. Every partition holds one
+    month, the first also everything before `first`, and pmax everything after the
+    last month; ensure_partitions() splits new months off pmax ahead of time.
+
+    Return whether the table was created.
+    '''
+    if _exists(connection, table):
+        return False
+    months = _months(_month(first), _add_months(_month(date.today()), _MONTHS_AHEAD))
+    partitions = ['PARTITION {} VALUES LESS THAN (\'{}\')'.format(_partition_name(month), _add_months(month, 1))
+                  for month in months]
+    partitions.append('PARTITION {} VALUES LESS THAN (MAXVALUE)'.format(_LAST_PARTITION))
+    cursor = connection.cursor()
+    try:
+        time, mac, temperature, moisture, light, conductivity = READINGS_COLUMNS
+        cursor.execute(
+            f'CREATE TABLE {table} ('
+            f'{time} DATETIME(6) NOT NULL, {mac} CHAR(17) NOT NULL, {temperature} FLOAT NULL, '
+            f'{moisture} TINYINT UNSIGNED NULL, {light} INT UNSIGNED NULL, {conductivity} SMALLINT UNSIGNED NULL, '
+            f'PRIMARY KEY ({mac}, {time}), KEY ix_timecode ({time})'
+            f') PARTITION BY RANGE COLUMNS ({time}) ({", ".join(partitions)})')
+    finally:
+        cursor.close()
+    _LOGGER.info('Created %s with %d monthly partitions', table, len(months))
+    return True
+
+def ensure_partitions(connection, table=READINGS_TABLE, months_ahead=_MONTHS_AHEAD, through=None):
+    '''
+    Split the months up to `months_ahead` months from now (or the month of `through`) off pmax
+
+    Return the names of the added partitions. Tables that are not partitioned by
+    month, such as the legacy tables, are left as they are.
+    '''
+    last = _month(through) if through is not None else _add_months(_month(date.today()), months_ahead)
+    names = partitions(connection, table)
+    months = [_partition_month(name) for name in names if name != _LAST_PARTITION]
+    if _LAST_PARTITION not in names or not months or None in months:
+        return []
+
+    added = _months(_add_months(max(months), 1), last)
+    if not added:
+        return []
+    definitions = ['PARTITION {} VALUES LESS THAN (\'{}\')'.format(_partition_name(month), _add_months(month, 1))
+                   for month in added]
+    definitions.append('PARTITION {} VALUES LESS THAN (MAXVALUE)'.format(_LAST_PARTITION))
+    cursor = connection.cursor()
+    try:
+        cursor.execute('ALTER TABLE {} REORGANIZE PARTITION {} INTO ({})'.format(
+            table, _LAST_PARTITION, ', '.join(definitions)))
+    finally:
+        cursor.close()
+    _LOGGER.info('Added partitions %s to %s', ', '.join(_partition_name(month) for month in added), table)
+    return [_partition_name(month) for month in added]
+
+def ensure_schema(connection, table=READINGS_TABLE):
+    '''Create the readings table when it is missing and keep its partitions ahead of the clock'''
+    create_readings_table(connection, table)
+    ensure_partitions(connection, table)
+
+def partitions(connection, table=READINGS_TABLE):
+    '''Return the partition names of a table in order, an empty list when it is not partitioned'''
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            'SELECT PARTITION_NAME FROM information_schema.PARTITIONS '
+            'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL '
+            'ORDER BY PARTITION_ORDINAL_POSITION', (table,))
+        return [name for name, in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+def migrate(connection, table=READINGS_TABLE, sources=LEGACY_TABLES):
+    '''
+    Copy the readings of the legacy per-year tables into the partitioned readings table
+
+    Readings are copied one month at a time with INSERT IGNORE and committed per
+    month, so an interrupted migration is resumed by running it again and readings
+    in several source tables are stored once. The source tables are left in place.
+
+    Return a dict of source table: readings copied.
+    '''
+    sources = [source for source in sources if _exists(connection, source)]
+    spans = {source: _span(connection, source) for source in sources}
+    firsts = [span[0] for span in spans.values() if span is not None]
+    lasts = [span[1] for span in spans.values() if span is not None]
+    create_readings_table(connection, table, first=min(firsts) if firsts else _FIRST_MONTH)
+    if lasts:
+        ensure_partitions(connection, table, through=max(max(lasts), _add_months(_month(date.today()), _MONTHS_AHEAD)))
+
+    columns = ', '.join(READINGS_COLUMNS)
+    copied = {}
+    cursor = connection.cursor()
+    try:
+        for source in sources:
+            copied[source] = 0
+            if spans[source] is None:
+                continue
+            for month in _months(*spans[source]):
+                cursor.execute(
+                    'INSERT IGNORE INTO {0} ({1}) SELECT {1} FROM {2} WHERE {3} >= %s AND {3} < %s'.format(
+                        table, columns, source, READINGS_COLUMNS[0]),
+                    (month, _add_months(month, 1)))
+                connection.commit()
+                copied[source] += max(cursor.rowcount, 0)
+            _LOGGER.info('Copied %d readings of %s into %s', copied[source], source, table)
+    finally:
+        cursor.close()
+    return copied
+
+def readings_query(table=READINGS_TABLE, start=None, end=None, macs=None):
+    '''
+    Return (sql, params) selecting the readings between start and end, oldest first
+
+    `start` and `end` are timecodes, datetimes or timestamp strings (end excluded).
+    Restricting the time lets MySQL only read the partitions of the months in range.
+    '''
+    where, params = _where(start, end, macs)
+    sql = 'SELECT {} FROM {}{} ORDER BY {}'.format(', '.join(READINGS_COLUMNS), table, where, READINGS_COLUMNS[0])
+    return sql, params
+
+def aggregate_query(period, table=READINGS_TABLE, start=None, end=None, macs=None, per_mac=True):
+    '''
+    Return (sql, params) aggregating the readings between start and end per period, oldest first
+
+    `period` is 'month', 'day' or 'hour'. Each row holds PERIOD, the start of the
+    period, MAC when `per_mac`, Readings, the number of readings, and for every field
+    its mean under the field name and its <field>_min and <field>_max. MySQL groups
+    the readings, so only the aggregated rows are sent, and only the partitions of the
+    months between start and end are read.
+    '''
+    if period not in PERIODS:
+        raise ValueError('Unknown period {}, expected one of {}'.format(period, ', '.join(PERIODS)))
+    time, mac = READINGS_COLUMNS[:2]
+    keys = ['{} AS PERIOD'.format(PERIODS[period].format(time))] + ([mac] if per_mac else [])
+    aggregates = ['COUNT(*) AS Readings']
+    for field in READINGS_COLUMNS[2:]:
+        aggregates.append('AVG({0}) AS {0}, MIN({0}) AS {0}_min, MAX({0}) AS {0}_max'.format(field))
+    groups = ', '.join(['PERIOD'] + ([mac] if per_mac else []))
+    where, params = _where(start, end, macs)
+    sql = 'SELECT {} FROM {}{} GROUP BY {} ORDER BY {}'.format(
+        ', '.join(keys + aggregates), table, where, groups, groups)
+    return sql, params
+
+def _where(start, end, macs):
+    '''Return the WHERE clause and params restricting the readings to start, end and macs'''
+    conditions = []
+    params = []
+    if start is not None:
+        conditions.append('{} >= %s'.format(READINGS_COLUMNS[0]))
+        params.append(timecodes.to_datetime(timecodes.parse(start)))
+    if end is not None:
+        conditions.append('{} < %s'.format(READINGS_COLUMNS[0]))
+        params.append(timecodes.to_datetime(timecodes.parse(end)))
+    if macs:
+        conditions.append('{} IN ({})'.format(READINGS_COLUMNS[1], ', '.join(['%s'] * len(macs))))
+        params.extend(macs)
+    return (' WHERE ' + ' AND '.join(conditions) if conditions else ''), tuple(params)
+
+def _exists(connection, table):
+    '''Return whether a table exists in the current database'''
+    cursor = connection.cursor()
+    try:
+        cursor.execute('SELECT 1 FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                       (table,))
+        return bool(cursor.fetchall())
+    finally:
+        cursor.close()
+
+def _span(connection, table):
+    '''Return the (first, last) month of the readings of a table, None when it is empty'''
+    cursor = connection.cursor()
+    try:
+        cursor.execute('SELECT MIN({0}), MAX({0}) FROM {1}'.format(READINGS_COLUMNS[0], table))
+        first, last = cursor.fetchone()
+    finally:
+        cursor.close()
+    if first is None:
+        return None
+    return _month(first), _month(last)
+
+def _month(value):
+    '''Return the first day of the month of a date or datetime'''
+    return date(value.year, value.month, 1)
+
+def _add_months(month, count):
+    '''Return the first day of the month `count` months after `month`'''
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+def _months(first, last):
+    '''Return the first days of the months from `first` to `last`, both included'''
+    months = []
+    while first <= last:
+        months.append(first)
+        first = _add_months(first, 1)
+    return months
+
+def _partition_name(month):
+    return 'p{:%Y%m}'.format(month)
+
+def _partition_month(name):
+    '''Return the month of a partition name, None for names this module did not create'''
+    try:
+        return _month(datetime.strptime(name, 'p%Y%m'))
+    except ValueError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the partitioned MySQL readings table.')
+    parser.add_argument('command', choices=('create', 'partitions', 'migrate'),
+                        help='create the table, add the partitions of the coming months, '
+                             'or copy the readings of the legacy per-year tables into it')
+    args = parser.parse_args()
+
+    from . import db
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    with db.connection() as connection:
+        if args.command == 'create':
+            ensure_schema(connection)
+            print(f"{READINGS_TABLE} has {len(partitions(connection))} partitions")
+        elif args.command == 'partitions':
+            added = ensure_partitions(connection)
+            print(f"Added {len(added)} partitions to {READINGS_TABLE}")
+        else:
+            copied = migrate(connection)
+            for source, count in copied.items():
+                print(f"{source}: {count} readings copied into {READINGS_TABLE}")
+
+if __name__ == '__main__':
+    main()
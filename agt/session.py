@@ -0,0 +1,261 @@
+import argparse
+import gzip
+import json
+import logging
+import os
+import shutil
+from datetime import datetime, timedelta
+from logging import getLogger
+
+from . import timecodes
+from .store import SESSION_FILE, iter_records
+
+ARCHIVE_DIR = 'files/sessions'
+
+_DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+_DEFAULT_MAX_AGE = 24 * 60 * 60
+_DEFAULT_RAW_DAYS = 30
+_DEFAULT_HOURLY_DAYS = 365
+
+_FIELDS = ('Temperature', 'Moisture', 'Light', 'Conductivity')
+_NAME_FORMAT = '%Y%m%dT%H%M%S'
+_SEGMENT_SUFFIX = '.jsonl.gz'
+_INDEX_SUFFIX = '.idx.json'
+
+_LOGGER = getLogger(__name__)
+
+class SessionArchive(object):
+    '''
+    Rolls the session log over into compressed segments and enforces their retention
+
+    The session log is rolled over once it holds `max_bytes` or its first reading is
+    `max_age` seconds old. It becomes <root>/segments/sesh-<first>-<last>.jsonl.gz
+    next to an index file with its first and last timecode and reading count per MAC.
+
+    Segments older than `raw_days` are downsampled into hourly means in
+    <root>/hourly/<YYYY-MM-DD>.jsonl, and hourly files older than `hourly_days` into
+    daily means in <root>/daily/<YYYY>.jsonl. Aggregates carry a Count so that
+    aggregates of the same period can be merged with weights.
+    '''
+
+    def __init__(self, root=ARCHIVE_DIR, max_bytes=_DEFAULT_MAX_BYTES, max_age=_DEFAULT_MAX_AGE,
+                 raw_days=_DEFAULT_RAW_DAYS, hourly_days=_DEFAULT_HOURLY_DAYS):
+        self._root = root
+        self._max_bytes = max_bytes
+        self._max_age = max_age
+        self._raw_days = raw_days
+        self._hourly_days = hourly_days
+
+    @property
+    def segments_dir(self):
+        return os.path.join(self._root, 'segments')
+
+    @property
+    def hourly_dir(self):
+        return os.path.join(self._root, 'hourly')
+
+    @property
+    def daily_dir(self):
+        return os.path.join(self._root, 'daily')
+
+    def should_roll_over(self, path=SESSION_FILE, now=None):
+        '''Return whether the session log reached its maximum size or age'''
+        try:
+            if os.path.getsize(path) >= self._max_bytes:
+                return True
+        except FileNotFoundError:
+            return False
+
+        first = _first_timestamp(path)
+        if first is None:
+            return False
+        now = datetime.now() if now is None else now
+        return (now - first).total_seconds() >= self._max_age
+
+    def roll_over(self, path=SESSION_FILE):
+        '''
+        Archive the session log as a compressed, indexed segment and return the segment path
+
+        The log is renamed before it is compressed, so writers that append meanwhile
+        start a new session log. Return None when the log is missing or empty.
+        '''
+        rolling_path = path + '.rolling'
+        try:
+            os.replace(path, rolling_path)
+        except FileNotFoundError:
+            return None
+
+        index = {'first': None, 'last': None, 'count': 0, 'macs': {}}
+        for record in iter_records(rolling_path):
+            timestamp = timecodes.parse(record.get('Timestamp'))
+            if timestamp is not None:
+                index['first'] = timestamp if index['first'] is None else min(index['first'], timestamp)
+                index['last'] = timestamp if index['last'] is None else max(index['last'], timestamp)
+            index['count'] += 1
+            mac = record.get('MAC')
+            index['macs'][mac] = index['macs'].get(mac, 0) + 1
+
+        if not index['count']:
+            os.remove(rolling_path)
+            return None
+
+        if not os.path.exists(self.segments_dir):
+            os.makedirs(self.segments_dir)
+        name = 'sesh-{}-{}'.format(_name_time(index['first']), _name_time(index['last']))
+        segment_path = os.path.join(self.segments_dir, name + _SEGMENT_SUFFIX)
+
+        with open(rolling_path, 'rb') as source, gzip.open(segment_path + '.tmp', 'wb') as target:
+            shutil.copyfileobj(source, target)
+        os.replace(segment_path + '.tmp', segment_path)
+        _write_json(os.path.join(self.segments_dir, name + _INDEX_SUFFIX), index)
+        os.remove(rolling_path)
+
+        _LOGGER.info('Rolled %d session readings over into %s', index['count'], segment_path)
+        return segment_path
+
+    def segments(self):
+        '''Return (segment path, index) of every archived segment, oldest first'''
+        try:
+            names = sorted(os.listdir(self.segments_dir))
+        except FileNotFoundError:
+            return []
+
+        segments = []
+        for name in names:
+            if not name.endswith(_INDEX_SUFFIX):
+                continue
+            segment_path = os.path.join(self.segments_dir, name[:-len(_INDEX_SUFFIX)] + _SEGMENT_SUFFIX)
+            if not os.path.exists(segment_path):
+                continue
+            with open(os.path.join(self.segments_dir, name), 'r') as f:
+                segments.append((segment_path, json.load(f)))
+        return segments
+
+    def apply_retention(self, now=None):
+        '''Downsample the segments and hourly files that passed their retention period'''
+        now = datetime.now() if now is None else now
+
+        raw_limit = timecodes.from_datetime(now - timedelta(days=self._raw_days))
+        for segment_path, index in self.segments():
+            if index['last'] is not None and timecodes.parse(index['last']) < raw_limit:
+                self._downsample_segment(segment_path)
+
+        hourly_limit = (now - timedelta(days=self._hourly_days)).strftime('%Y-%m-%d')
+        for name in _list(self.hourly_dir):
+            if name.endswith('.jsonl') and name[:-6] < hourly_limit:
+                self._downsample_hourly(os.path.join(self.hourly_dir, name))
+
+    def _downsample_segment(self, segment_path):
+        '''Replace a segment with hourly aggregates'''
+        aggregates = _aggregate(iter_segment(segment_path), timecodes.PER_HOUR)
+        by_date = {}
+        for aggregate in aggregates:
+            by_date.setdefault(timecodes.date_key(aggregate['Timestamp']), []).append(aggregate)
+        for date, day_aggregates in by_date.items():
+            _append_json_lines(os.path.join(self.hourly_dir, date + '.jsonl'), day_aggregates)
+
+        os.remove(segment_path[:-len(_SEGMENT_SUFFIX)] + _INDEX_SUFFIX)
+        os.remove(segment_path)
+        _LOGGER.info('Downsampled %s into %d hourly aggregates', segment_path, len(aggregates))
+
+    def _downsample_hourly(self, hourly_path):
+        '''Replace an hourly aggregate file with daily aggregates'''
+        aggregates = _aggregate(iter_records(hourly_path), timecodes.PER_DAY)
+        by_year = {}
+        for aggregate in aggregates:
+            by_year.setdefault(timecodes.date_key(aggregate['Timestamp'])[:4], []).append(aggregate)
+        for year, year_aggregates in by_year.items():
+            _append_json_lines(os.path.join(self.daily_dir, year + '.jsonl'), year_aggregates)
+
+        os.remove(hourly_path)
+        _LOGGER.info('Downsampled %s into %d daily aggregates', hourly_path, len(aggregates))
+
+def iter_segment(path):
+    '''Yield the reading records of an archived segment'''
+    with gzip.open(path, 'rt') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def _aggregate(records, period):
+    '''
+    Return the Count-weighted mean of every field per MAC and period
+
+    `period` is the length of a period in microseconds, an aggregate is stamped with
+    the timecode its period starts at. Timecodes count local wall-clock time, so hours
+    and days start on the hour and at midnight. Records that are aggregates
+    themselves are weighted by their Count.
+    '''
+    groups = {}
+    for record in records:
+        timestamp = timecodes.parse(record.get('Timestamp'))
+        if timestamp is None:
+            continue
+        key = (timestamp - timestamp % period, record.get('MAC'))
+        weight = record.get('Count', 1)
+        group = groups.setdefault(key, {'Count': 0, 'sums': {}, 'weights': {}})
+        group['Count'] += weight
+        for field in _FIELDS:
+            if record.get(field) is not None:
+                group['sums'][field] = group['sums'].get(field, 0.0) + record[field] * weight
+                group['weights'][field] = group['weights'].get(field, 0) + weight
+
+    aggregates = []
+    for (start, mac), group in sorted(groups.items(), key=lambda item: (item[0][0], item[0][1] or '')):
+        aggregate = {'Timestamp': start, 'MAC': mac, 'Count': group['Count']}
+        for field in _FIELDS:
+            weight = group['weights'].get(field)
+            aggregate[field] = round(group['sums'][field] / weight, 2) if weight else None
+        aggregates.append(aggregate)
+    return aggregates
+
+def _first_timestamp(path):
+    '''Return the Timestamp of the first record of a JSON Lines file as a datetime, or None'''
+    try:
+        with open(path, 'r') as f:
+            line = f.readline()
+    except FileNotFoundError:
+        return None
+    try:
+        return timecodes.to_datetime(timecodes.parse(json.loads(line)['Timestamp']))
+    except (ValueError, KeyError, TypeError):
+        return None
+
+def _name_time(timecode):
+    return timecodes.to_string(timecode, _NAME_FORMAT)
+
+def _list(directory):
+    try:
+        return sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return []
+
+def _append_json_lines(path, records):
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, 'a') as f:
+        f.write(''.join(json.dumps(record) + '\n' for record in records))
+        f.flush()
+        os.fsync(f.fileno())
+
+def _write_json(path, value):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(value, f)
+    os.replace(temp_path, path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Roll the session log over and apply the retention policy.')
+    parser.add_argument('--roll-over', action='store_true', help='Archive the session log now, whatever its size and age')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    from .config import load_config, load_session_archive
+    archive = load_session_archive(load_config())
+    if args.roll_over or archive.should_roll_over():
+        archive.roll_over()
+    archive.apply_retention()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+import json
+import os
+from logging import getLogger
+from time import monotonic
+
+from . import codec, timecodes
+from .ring import RING_FILE, ReadingRing
+from .timeindex import TimeIndex
+
+READ_FILES_DIR = 'files/read_files'
+SESSION_FILE = 'sesh.jsonl'
+
+_SYNC_EVERY = 64
+_SYNC_INTERVAL = 5.0
+
+_LOGGER = getLogger(__name__)
+
+class ReadingStore(object):
+    '''
+    Saves reading records to the daily read log, the session log and the live ring
+
+    The logs are append-only JSON Lines files, so the cost of saving a cycle does not
+    grow with the amount of data already stored. See ReadingLog and AppendOnlyFile.
+    Live readers follow the ReadingRing instead of parsing the session log.
+    Pass ring_file=None to skip the ring. With a SessionArchive the session log is
+    rolled over and archived once it reaches the size or age limit of the archive.
+    '''
+
+    def __init__(self, root=READ_FILES_DIR, session_file=SESSION_FILE,
+                 sync_every=_SYNC_EVERY, sync_interval=_SYNC_INTERVAL, ring_file=RING_FILE, archive=None):
+        self._daily = ReadingLog(root, sync_every=sync_every, sync_interval=sync_interval)
+        self._session = AppendOnlyFile(session_file, sync_every=sync_every, sync_interval=sync_interval)
+        self._ring = None if ring_file is None else ReadingRing(ring_file, writable=True)
+        self._archive = archive
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def append(self, records):
+        '''Append reading records to the daily read log and the session log'''
+        if not records:
+            return
+        self._daily.append(records)
+        self._session.append(records)
+        if self._ring is not None:
+            self._ring.append(records)
+        if self._archive is not None and self._archive.should_roll_over(self._session.path):
+            self._session.close()
+            self._archive.roll_over(self._session.path)
+            self._archive.apply_retention()
+
+    def close(self):
+        '''Flush pending appends to disk and close the files'''
+        self._daily.close()
+        self._session.close()
+        if self._ring is not None:
+            self._ring.close()
+
+class ReadingLog(object):
+    '''
+    Represents the read files as one append-only log split into daily segments
+
+    A record is appended to the segment of the day of its Timestamp, in
+    <root>/<YYYY-MM-DD>/AGT-<YYYY-MM-DD>.jsonl. When records of a new day arrive the
+    previous segment is synced and closed before the new one is opened, so every
+    record lands in exactly one segment. Each segment keeps a sidecar TimeIndex.
+    '''
+
+    def __init__(self, root=READ_FILES_DIR, sync_every=_SYNC_EVERY, sync_interval=_SYNC_INTERVAL):
+        self._root = root
+        self._sync_every = sync_every
+        self._sync_interval = sync_interval
+        self._segment = None
+
+    def segment_path(self, date):
+        '''Return the path of the segment for a date string (YYYY-MM-DD)'''
+        return segment_path(self._root, date)
+
+    def append(self, records):
+        '''Append reading records to the segments of their days'''
+        days = {}
+        for record in records:
+            days.setdefault(timecodes.date_key(record['Timestamp']), []).append(record)
+
+        for date, day_records in sorted(days.items()):
+            path = self.segment_path(date)
+            if self._segment is None or self._segment.path != path:
+                self._rotate(path)
+            self._segment.append(day_records)
+
+    def close(self):
+        '''Sync and close the active segment'''
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+    def _rotate(self, path):
+        '''Close the active segment and open the segment at `path`'''
+        if self._segment is not None:
+            _LOGGER.info('Rotating read log from %s to %s', self._segment.path, path)
+        self.close()
+        self._segment = AppendOnlyFile(path, sync_every=self._sync_every, sync_interval=self._sync_interval,
+                                       index=True)
+
+class AppendOnlyFile(object):
+    '''
+    Represents a JSON Lines file that is only ever appended to
+
+    Each append is written with a single write call, and the file is fsynced every
+    `sync_every` records or `sync_interval` seconds, whichever comes first, and on close.
+    If the file is removed or replaced by another process it is reopened.
+    With `index` set, a TimeIndex of the file is updated on append and saved on sync.
+    '''
+
+    def __init__(self, path, sync_every=_SYNC_EVERY, sync_interval=_SYNC_INTERVAL, index=False):
+        self.path = path
+        self._sync_every = sync_every
+        self._sync_interval = sync_interval
+        self._indexed = index
+        self._index = None
+        self._fd = None
+        self._pending = 0
+        self._last_sync = monotonic()
+
+    def append(self, records):
+        '''Append records as JSON lines'''
+        if not records:
+            return
+
+        data = ''.join(json.dumps(record) + '\n' for record in records).encode('utf-8')
+        fd = self._open()
+        os.write(fd, data)
+        if self._index is not None:
+            # With O_APPEND the offset after the write is the end of the data just written
+            self._index.extend(data, os.lseek(fd, 0, os.SEEK_CUR) - len(data))
+        self._pending += len(records)
+
+        if self._pending >= self._sync_every or monotonic() - self._last_sync >= self._sync_interval:
+            self.sync()
+
+    def sync(self):
+        '''Flush appended records to disk'''
+        if self._fd is not None and self._pending:
+            os.fsync(self._fd)
+            if self._index is not None:
+                self._index.save()
+        self._pending = 0
+        self._last_sync = monotonic()
+
+    def close(self):
+        '''Sync and close the file'''
+        if self._fd is not None:
+            self.sync()
+            os.close(self._fd)
+            self._fd = None
+
+    def _open(self):
+        '''Return the file descriptor, reopening the file if it was removed or replaced'''
+        if self._fd is not None:
+            try:
+                replaced = os.stat(self.path).st_ino != os.fstat(self._fd).st_ino
+            except FileNotFoundError:
+                replaced = True
+            if not replaced:
+                return self._fd
+            _LOGGER.info('%s was removed or replaced, reopening it', self.path)
+            self.close()
+
+        directory = os.path.dirname(self.path)
+        created = not os.path.exists(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        if created:
+            _sync_directory(directory or '.')
+        if self._indexed:
+            self._index = TimeIndex.load(self.path)
+        return self._fd
+
+def segment_path(root, date):
+    '''Return the path of the read log segment for a date string (YYYY-MM-DD)'''
+    return os.path.join(root, date, f'AGT-{date}.jsonl')
+
+def iter_records(path):
+    '''
+    Yield the reading records of a read file
+
+    Reads JSON Lines segments, the JSON list files written before the append-only
+    log and day archives (see agt.codec). A torn last line left by a crash is skipped.
+    '''
+    if path.endswith(codec.ARCHIVE_SUFFIX):
+        yield from codec.read_records(path)
+        return
+
+    if path.endswith('.json'):
+        with open(path, 'r') as f:
+            try:
+                records = json.load(f)
+            except ValueError as exception:
+                _LOGGER.warning('Skipping unreadable read file %s: %s', path, exception)
+                return
+        yield from (records if isinstance(records, list) else [records])
+        return
+
+    with open(path, 'r') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.endswith('\n'):
+                _LOGGER.warning('Skipping incomplete last line of %s', path)
+                break
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                _LOGGER.warning('Skipping unreadable line %d of %s', line_number, path)
+
+def day_files(root=READ_FILES_DIR, date=None):
+    '''
+    Return the read files of the day folders under root, oldest day first
+
+    Each day yields its archive, any legacy JSON list file and its JSON Lines
+    segment, in that order. Restrict to a single day with a date string (YYYY-MM-DD).
+    '''
+    try:
+        days = sorted(os.listdir(root)) if date is None else [date]
+    except FileNotFoundError:
+        return []
+
+    paths = []
+    for day in days:
+        for extension in (codec.ARCHIVE_SUFFIX, '.json', '.jsonl'):
+            path = os.path.join(root, day, f'AGT-{day}{extension}')
+            if os.path.isfile(path):
+                paths.append(path)
+    return paths
+
+def iter_readings(root=READ_FILES_DIR, date=None):
+    '''Yield every reading record stored under root, oldest day first'''
+    for path in day_files(root, date):
+        yield from iter_records(path)
+
+def _sync_directory(directory):
+    '''Make a newly created file entry durable'''
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,232 @@
+import argparse
+import logging
+import os
+from itertools import islice
+from logging import getLogger
+from threading import Event, Thread
+
+from . import schema, timecodes
+from .loader import READINGS_COLUMNS, READINGS_TABLE, BulkLoader
+from .store import READ_FILES_DIR, day_files, iter_records
+from .timeindex import read_range
+
+WATERMARK_TABLE = 'AGT_SYNC_WATERMARKS'
+
+_DEFAULT_INTERVAL = 5.0
+_DEFAULT_BATCH_SIZE = 500
+_DEFAULT_MAX_BACKOFF = 300.0
+_DEFAULT_LOOKBACK = 24 * timecodes.PER_HOUR
+
+_LOGGER = getLogger(__name__)
+
+class SyncWorker(object):
+    '''
+    Streams the readings of the local store into a MySQL readings table as they are captured
+
+    The database keeps a high watermark per MAC in WATERMARK_TABLE: the timecode of
+    the newest reading of that MAC in `table`. Every `interval` seconds the worker
+    reads the readings newer than the watermarks from the read files, seeking past the
+    synced part of the day's log with its time index, and loads them with a BulkLoader
+    in batches of `batch_size`. The watermarks of a batch are advanced once it is
+    committed, so after a crash or a dropped connection the worker resumes from the
+    watermarks and at worst sends the last batch again, which the database ignores.
+
+    Only the readings of `macs` are synced, every MAC when it is None. The read files
+    are scanned from the oldest watermark of the devices that reported within
+    `lookback` microseconds of the newest synced reading, so a retired or silent
+    sensor does not pin the scan to its last reading. Each device seeks the day's log
+    from its own watermark.
+
+    A failed sync is retried after `interval` seconds, doubled on every further
+    failure up to `max_backoff`. Readings written to the store with a timestamp older
+    than the watermark of their MAC, such as a replayed spill file, are left to
+    files/mini_insert.py.
+    '''
+
+    def __init__(self, database, table=READINGS_TABLE, columns=READINGS_COLUMNS, root=READ_FILES_DIR, macs=None,
+                 interval=_DEFAULT_INTERVAL, batch_size=_DEFAULT_BATCH_SIZE, max_backoff=_DEFAULT_MAX_BACKOFF,
+                 lookback=_DEFAULT_LOOKBACK):
+        self._database = database
+        self._table = table
+        self._columns = tuple(columns)
+        self._root = root
+        self._macs = None if macs is None else set(macs)
+        self._lookback = lookback
+        self._interval = interval
+        self._batch_size = batch_size
+        self._max_backoff = max_backoff
+        self._prepared = False
+        self._stop = Event()
+        self._thread = None
+        self.synced = 0
+
+    def sync_once(self):
+        '''Load the readings captured since the watermarks and return how many were sent'''
+        sent = 0
+        with self._database.connection() as connection:
+            if not self._prepared:
+                self._prepare(connection)
+            watermarks = self._watermarks(connection)
+            loader = BulkLoader(connection, table=self._table, columns=self._columns, batch_size=self._batch_size)
+            # Filter against a copy: the watermarks advance while the records are read
+            records = self._pending(dict(watermarks))
+            while True:
+                batch = list(islice(records, self._batch_size))
+                if not batch:
+                    break
+                loader.load(batch)
+                self._advance(connection, batch, watermarks)
+                sent += len(batch)
+        self.synced += sent
+        return sent
+
+    def run(self):
+        '''Sync every `interval` seconds until stop() is called'''
+        self._stop.clear()
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                sent = self.sync_once()
+            except Exception as exception:
+                failures += 1
+                delay = min(self._interval * 2 ** failures, self._max_backoff)
+                _LOGGER.warning('Sync to %s failed (%s), retrying in %.0f seconds', self._table, exception, delay)
+                self._stop.wait(delay)
+                continue
+            if failures:
+                _LOGGER.info('Sync to %s resumed after %d failed attempt(s)', self._table, failures)
+                failures = 0
+            if sent:
+                _LOGGER.info('Synced %d readings to %s', sent, self._table)
+            self._stop.wait(self._interval)
+
+    def start(self):
+        '''Run the worker on a daemon thread'''
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = Thread(target=self.run, name='agt-sync', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        '''Ask the worker to exit after the current sync and wait up to `timeout` seconds for it'''
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _prepare(self, connection):
+        '''Create the readings and watermark tables and seed the watermarks from the readings already in the table'''
+        schema.ensure_schema(connection, self._table)
+        BulkLoader(connection, table=self._table, columns=self._columns).ensure_unique_key()
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                'CREATE TABLE IF NOT EXISTS {} ('
+                'TABLE_NAME VARCHAR(64) NOT NULL, MAC VARCHAR(17) NOT NULL, TIMECODE BIGINT NOT NULL, '
+                'PRIMARY KEY (TABLE_NAME, MAC))'.format(WATERMARK_TABLE))
+            cursor.execute('SELECT COUNT(*) FROM {} WHERE TABLE_NAME = %s'.format(WATERMARK_TABLE), (self._table,))
+            if not cursor.fetchone()[0]:
+                # Readings loaded before the worker ran, by hand or by mini_insert.py
+                cursor.execute('SELECT {1}, MAX({0}) FROM {2} GROUP BY {1}'.format(
+                    self._columns[0], self._columns[1], self._table))
+                seeds = [(self._table, mac, timecodes.from_datetime(last))
+                         for mac, last in cursor.fetchall() if last is not None]
+                if seeds:
+                    _LOGGER.info('Seeding the sync watermarks of %d devices from %s', len(seeds), self._table)
+                    cursor.executemany(
+                        'INSERT IGNORE INTO {} (TABLE_NAME, MAC, TIMECODE) VALUES (%s, %s, %s)'.format(WATERMARK_TABLE),
+                        seeds)
+            connection.commit()
+        finally:
+            cursor.close()
+        self._prepared = True
+
+    def _watermarks(self, connection):
+        '''Return a dict of MAC: timecode of the newest reading in the table'''
+        cursor = connection.cursor()
+        try:
+            cursor.execute('SELECT MAC, TIMECODE FROM {} WHERE TABLE_NAME = %s'.format(WATERMARK_TABLE), (self._table,))
+            return {mac: timecode for mac, timecode in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+    def _advance(self, connection, batch, watermarks):
+        '''Move the watermarks past a loaded batch'''
+        latest = {}
+        for record in batch:
+            timestamp = timecodes.parse(record['Timestamp'])
+            latest[record['MAC']] = max(latest.get(record['MAC'], timestamp), timestamp)
+        cursor = connection.cursor()
+        try:
+            cursor.executemany(
+                'INSERT INTO {} (TABLE_NAME, MAC, TIMECODE) VALUES (%s, %s, %s) '
+                'ON DUPLICATE KEY UPDATE TIMECODE = GREATEST(TIMECODE, VALUES(TIMECODE))'.format(WATERMARK_TABLE),
+                [(self._table, mac, timestamp) for mac, timestamp in latest.items()])
+            connection.commit()
+        finally:
+            cursor.close()
+        for mac, timestamp in latest.items():
+            watermarks[mac] = max(watermarks.get(mac, timestamp), timestamp)
+
+    def _pending(self, watermarks):
+        '''Yield the records of the read files newer than the watermark of their MAC'''
+        # Devices without a watermark are new, their readings are all after the oldest active one
+        active = self._active(watermarks)
+        start = min(active.values()) if active else None
+        first_day = None if start is None else timecodes.date_key(start)
+        try:
+            days = sorted(name for name in os.listdir(self._root) if first_day is None or name >= first_day)
+        except FileNotFoundError:
+            return
+
+        for day in days:
+            for path in day_files(self._root, day):
+                records = self._read_log(path, start, active) if path.endswith('.jsonl') else iter_records(path)
+                for record in records:
+                    timestamp = timecodes.parse(record.get('Timestamp'))
+                    mac = record.get('MAC')
+                    if timestamp is None or mac is None or (self._macs is not None and mac not in self._macs):
+                        continue
+                    watermark = watermarks.get(mac)
+                    if watermark is None or timestamp > watermark:
+                        yield record
+
+    def _active(self, watermarks):
+        '''Return the watermarks of the synced devices that reported within the lookback of the newest'''
+        if self._macs is not None:
+            watermarks = {mac: watermark for mac, watermark in watermarks.items() if mac in self._macs}
+        if not watermarks:
+            return {}
+        oldest = max(watermarks.values()) - self._lookback
+        return {mac: watermark for mac, watermark in watermarks.items() if watermark >= oldest}
+
+    def _read_log(self, path, start, active):
+        '''Yield the records of a JSON Lines log from the watermark of each active device on'''
+        for mac, watermark in active.items():
+            yield from read_range(path, start=watermark, macs=[mac])
+        if self._macs is not None:
+            others = [mac for mac in self._macs if mac not in active]
+            if others:
+                yield from read_range(path, start=start, macs=others)
+            return
+        for record in read_range(path, start=start):
+            if record.get('MAC') not in active:
+                yield record
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream new readings from the read files into MySQL.')
+    parser.add_argument('--once', action='store_true', help='Sync what is pending and exit')
+    args = parser.parse_args()
+
+    from .config import load_config, load_sync_worker
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    worker = load_sync_worker(load_config())
+    if args.once:
+        print(f"Synced {worker.sync_once()} readings")
+        return
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        _LOGGER.info('Sync stopped after %d readings', worker.synced)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+# Reading times are int64 microseconds since 1970-01-01 of the naive local wall-clock
+# time, so they sort, compare and bucket as plain integers and map one to one onto
+# numpy datetime64[us]. Strings are only produced for display and export.
+UNIT = 'us'
+PER_SECOND = 1000000
+PER_MINUTE = 60 * PER_SECOND
+PER_HOUR = 60 * PER_MINUTE
+PER_DAY = 24 * PER_HOUR
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_EPOCH = datetime(1970, 1, 1)
+
+def now():
+    '''Return the current local wall-clock time as a timecode'''
+    return from_datetime(datetime.now())
+
+def from_datetime(value):
+    '''Return a naive datetime as a timecode'''
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * PER_SECOND + delta.microseconds
+
+def to_datetime(timecode):
+    '''Return a timecode as a naive datetime'''
+    return _EPOCH + timedelta(microseconds=int(timecode))
+
+def parse(value):
+    '''
+    Return a Timestamp value as a timecode
+
+    Timecodes are returned as they are, so records written before timestamps were
+    stored as timecodes (YYYY-MM-DD HH:MM:SS strings) are read like newer ones.
+    Datetimes and dates are converted too. Return None for None.
+    '''
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        return from_datetime(datetime.fromisoformat(value))
+    if isinstance(value, datetime):
+        return from_datetime(value)
+    if isinstance(value, date):
+        return from_datetime(datetime.combine(value, datetime.min.time()))
+    return int(value)
+
+def to_string(timecode, timestamp_format=TIMESTAMP_FORMAT):
+    '''Return a timecode formatted for display'''
+    return to_datetime(timecode).strftime(timestamp_format)
+
+def date_key(value):
+    '''Return the YYYY-MM-DD day of a Timestamp value'''
+    if isinstance(value, str):
+        return value[:10]
+    return (_EPOCH.date() + timedelta(days=parse(value) // PER_DAY)).isoformat()
+
+def to_datetime64(values):
+    '''
+    Return a sequence of Timestamp values as a datetime64[us] array
+
+    Timecodes and timestamp strings may be mixed, missing values become NaT.
+    The conversion is vectorized, there is no per-value parsing in Python.
+    '''
+    # Lists are kept as objects, numpy would otherwise turn timecodes mixed with strings into strings
+    values = np.asarray(values) if hasattr(values, 'dtype') else np.array(values, dtype=object)
+    if values.dtype.kind == 'M':
+        return values.astype('datetime64[us]')
+    if values.dtype.kind in 'iu':
+        return values.astype(np.int64).view('datetime64[us]')
+    return values.astype('datetime64[us]')
+
+def parse_many(values):
+    '''Return a sequence of Timestamp values as an int64 array of timecodes'''
+    return to_datetime64(values).view(np.int64)
+
+def format_many(timecodes, sep=' '):
+    '''Return timecodes as an array of YYYY-MM-DD HH:MM:SS strings, `sep` between date and time'''
+    strings = np.datetime_as_string(to_datetime64(timecodes).astype('datetime64[s]'))
+    return strings if sep == 'T' else np.char.replace(strings, 'T', sep)
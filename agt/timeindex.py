@@ -0,0 +1,191 @@
+import bisect
+import json
+import os
+from logging import getLogger
+
+from . import timecodes
+
+_INDEX_SUFFIX = '.idx'
+_VERSION = 2
+
+# Readers save a rebuilt index once it covers this many bytes the saved index did not
+_SAVE_AFTER = 64 * 1024
+
+_LOGGER = getLogger(__name__)
+
+class TimeIndex(object):
+    '''
+    Represents the sidecar time index of a JSON Lines read log segment
+
+    The index maps each minute (timecode // PER_MINUTE) to the byte offset of the first
+    record of that minute, and keeps the first and last timecode and the record count
+    per MAC. It covers the first `size` bytes of the segment; records appended after
+    that are picked up by catch_up(). The index is stored next to the segment in
+    <segment>.idx and is only a cache: it is rebuilt when it is missing or stale.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.size = 0
+        self.first = None
+        self.last = None
+        self.ordered = True
+        self.macs = {}
+        self.minutes = {}
+        self._keys = []
+        self.loaded_size = 0
+
+    @classmethod
+    def load(cls, path):
+        '''Return the index of a segment, brought up to date with the segment'''
+        index = cls(path)
+        try:
+            with open(index_path(path), 'r') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            stored = None
+        except ValueError:
+            _LOGGER.warning('Rebuilding unreadable time index of %s', path)
+            stored = None
+
+        try:
+            segment = os.stat(path)
+        except FileNotFoundError:
+            return index
+
+        if (stored is not None and stored.get('version') == _VERSION and stored['inode'] == segment.st_ino
+                and stored['size'] <= segment.st_size):
+            index.size = stored['size']
+            index.first = stored['first']
+            index.last = stored['last']
+            index.ordered = stored['ordered']
+            index.macs = stored['macs']
+            index.minutes = {minute: offset for minute, offset in stored['minutes']}
+            index._keys = sorted(index.minutes)
+            index.loaded_size = index.size
+        index.catch_up()
+        return index
+
+    def add(self, record, offset):
+        '''Add a record written at byte `offset` of the segment'''
+        timestamp = timecodes.parse(record.get('Timestamp'))
+        if timestamp is None:
+            return
+        if self.last is not None and timestamp < self.last:
+            self.ordered = False
+
+        minute = timestamp // timecodes.PER_MINUTE
+        if minute not in self.minutes:
+            self.minutes[minute] = offset
+            if self._keys and minute < self._keys[-1]:
+                bisect.insort(self._keys, minute)
+            else:
+                self._keys.append(minute)
+        self.first = timestamp if self.first is None else min(self.first, timestamp)
+        self.last = timestamp if self.last is None else max(self.last, timestamp)
+        mac = record.get('MAC')
+        self.macs[mac] = self.macs.get(mac, 0) + 1
+
+    def extend(self, data, offset):
+        '''Add the JSON lines of `data`, written at byte `offset`, and move the index end past them'''
+        if offset > self.size:
+            self.catch_up(offset)
+        self.size = max(self.size, self._add_lines(data, offset))
+
+    def catch_up(self, end=None):
+        '''Index the complete lines between the end of the index and `end` (the end of the segment by default)'''
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self.size)
+                data = f.read() if end is None else f.read(end - self.size)
+        except FileNotFoundError:
+            return
+        # Leave a line that is still being written for the next catch up
+        data = data[:data.rfind(b'\n') + 1]
+        self.size = self._add_lines(data, self.size)
+
+    def _add_lines(self, data, offset):
+        '''Add the records of the JSON lines in `data` written at byte `offset` and return the end offset'''
+        for line in data.splitlines(keepends=True):
+            if line.strip():
+                try:
+                    self.add(json.loads(line), offset)
+                except ValueError:
+                    pass
+            offset += len(line)
+        return offset
+
+    def offset(self, start):
+        '''Return the byte offset from which the records at or after timecode `start` are found'''
+        if not self.ordered or start is None:
+            return 0
+        position = bisect.bisect_left(self._keys, start // timecodes.PER_MINUTE)
+        if position == len(self._keys):
+            return self.size
+        return self.minutes[self._keys[position]]
+
+    def save(self):
+        '''Atomically write the index next to the segment'''
+        temp_path = index_path(self.path) + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({
+                'version': _VERSION,
+                'inode': os.stat(self.path).st_ino,
+                'size': self.size,
+                'first': self.first,
+                'last': self.last,
+                'ordered': self.ordered,
+                'macs': self.macs,
+                'minutes': sorted(self.minutes.items()),
+            }, f)
+        os.replace(temp_path, index_path(self.path))
+
+def index_path(path):
+    '''Return the path of the time index of a segment'''
+    return path + _INDEX_SUFFIX
+
+def read_range(path, start=None, end=None, inclusive=True, macs=None):
+    '''
+    Yield the records of a JSON Lines segment with a Timestamp between start and end
+
+    `start` and `end` are timecodes and `macs` restricts the MAC addresses. The time
+    index is used to skip the segment when it holds nothing in range, to seek to the
+    first minute of the range and, when the segment is in time order, to stop after it.
+    '''
+    index = TimeIndex.load(path)
+    if index.size - index.loaded_size >= _SAVE_AFTER:
+        try:
+            index.save()
+        except OSError as exception:
+            _LOGGER.debug('Cannot save the time index of %s: %s', path, exception)
+    if index.size == os.path.getsize(path):
+        if index.last is None:
+            return
+        if (start is not None and index.last < start) or (end is not None and index.first > end):
+            return
+        if macs is not None and not any(mac in index.macs for mac in macs):
+            return
+
+    with open(path, 'rb') as f:
+        f.seek(index.offset(start))
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            timestamp = timecodes.parse(record.get('Timestamp'))
+            if timestamp is None:
+                continue
+            if end is not None and (timestamp > end or (not inclusive and timestamp == end)):
+                if index.ordered and f.tell() <= index.size:
+                    return
+                continue
+            if start is not None and timestamp < start:
+                continue
+            if macs is not None and record.get('MAC') not in macs:
+                continue
+            yield record
@@ -0,0 +1,199 @@
+import os
+import queue
+from logging import getLogger
+from threading import Lock, Thread
+
+from .loader import READINGS_TABLE, BulkLoader
+from .store import AppendOnlyFile, iter_records
+
+SPILL_FILE = 'files/cache/pending.jsonl'
+
+_DEFAULT_QUEUE_SIZE = 64
+_DEFAULT_BATCH_SIZE = 512
+_DEFAULT_PUT_TIMEOUT = 1.0
+_DEFAULT_RETRY_INTERVAL = 30.0
+_DEFAULT_CLOSE_TIMEOUT = 30.0
+
+_REPLAY_SUFFIX = '.replay'
+_STOP = object()
+
+_LOGGER = getLogger(__name__)
+
+class BackgroundWriter(object):
+    '''
+    Saves reading records on a background thread, so sampling never waits on storage
+
+    append() puts the records on a bounded in-memory queue and returns. A writer
+    thread takes them off the queue, merges what has piled up into batches of up to
+    `batch_size` records, appends them to the ReadingStore and then hands them to
+    each sink (see MySQLSink).
+
+    The queue holds up to `queue_size` appends. When it is full, append() waits up
+    to `put_timeout` seconds for room and then spills the records to the spill file
+    instead of dropping them. Batches the store fails to save are spilled too. The
+    spill file is fsynced on every append. Its records are written again when the
+    writer starts, every `retry_interval` seconds while the queue is idle, and after
+    a failed write. Readings are written at least once: a crash during a replay can
+    write some of them twice.
+
+    Only the writer thread touches the store and the sinks.
+    '''
+
+    def __init__(self, store, sinks=(), queue_size=_DEFAULT_QUEUE_SIZE, batch_size=_DEFAULT_BATCH_SIZE,
+                 put_timeout=_DEFAULT_PUT_TIMEOUT, spill_file=SPILL_FILE, retry_interval=_DEFAULT_RETRY_INTERVAL):
+        self._store = store
+        self._sinks = list(sinks)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._batch_size = batch_size
+        self._put_timeout = put_timeout
+        self._retry_interval = retry_interval
+        self._spill = AppendOnlyFile(spill_file, sync_every=1)
+        self._spill_lock = Lock()
+        self._thread = Thread(target=self._run, name='agt-writer', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def pending(self):
+        '''Return the number of appends waiting in the queue'''
+        return self._queue.qsize()
+
+    def append(self, records):
+        '''Queue reading records to be saved and return without waiting for I/O'''
+        if not records:
+            return
+        try:
+            self._queue.put(list(records), timeout=self._put_timeout)
+        except queue.Full:
+            _LOGGER.warning('Write queue is full, spilling %d readings to %s', len(records), self._spill.path)
+            self._spill_records(records)
+
+    def flush(self):
+        '''Wait until every queued append was written'''
+        self._queue.join()
+
+    def close(self, timeout=_DEFAULT_CLOSE_TIMEOUT):
+        '''
+        Write the queued readings, stop the writer thread and close the store and sinks
+
+        Appends still queued after `timeout` seconds are spilled, to be written by the next writer.
+        '''
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            spilled = 0
+            while True:
+                try:
+                    records = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if records is not _STOP:
+                    self._spill_records(records)
+                    spilled += len(records)
+            _LOGGER.warning('Writer did not finish within %.0f seconds, spilled %d queued readings',
+                            timeout, spilled)
+        else:
+            self._store.close()
+            for sink in self._sinks:
+                sink.close()
+        with self._spill_lock:
+            self._spill.close()
+
+    def _run(self):
+        '''Write batches until the stop marker is taken off the queue'''
+        self._replay()
+        stopping = False
+        while not stopping:
+            try:
+                records = self._queue.get(timeout=self._retry_interval)
+            except queue.Empty:
+                self._replay()
+                continue
+
+            taken = 1
+            stopping = records is _STOP
+            records = [] if stopping else list(records)
+            # Merge the appends that piled up meanwhile into one write
+            while not stopping and len(records) < self._batch_size:
+                try:
+                    more = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                taken += 1
+                stopping = more is _STOP
+                if not stopping:
+                    records.extend(more)
+
+            if records and self._write(records) and os.path.exists(self._spill.path):
+                self._replay()
+            for _ in range(taken):
+                self._queue.task_done()
+
+    def _write(self, records):
+        '''Save records to the store and the sinks, spilling them if the store fails. Return whether they were saved'''
+        try:
+            self._store.append(records)
+        except Exception:
+            _LOGGER.exception('Saving %d readings failed, spilling them to %s', len(records), self._spill.path)
+            self._spill_records(records)
+            return False
+
+        for sink in self._sinks:
+            try:
+                sink.write(records)
+            except Exception as exception:
+                # The readings are in the read files, the sink can catch up from there
+                _LOGGER.warning('%s could not write %d readings: %s', type(sink).__name__, len(records), exception)
+        return True
+
+    def _replay(self):
+        '''Write the readings of the spill file'''
+        replay_path = self._spill.path + _REPLAY_SUFFIX
+        with self._spill_lock:
+            # A replay file left by a crash during a replay is written before newer spills
+            if not os.path.exists(replay_path):
+                self._spill.close()
+                try:
+                    os.replace(self._spill.path, replay_path)
+                except FileNotFoundError:
+                    return
+
+        records = list(iter_records(replay_path))
+        _LOGGER.info('Writing %d spilled readings from %s', len(records), self._spill.path)
+        for start in range(0, len(records), self._batch_size):
+            # A failed batch is spilled again and retried later
+            self._write(records[start:start + self._batch_size])
+        os.remove(replay_path)
+
+    def _spill_records(self, records):
+        with self._spill_lock:
+            self._spill.append(records)
+
+class MySQLSink(object):
+    '''
+    Inserts reading records into a MySQL table through a BulkLoader
+
+    Every write checks a connection out of the pool of an agt.db.Database, which
+    health-checks it and retries failed connects. Readings already in the table are
+    skipped, so replayed readings are not inserted twice.
+    '''
+
+    def __init__(self, database, table=READINGS_TABLE):
+        self._database = database
+        self._table = table
+
+    def write(self, records):
+        '''Insert records in batches'''
+        with self._database.connection() as connection:
+            BulkLoader(connection, table=self._table).load(records)
+
+    def close(self):
+        self._database.close()
@@ -1,122 +1,67 @@
 import os
-import json
-from json import JSONDecodeError
-import mysql.connector
+import sys
 import datetime
-import configparser
-import cursor
 
-# Read the setup.cfg file
-config = configparser.ConfigParser()
-config.read('setup.cfg')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agt import db
+from agt.manifest import IngestManifest
+from agt.store import day_files
 
 try:
 
-    # Get the keys from the DB-CONNECT section.
-    db_config = config['DB-CONNECT']
-    user = db_config.get('user')
-    password = db_config.get('password')
-    host = db_config.get('host')
-    database = db_config.get('database')
-    auth_plugin = db_config.get('auth_plugin')
-
-    cnx = mysql.connector.connect(
-        user=user, 
-        password=password, 
-        host=host, 
-        database=database,
-        auth_plugin=auth_plugin
-    )
-    if cnx.is_connected():
-        print("")
-        print("/ / SUCCESSFUL CONNECTION / /")
-        
-        # Check if specific tables exist in AGT_DB
-        cursor = cnx.cursor()
-        tables_to_check = ['SENSOR_READINGS', 'JOURNAL', 'METRICS', 'PREDICTIONS']
-        existing_tables = []
-
-        for table_name in tables_to_check:
-            cursor.execute(f"SHOW TABLES LIKE '{table_name}'")
-            result = cursor.fetchone()
-            if result:
-                existing_tables.append(table_name)
+    # Check a connection out of the pool configured in the DB-CONNECT section of setup.cfg
+    with db.connection() as cnx:
+        if cnx.is_connected():
+            print("")
+            print("/ / SUCCESSFUL CONNECTION / /")
+
+            # Check if specific tables exist in AGT_DB
+            cursor = cnx.cursor()
+            tables_to_check = ['SENSOR_READINGS', 'JOURNAL', 'METRICS', 'PREDICTIONS']
+            existing_tables = []
+
+            for table_name in tables_to_check:
+                cursor.execute(f"SHOW TABLES LIKE '{table_name}'")
+                result = cursor.fetchone()
+                if result:
+                    existing_tables.append(table_name)
+                else:
+                    print(f"{table_name} table does not exist in AGT_DB.")
+            cursor.close()
+
+            if existing_tables:
+                print(f"The following tables exist in AGT_DB: {', '.join(existing_tables)}")
             else:
-                print(f"{table_name} table does not exist in AGT_DB.")
+                print("None of the specified tables exist in AGT_DB.")
+                # You can handle this situation as needed
 
-        if existing_tables:
-            print(f"The following tables exist in AGT_DB: {', '.join(existing_tables)}")
+            print("")
         else:
-            print("None of the specified tables exist in AGT_DB.")
-            # You can handle this situation as needed
-        
-        print("")
-    else:
-        print("")
-        print("??? NOT CONNECTED: UNKNOWN ERROR ???")
-        print("")
-except mysql.connector.Error as err:
+            print("")
+            print("??? NOT CONNECTED: UNKNOWN ERROR ???")
+            print("")
+except Exception as err:  # mysql.connector errors, or a missing [DB-CONNECT] section
     print("")
     print("!!!! FAILED TO CONNECT !!!!")
     print("")
     print(f"Error: {err}")
 
 def read_json_files(directory):
-    total_files = 0
-    all_data = []  # List to store consolidated data from all JSON files
-    
-    try:
-        # Get a list of all the subdirectories in the directory
-        subdirectories = next(os.walk(directory))[1]
-    except StopIteration:
-        print(f"No subdirectories found in {directory}")
-        return
-    
-    # Iterate over each subdirectory
-    for subdirectory in subdirectories:
-        # Construct the full path to the subdirectory
-        subdirectory_path = os.path.join(directory, subdirectory)
-
-        # Get a list of all the files in the subdirectory
-        files = os.listdir(subdirectory_path)
-        
-        # List to store data from JSON files within the current subdirectory
-        subdirectory_data = []
-
-        # Iterate over each file
-        for file in files:
-            # Check if the file is a JSON file
-            if file.endswith(".json"):
-                # Construct the full path to the file
-                file_path = os.path.join(subdirectory_path, file)
+    # Count the readings through the ingest manifest: unchanged read files are not
+    # opened and a grown day log is only read from where the last run stopped
+    manifest = IngestManifest.named('db_connect')
+    paths = day_files(directory)
+    for path in paths:
+        _, state = manifest.read(path)
+        manifest.mark(path, state)
+    manifest.save()
+
+    total = sum(manifest.records(path) for path in paths)
+    days = {os.path.basename(os.path.dirname(path)) for path in paths}
 
-                # Open the file and try to load the JSON data
-                with open(file_path, "r") as f:
-                    try:
-                        data = json.load(f)
-                    except JSONDecodeError:
-                        print(f'Failed to parse {file_path}, moving to next file...')
-                        continue
-
-                # Append the data to the list for the current subdirectory
-                subdirectory_data.append(data)
-
-                # Increment the total_files counter
-                total_files += 1
-
-        # Append the data from the current subdirectory to the all_data list
-        all_data.extend(subdirectory_data)
-        
-    # Flatten the nested list using a nested list comprehension
-    all_data = [element for sublist in all_data for element in (sublist if isinstance(sublist, list) else [sublist])]
-    
     print("")
-    # print(all_data)
-    print(f"{len(all_data)} entries found from {len(subdirectories)} days recorded.")
+    print(f"{total} entries found from {len(days)} days recorded.")
     print("")
-
-    # print(subdirectories)
-    
     
 def convert_unix_to_timestamp(unix_time):
     # Convert the Unix time to a datetime object
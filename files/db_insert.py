@@ -1,37 +1,20 @@
 import os
+import sys
 import json
-import mysql.connector
 from datetime import datetime
-import configparser
 
-def convert_timestamp_to_datetime(timestamp_string):
-    dt = datetime.strptime(timestamp_string, '%Y-%m-%d %H:%M:%S')
-    return dt
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agt import db, timecodes
+from agt.loader import BulkLoader
+from agt.manifest import IngestManifest
 
 def insert_check(directory):
     total_files = 0
 
-    # Read the setup.cfg file
-    config = configparser.ConfigParser()
-    config.read('setup.cfg')
-
-    # Get the keys from the DB-CONNECT section.
-    db_config = config['DB-CONNECT']
-    user = db_config.get('user')
-    password = db_config.get('password')
-    host = db_config.get('host')
-    database = db_config.get('database')
-    auth_plugin = db_config.get('auth_plugin')
-
-    cnx = mysql.connector.connect(
-        user=user, 
-        password=password, 
-        host=host, 
-        database=database,
-        auth_plugin=auth_plugin
-    )
-
+    # Only the records not ingested by a previous run are read
+    manifest = IngestManifest.named('db_insert')
     all_data = []
+    file_states = []
 
     try:
         subdirectories = next(os.walk(directory))[1]
@@ -39,24 +22,20 @@ def insert_check(directory):
         print(f"No subdirectories found in {directory}")
         return
 
-    ignored_files = 0  # count of ignored files        
-
     for subdirectory in subdirectories:
         subdirectory_path = os.path.join(directory, subdirectory)
         files = os.listdir(subdirectory_path)
         subdirectory_data = []
 
         for file in files:
-            if file.endswith(".json"):
+            if file.endswith((".json", ".jsonl", ".agtz")):
                 file_path = os.path.join(subdirectory_path, file)
-                try:  # try to load the JSON data
-                    with open(file_path, "r") as f:
-                        data = json.load(f)
-                    subdirectory_data.append(data)
-                    total_files += 1  # increment the total files counter 
-                except json.JSONDecodeError:  # if an error occurs while loading the JSON data
-                    ignored_files += 1  # increment the ignored files counter
-                    print(f'Ignored file: {file_path}')  # print the file path of the ignored file
+                data, state = manifest.read(file_path)
+                if state is None:  # unchanged since the last run
+                    continue
+                subdirectory_data.append(data)
+                file_states.append((subdirectory, file_path, state))
+                total_files += 1  # increment the total files counter 
 
         all_data.extend(subdirectory_data)
 
@@ -66,30 +45,30 @@ def insert_check(directory):
     if answer.lower() == "yes":
         user_date_input = input("Enter the date for which you want to insert data (e.g., 'today' or 'YYYY-MM-DD'): ")
         if user_date_input.lower() == "today":
-            today_date = datetime.datetime.today().strftime('%Y-%m-%d')
-            filtered_data = [item for item in data if 'Timestamp' in item and str(item['Timestamp']).startswith(today_date)]
+            user_date_input = datetime.today().strftime('%Y-%m-%d')
+            filtered_data = [item for item in data if 'Timestamp' in item and timecodes.date_key(item['Timestamp']) == user_date_input]
         elif user_date_input and len(user_date_input) == 10:
-            filtered_data = [item for item in data if 'Timestamp' in item and str(item['Timestamp']).startswith(user_date_input)]
+            filtered_data = [item for item in data if 'Timestamp' in item and timecodes.date_key(item['Timestamp']) == user_date_input]
         else:
             print("Invalid date input. No data will be inserted.")
             return
 
-        for item in filtered_data:
-            item['Timestamp'] = convert_timestamp_to_datetime(item['Timestamp'])
-
         try:
-            cursor = cnx.cursor()
-            query = "INSERT INTO SENSOR_READINGS (TIMESTAMP, MAC, TEMPERATURE, MOISTURE, LIGHT, CONDUCTIVITY) VALUES (%s, %s, %s, %s, %s, %s)"
-            for item in filtered_data:
-                values = (item['Timestamp'], item['MAC'], item['Temperature'], item['Moisture'], item['Light'], item['Conductivity'])
-                cursor.execute(query, values)
-            cnx.commit()
-            print("Data inserted successfully into the database.")
+            # The pooled connection of the DB-CONNECT section is rolled back if the load fails
+            with db.connection() as cnx:
+                # Batched INSERT IGNORE, committed per batch: readings already in the table are skipped
+                loader = BulkLoader(cnx, table='SENSOR_READINGS',
+                                    columns=('TIMESTAMP', 'MAC', 'TEMPERATURE', 'MOISTURE', 'LIGHT', 'CONDUCTIVITY'))
+                loader.ensure_unique_key()
+                inserted, skipped = loader.load(filtered_data)
+            # Only the files of the inserted day count as ingested
+            for subdirectory, file_path, state in file_states:
+                if subdirectory == user_date_input:
+                    manifest.mark(file_path, state)
+            manifest.save()
+            print(f"Data inserted successfully into the database: {inserted} new readings, {skipped} already there.")
         except Exception as e:
             print(f"Error: {e}")
-            cnx.rollback()
-        finally:
-            cnx.close()
 
 directory = "files/read_files/"
 insert_check(directory)
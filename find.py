@@ -23,12 +23,12 @@ while 1:
     print("");
     print("Device Details")
     df_systats = pd.DataFrame
+    real_time_data = device.sample()
     print('Address: {}'.format(device.mac))
-    print('Firmware: {}'.format(device.firmware_version))
-    print('Battery: {}%'.format(device.battery_level))
+    print('Firmware: {}'.format(real_time_data.firmware_version))
+    print('Battery: {}%'.format(real_time_data.battery_level))
     print("");
     print("Sensor Readings")
-    real_time_data = device.real_time_data
     print('Temperature: {}°C'.format(real_time_data.temperature))
     print('Moisture: {}%'.format(real_time_data.moisture))
     print('Light: {} lux'.format(real_time_data.light))
@@ -1,3 +1,7 @@
-from .scanner import FlowerCareScanner
-from .reader import FlowerCare, RealTimeEntry, HistoricalEntry
+from .scanner import FlowerCareScanner, AdvertisementEntry
+from .reader import FlowerCare, FlowerCareConnection, RealTimeEntry, SampleEntry, HistoricalEntry
+from .fleet import FlowerCareFleet
+from .batch import ReadingBatch, READING_DTYPE, decode_real_time, decode_historical
+from .history import HistoryDownloader
+from .cache import MetadataCache
 from .exception import FlowerCareException
@@ -0,0 +1,143 @@
+import numpy as np
+from datetime import datetime
+from time import localtime
+
+_PAYLOAD_SIZE = 16
+
+# Compact in-memory layout of a reading: 36 bytes per record instead of a dict per record
+READING_DTYPE = np.dtype([
+    ('timestamp', 'datetime64[s]'),
+    ('mac', 'S17'),
+    ('temperature', '<f4'),
+    ('moisture', 'u1'),
+    ('light', '<u4'),
+    ('conductivity', '<u2'),
+])
+
+# Raw device payloads, see RealTimeEntry and HistoricalEntry for the byte semantics
+_REAL_TIME_PAYLOAD = np.dtype({
+    'names': ['temperature', 'light', 'moisture', 'conductivity'],
+    'formats': ['<u2', '<u4', 'u1', '<u2'],
+    'offsets': [0, 3, 7, 8],
+    'itemsize': _PAYLOAD_SIZE,
+})
+_HISTORICAL_PAYLOAD = np.dtype({
+    'names': ['epoch_offset', 'temperature', 'light', 'moisture', 'conductivity'],
+    'formats': ['<u4', '<u2', '<u4', 'u1', '<u2'],
+    'offsets': [0, 4, 7, 11, 12],
+    'itemsize': _PAYLOAD_SIZE,
+})
+_LIGHT_24_BIT_MASK = 0xffffff
+
+
+class ReadingBatch(object):
+    '''
+    Represents many readings in one NumPy structured array of READING_DTYPE
+
+    Timestamps are naive local wall-clock times, like the timestamps in the read files.
+    In reading records they are timecodes, integer microseconds since 1970-01-01.
+    '''
+
+    __slots__ = ('array',)
+
+    def __init__(self, array):
+        self.array = array
+
+    def __len__(self):
+        return len(self.array)
+
+    @classmethod
+    def concatenate(cls, batches):
+        '''Return one batch holding the readings of all given batches'''
+        arrays = [batch.array for batch in batches]
+        return cls(np.concatenate(arrays) if arrays else np.empty(0, dtype=READING_DTYPE))
+
+    @classmethod
+    def from_records(cls, records):
+        '''Build a batch from reading records as stored in the read files'''
+        array = np.empty(len(records), dtype=READING_DTYPE)
+        # Timecodes and timestamp strings of older records are converted in one vectorized pass
+        array['timestamp'] = _datetime64([record['Timestamp'] for record in records])
+        array['mac'] = [record['MAC'] for record in records]
+        for field in ('temperature', 'moisture', 'light', 'conductivity'):
+            array[field] = [record[field.capitalize()] for record in records]
+        return cls(array)
+
+    def to_records(self):
+        '''Return the readings as a list of reading records as stored in the read files'''
+        timestamps = self.array['timestamp'].astype('datetime64[us]').view(np.int64).tolist()
+        return [{
+            'Timestamp': timestamp,
+            'MAC': mac.decode(),
+            'Temperature': round(float(temperature), 1),
+            'Moisture': int(moisture),
+            'Light': int(light),
+            'Conductivity': int(conductivity)
+        } for timestamp, mac, temperature, moisture, light, conductivity in zip(
+            timestamps, self.array['mac'], self.array['temperature'], self.array['moisture'],
+            self.array['light'], self.array['conductivity'])]
+
+    def to_dataframe(self):
+        '''Return the readings as a DataFrame with the read file column names'''
+        import pandas as pd
+        return pd.DataFrame({
+            'Timestamp': self.array['timestamp'].astype('datetime64[ns]'),
+            'MAC': self.array['mac'].astype(str),
+            'Temperature': self.array['temperature'].round(1),
+            'Moisture': self.array['moisture'],
+            'Light': self.array['light'],
+            'Conductivity': self.array['conductivity'],
+        })
+
+def _datetime64(timestamps):
+    '''Return timecodes or timestamp strings as a datetime64[s] array'''
+    # An object array keeps timecodes apart from strings, timecodes convert as microsecond counts
+    return np.array(timestamps, dtype=object).astype('datetime64[us]').astype('datetime64[s]')
+
+def _payload_buffer(payloads):
+    '''Return the payloads as one contiguous buffer'''
+    buffer = payloads if isinstance(payloads, (bytes, bytearray, memoryview)) else b''.join(payloads)
+    if len(buffer) % _PAYLOAD_SIZE:
+        raise ValueError('Payload buffer of {} bytes is not a multiple of {}'.format(len(buffer), _PAYLOAD_SIZE))
+    return buffer
+
+def decode_real_time(payloads, mac, timestamp=None):
+    '''
+    Decode raw 16 byte real time payloads of one device into a ReadingBatch
+
+    `payloads` is an iterable of payloads or one buffer of concatenated payloads.
+    All readings get the same timestamp, the current time by default.
+    '''
+    raw = np.frombuffer(_payload_buffer(payloads), dtype=_REAL_TIME_PAYLOAD)
+    array = np.empty(len(raw), dtype=READING_DTYPE)
+    array['timestamp'] = np.datetime64(timestamp if timestamp is not None else datetime.now(), 's')
+    array['mac'] = mac
+    array['temperature'] = raw['temperature'] / 10.0
+    array['moisture'] = raw['moisture']
+    array['light'] = raw['light']
+    array['conductivity'] = raw['conductivity']
+    return ReadingBatch(array)
+
+def decode_historical(payloads, mac, epoch_time):
+    '''
+    Decode raw 16 byte historical payloads of one device into a ReadingBatch
+
+    Timestamps are converted to local time with the UTC offset of each reading, so
+    histories crossing a daylight saving change match HistoricalEntry, and rounded
+    down to the hour like there.
+    '''
+    raw = np.frombuffer(_payload_buffer(payloads), dtype=_HISTORICAL_PAYLOAD)
+    utc_seconds = (epoch_time + raw['epoch_offset'].astype(np.float64)).astype(np.int64)
+    # Readings are hourly, so there are few distinct times to look up
+    distinct, inverse = np.unique(utc_seconds, return_inverse=True)
+    utc_offsets = np.array([localtime(seconds).tm_gmtoff for seconds in distinct.tolist()], dtype=np.int64)
+    local_seconds = utc_seconds + utc_offsets[inverse].reshape(utc_seconds.shape)
+
+    array = np.empty(len(raw), dtype=READING_DTYPE)
+    array['timestamp'] = (local_seconds - local_seconds % 3600).astype('datetime64[s]')
+    array['mac'] = mac
+    array['temperature'] = raw['temperature'] / 10.0
+    array['moisture'] = raw['moisture']
+    array['light'] = raw['light'] & _LIGHT_24_BIT_MASK
+    array['conductivity'] = raw['conductivity']
+    return ReadingBatch(array)
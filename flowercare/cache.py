@@ -0,0 +1,93 @@
+import json
+import os
+from logging import getLogger
+from threading import RLock
+from time import time
+
+_DEFAULT_TTL = 24 * 60 * 60
+_DEFAULT_BATTERY_TTL = 60 * 60
+
+_LOGGER = getLogger(__name__)
+
+class MetadataCache(object):
+    '''
+    Caches Flower Care device metadata (firmware version, battery level, name) per MAC address.
+
+    Every value expires `ttl` seconds after it was stored, except the battery level,
+    which drains and expires after `battery_ttl` seconds. When `path` is given the cache
+    is loaded from and saved to that JSON file, so it survives the reading process being
+    restarted between sample cycles.
+    '''
+
+    def __init__(self, ttl=_DEFAULT_TTL, path=None, battery_ttl=_DEFAULT_BATTERY_TTL):
+        self._ttl = ttl
+        self._ttls = {'battery_level': min(battery_ttl, ttl)}
+        self._path = path
+        self._lock = RLock()
+        self._entries = {}
+        if path is not None:
+            self._load()
+
+    @property
+    def ttl(self):
+        '''Return the number of seconds a cached value stays valid'''
+        return self._ttl
+
+    @property
+    def battery_ttl(self):
+        '''Return the number of seconds a cached battery level stays valid'''
+        return self._ttls['battery_level']
+
+    def get(self, mac):
+        '''Return a dict of the unexpired metadata values for the given MAC address'''
+        now = time()
+        with self._lock:
+            entry = self._entries.get(mac.lower(), {})
+            return {key: value for key, (value, updated) in entry.items()
+                    if now - updated <= self._ttls.get(key, self._ttl)}
+
+    def update(self, mac, values):
+        '''Store metadata values for the given MAC address'''
+        now = time()
+        with self._lock:
+            entry = self._entries.setdefault(mac.lower(), {})
+            for key, value in values.items():
+                entry[key] = (value, now)
+            self._save()
+
+    def invalidate(self, mac=None):
+        '''Drop the cached values of one MAC address, or of all devices'''
+        with self._lock:
+            if mac is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(mac.lower(), None)
+            self._save()
+
+    def _load(self):
+        '''Load the cache file if it exists'''
+        try:
+            with open(self._path, 'r') as f:
+                raw_entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (ValueError, OSError) as exception:
+            _LOGGER.warning('Ignoring unreadable metadata cache %s: %s', self._path, exception)
+            return
+
+        for mac, entry in raw_entries.items():
+            self._entries[mac] = {key: tuple(value) for key, value in entry.items()}
+
+    def _save(self):
+        '''Atomically write the cache file, if persistence is enabled'''
+        if self._path is None:
+            return
+
+        directory = os.path.dirname(self._path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        temp_path = self._path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self._entries, f)
+        os.replace(temp_path, self._path)
@@ -0,0 +1,84 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from threading import BoundedSemaphore
+
+from .reader import FlowerCare
+
+_LOGGER = getLogger(__name__)
+
+class FlowerCareFleet(object):
+    '''
+    Reads a set of Xiaomi Flower Care devices concurrently
+
+    Devices are pinned round-robin to the given Bluetooth interfaces. Each interface
+    holds at most `connections_per_interface` connections at a time, and the worker
+    pool is sized to the total number of connection slots across all interfaces.
+    '''
+
+    def __init__(self, macs=(), interfaces=('hci0',), connections_per_interface=1, cache=None):
+        if not interfaces:
+            raise ValueError('At least one Bluetooth interface is required')
+
+        self._interfaces = list(interfaces)
+        self._cache = cache
+        self._slots = {
+            interface: BoundedSemaphore(connections_per_interface) for interface in self._interfaces
+        }
+        self._devices = OrderedDict()
+        for mac in macs:
+            self._device(mac)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self._interfaces) * connections_per_interface,
+            thread_name_prefix='flowercare')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def devices(self):
+        '''Return the devices of the fleet'''
+        return list(self._devices.values())
+
+    def sample(self, macs=None):
+        '''
+        Take a snapshot of every device concurrently
+
+        Return a tuple (entries, errors) of ordered dicts keyed by MAC address, holding
+        the SampleEntry of each device that was read and the exception of each that failed.
+        '''
+        macs = list(self._devices) if macs is None else list(macs)
+        futures = OrderedDict(
+            (mac, self._executor.submit(self._sample_device, self._device(mac))) for mac in macs
+        )
+
+        entries, errors = OrderedDict(), OrderedDict()
+        for mac, future in futures.items():
+            try:
+                entries[mac] = future.result()
+            except Exception as exception:
+                _LOGGER.error('Could not read device %s: %s', mac, exception)
+                errors[mac] = exception
+        return entries, errors
+
+    def close(self):
+        '''Stop the worker pool'''
+        self._executor.shutdown(wait=True)
+
+    def _device(self, mac):
+        '''Return the device for a MAC address, assigning it to the next interface if new'''
+        device = self._devices.get(mac)
+        if device is None:
+            interface = self._interfaces[len(self._devices) % len(self._interfaces)]
+            device = FlowerCare(mac=mac, interface=interface, cache=self._cache)
+            self._devices[mac] = device
+        return device
+
+    def _sample_device(self, device):
+        '''Sample one device while holding a connection slot on its interface'''
+        with self._slots[device.interface]:
+            return device.sample()
@@ -0,0 +1,148 @@
+import json
+import os
+from contextlib import closing
+from logging import getLogger
+
+from .batch import decode_historical
+from .reader import HistoricalEntry
+
+_DEFAULT_CHECKPOINT = 'files/cache/history.json'
+_CHECKPOINT_EVERY = 16
+_ENTRY_RETRIES = 3
+_BATCH_SIZE = 256
+
+_LOGGER = getLogger(__name__)
+
+class HistoryDownloader(object):
+    '''
+    Downloads the on-device history of a Flower Care over a single connection
+
+    Entries are streamed one by one instead of being collected in a list. The index of
+    the next entry to read is checkpointed per MAC address, so an interrupted transfer
+    resumes where it stopped the next time the downloader runs.
+    '''
+
+    def __init__(self, device, checkpoint_path=_DEFAULT_CHECKPOINT,
+                 checkpoint_every=_CHECKPOINT_EVERY, retries=_ENTRY_RETRIES):
+        self._device = device
+        self._checkpoint_path = checkpoint_path
+        self._checkpoint_every = checkpoint_every
+        self._retries = retries
+        self._next_index = 0
+        self._history_length = 0
+
+    @property
+    def next_index(self):
+        '''Return the index of the next entry to download for this device'''
+        return self._load_checkpoints().get(self._device.mac, {}).get('next_index', 0)
+
+    def entries(self):
+        '''
+        Yield the HistoricalEntry objects not downloaded yet
+
+        The checkpoint only moves past an entry once the consumer asks for the next one,
+        so an entry that was handed out but not stored is downloaded again on resume.
+        '''
+        with closing(self._payloads()) as payloads:
+            for index, epoch_time, payload in payloads:
+                yield HistoricalEntry(payload, epoch_time)
+                self._commit(index + 1)
+
+    def batches(self, size=_BATCH_SIZE):
+        '''
+        Yield the entries not downloaded yet as ReadingBatch objects of up to `size` readings
+
+        Payloads are decoded in bulk and the checkpoint moves past a batch once the
+        consumer asks for the next one.
+        '''
+        with closing(self._payloads()) as payloads:
+            batch = []
+            for index, epoch_time, payload in payloads:
+                batch.append(payload)
+                if len(batch) == size:
+                    yield decode_historical(batch, self._device.mac, epoch_time)
+                    self._commit(index + 1)
+                    batch = []
+            if batch:
+                yield decode_historical(batch, self._device.mac, epoch_time)
+                self._commit(index + 1)
+
+    def download(self, sink, clear=False):
+        '''
+        Pass every new historical entry to `sink` and return the number of entries
+
+        When `clear` is set and the whole history was transferred, the history is
+        removed from the device and the checkpoint is reset.
+        '''
+        count = 0
+        for entry in self.entries():
+            sink(entry)
+            count += 1
+
+        if clear:
+            self._device.clear_history()
+            self._save_checkpoint(0, 0)
+        return count
+
+    def _payloads(self):
+        '''Yield (index, epoch time, raw payload) for every entry past the checkpoint'''
+        with self._device.connect():
+            self._history_length = self._device._history_length()
+            next_index = self.next_index
+            if next_index > self._history_length:
+                _LOGGER.info('History of %s shrank to %d entries, restarting from the first entry',
+                             self._device.mac, self._history_length)
+                next_index = 0
+            self._next_index = next_index
+            if next_index == self._history_length:
+                return
+
+            _LOGGER.info('Downloading entries %d to %d of %s', next_index, self._history_length, self._device.mac)
+            epoch_time = self._device._epoch_time
+            try:
+                for index in range(next_index, self._history_length):
+                    yield index, epoch_time, self._read_payload(index)
+            finally:
+                self._save_checkpoint(self._next_index, self._history_length)
+
+    def _commit(self, next_index):
+        '''Mark every entry before `next_index` as stored by the consumer'''
+        self._next_index = next_index
+        if next_index % self._checkpoint_every == 0 or next_index == self._history_length:
+            self._save_checkpoint(next_index, self._history_length)
+
+    def _read_payload(self, index):
+        '''Read the payload of one entry, retrying transient failures'''
+        for attempt in range(self._retries + 1):
+            try:
+                return self._device._read_history_payload(index)
+            except Exception as exception:
+                if attempt == self._retries:
+                    _LOGGER.error('Giving up on historical entry %d of %s: %s', index, self._device.mac, exception)
+                    raise
+                _LOGGER.warning('Retrying historical entry %d of %s (%s)', index, self._device.mac, exception)
+
+    def _load_checkpoints(self):
+        '''Return the checkpoints of all devices'''
+        try:
+            with open(self._checkpoint_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as exception:
+            _LOGGER.warning('Ignoring unreadable history checkpoint %s: %s', self._checkpoint_path, exception)
+            return {}
+
+    def _save_checkpoint(self, next_index, history_length):
+        '''Atomically record the download progress of this device'''
+        checkpoints = self._load_checkpoints()
+        checkpoints[self._device.mac] = {'next_index': next_index, 'history_length': history_length}
+
+        directory = os.path.dirname(self._checkpoint_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        temp_path = self._checkpoint_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(checkpoints, f)
+        os.replace(temp_path, self._checkpoint_path)
@@ -0,0 +1,12 @@
+from re import search
+
+from .exception import FlowerCareException
+
+def parse_interface(interface):
+    '''Return the adapter index of a Bluetooth interface name like "hci0"'''
+    match_result = search(r'hci([\d]+)', interface)
+    if match_result is None:
+        raise FlowerCareException(
+            'Invalid pattern "{}" for Bluetooth interface. '
+            'Expected something like "hci0".'.format(interface))
+    return int(match_result.group(1))
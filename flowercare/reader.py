@@ -1,9 +1,12 @@
-from bluepy.btle import Peripheral
+from bluepy.btle import Peripheral, BTLEDisconnectError
 from datetime import datetime, timedelta
 from logging import getLogger
 from time import time, sleep
 
+from agt import timecodes
+
 from .exception import FlowerCareException
+from .interface import parse_interface
 
 _BYTE_ORDER = 'little'
 
@@ -21,6 +24,8 @@ _CMD_HISTORY_READ_INIT = bytes([0xa0, 0x00, 0x00])
 _CMD_HISTORY_READ_SUCCESS = bytes([0xa2, 0x00, 0x00])
 _CMD_HISTORY_READ_FAILED = bytes([0xa3, 0x00, 0x00])
 
+_RECONNECT_ATTEMPTS = 2
+
 _LOGGER = getLogger(__name__)
 
 class FlowerCare(object):
@@ -28,70 +33,105 @@ class FlowerCare(object):
     Represents a Xiaomi Flower Care device
     '''
 
-    def __init__(self, mac, interface='hci0'):
-        '''Initialize a Xiaomi Flower Care for the given MAC address.'''
+    def __init__(self, mac, interface='hci0', cache=None):
+        '''
+        Initialize a Xiaomi Flower Care for the given MAC address.
+
+        An optional MetadataCache lets name, firmware version and battery level
+        be served without a GATT round-trip while the cached values are fresh.
+        '''
         self._mac = mac
         self._interface = interface
+        self._iface = parse_interface(interface)
+        self._cache = cache
+        self._connection = None
 
     @property
     def name(self):
         '''Return the name of the device'''
+        if self._cache is not None:
+            cached = self._cache.get(self._mac)
+            if 'name' in cached:
+                return cached['name']
+
         response = self._read_handle(_HANDLE_DEVICE_NAME)
-        return ''.join(chr(byte) for byte in response)
+        name = ''.join(chr(byte) for byte in response)
+        if self._cache is not None:
+            self._cache.update(self._mac, {'name': name})
+        return name
 
     @property
     def mac(self):
         '''Return the MAC of the device'''
         return self._mac
 
+    @property
+    def interface(self):
+        '''Return the Bluetooth interface used to connect to the device'''
+        return self._interface
+
     @property
     def firmware_version(self):
         '''Return the current firmware version'''
-        response = self._read_handle(_HANDLE_FIRMWARE_AND_BATTERY)
-        return ''.join(map(chr, response[2:]))
+        return self._read_metadata()['firmware_version']
 
     @property
     def battery_level(self):
         '''Return the current battery level'''
-        response = self._read_handle(_HANDLE_FIRMWARE_AND_BATTERY)
-        return response[0]
+        return self._read_metadata()['battery_level']
 
     @property
     def real_time_data(self):
         '''Return the current readings from the 4 sensors'''
-        # For the newer models we need to explicitly set the device in real-time data reading mode
-        if self.firmware_version >= '2.6.6':
-            self._write_handle(_HANDLE_MODE_CHANGE, _CMD_REAL_TIME_READ_INIT)
-
-        response = self._read_handle(_HANDLE_DATA_READ)
+        with self.connect():
+            self._enable_real_time_mode(self.firmware_version)
+            response = self._read_handle(_HANDLE_DATA_READ)
         return RealTimeEntry(response)
 
+    def sample(self):
+        '''
+        Return a snapshot of the 4 sensors together with battery level and firmware version.
+
+        Everything is read over a single connection with one firmware/battery read and one
+        data read, so all fields of the snapshot come from the same instant. The firmware/battery
+        read is skipped while the metadata cache holds fresh values.
+        '''
+        with self.connect():
+            metadata = self._read_metadata()
+            self._enable_real_time_mode(metadata['firmware_version'])
+            response = self._read_handle(_HANDLE_DATA_READ)
+        return SampleEntry(response, self._mac, metadata['firmware_version'], metadata['battery_level'])
+
     @property
     def historical_data(self):
         '''Return list of historical readings from the 4 sensors'''
-        self._write_handle(_HANDLE_HISTORY_CONTROL, _CMD_HISTORY_READ_INIT)
+        with self.connect():
+            historical_data = []
+            history_length = self._history_length()
 
-        historical_data = []
-        raw_historical_data = self._read_handle(_HANDLE_HISTORY_READ)
-        history_length = int.from_bytes(raw_historical_data[:2], _BYTE_ORDER)
-        
-        _LOGGER.info('Detected %d entries in device history', history_length)
-
-        if history_length > 0:
-            epoch_time = self._epoch_time
-            for i in range(history_length):
-                payload = self._calculate_historical_entry_address(i)
-                try:
-                    _LOGGER.info('Reading historical entry %d of %d', i, history_length)
-                    self._write_handle(_HANDLE_HISTORY_CONTROL, payload)
-                    response = self._read_handle(_HANDLE_HISTORY_READ)
-                    historical_data.append(HistoricalEntry(response, epoch_time))
-                except Exception as exception:
-                    _LOGGER.error('Could only retrieve %d of %d entries from the history. The rest is not readable.', i, history_length)
-                    break
+            if history_length > 0:
+                epoch_time = self._epoch_time
+                for i in range(history_length):
+                    try:
+                        _LOGGER.info('Reading historical entry %d of %d', i, history_length)
+                        historical_data.append(self._read_history_entry(i, epoch_time))
+                    except Exception as exception:
+                        _LOGGER.error('Could only retrieve %d of %d entries from the history. The rest is not readable.', i, history_length)
+                        break
 
         return historical_data
 
+    def connect(self, retries=_RECONNECT_ATTEMPTS):
+        '''
+        Return a connection session that reuses one BLE link for all handle accesses.
+
+        Usage: `with device.connect(): ...` - every property read or command issued on the
+        device inside the block goes over the same link. Nested sessions share the outer one.
+        '''
+        if self._connection is not None:
+            return self._connection
+        return FlowerCareConnection(self, retries)
+
     def clear_history(self):
         '''Remove historical entries from device'''
         self._write_handle(_HANDLE_HISTORY_CONTROL, _CMD_HISTORY_READ_SUCCESS)
@@ -100,6 +140,47 @@ class FlowerCare(object):
         '''Blink the status LED'''
         self._write_handle(_HANDLE_MODE_CHANGE, _CMD_BLINK_LED)
 
+    def _enable_real_time_mode(self, firmware_version):
+        '''Put the device in real-time data reading mode if its firmware requires it'''
+        # For the newer models we need to explicitly set the device in real-time data reading mode
+        if firmware_version >= '2.6.6':
+            self._write_handle(_HANDLE_MODE_CHANGE, _CMD_REAL_TIME_READ_INIT)
+
+    def _read_metadata(self):
+        '''Return firmware version and battery level, from the cache when fresh'''
+        if self._cache is not None:
+            cached = self._cache.get(self._mac)
+            if 'firmware_version' in cached and 'battery_level' in cached:
+                return cached
+
+        response = self._read_handle(_HANDLE_FIRMWARE_AND_BATTERY)
+        metadata = {
+            'firmware_version': ''.join(map(chr, response[2:])),
+            'battery_level': response[0]
+        }
+        if self._cache is not None:
+            self._cache.update(self._mac, metadata)
+        return metadata
+
+    def _history_length(self):
+        '''Switch the device to history mode and return the number of stored entries'''
+        self._write_handle(_HANDLE_HISTORY_CONTROL, _CMD_HISTORY_READ_INIT)
+        raw_historical_data = self._read_handle(_HANDLE_HISTORY_READ)
+        history_length = int.from_bytes(raw_historical_data[:2], _BYTE_ORDER)
+
+        _LOGGER.info('Detected %d entries in device history', history_length)
+        return history_length
+
+    def _read_history_entry(self, index, epoch_time):
+        '''Read a single historical entry by index'''
+        return HistoricalEntry(self._read_history_payload(index), epoch_time)
+
+    def _read_history_payload(self, index):
+        '''Read the raw 16 byte payload of a historical entry by index'''
+        payload = self._calculate_historical_entry_address(index)
+        self._write_handle(_HANDLE_HISTORY_CONTROL, payload)
+        return self._read_handle(_HANDLE_HISTORY_READ)
+
     def _calculate_historical_entry_address(self, addr):
         '''Calculate address of provided historical entry index'''
         return b'\xa1' + addr.to_bytes(2, _BYTE_ORDER)
@@ -124,17 +205,80 @@ class FlowerCare(object):
 
     def _read_handle(self, handle):
         '''Read a handle from the device'''
-        with Peripheral(self._mac, iface=None) as connection:
-            response = connection.readCharacteristic(handle)
+        with self.connect() as connection:
+            response = connection.read_handle(handle)
             _LOGGER.debug('Received response for handle %s: %s', handle, self._format_bytes(response))
         return response
 
     def _write_handle(self, handle, command):
         '''Write a value to a handle'''
-        with Peripheral(self._mac, iface=None) as connection:
-            connection.writeCharacteristic(handle, command, True)
+        with self.connect() as connection:
+            connection.write_handle(handle, command)
             _LOGGER.debug('Wrote command %s to handle %s', self._format_bytes(command), handle)
 
+class FlowerCareConnection(object):
+    '''
+    Represents a BLE connection session to a Flower Care device.
+
+    The underlying peripheral is opened lazily on the first handle access and kept
+    until the session is closed. If the link drops, the session reconnects and
+    retries the access up to `retries` times before giving up.
+    '''
+
+    def __init__(self, device, retries=_RECONNECT_ATTEMPTS):
+        self._device = device
+        self._retries = retries
+        self._peripheral = None
+        self._depth = 0
+
+    def __enter__(self):
+        if self._depth == 0:
+            self._device._connection = self
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._depth -= 1
+        if self._depth == 0:
+            self._device._connection = None
+            self.close()
+
+    @property
+    def is_connected(self):
+        '''Return whether the BLE link is currently open'''
+        return self._peripheral is not None
+
+    def read_handle(self, handle):
+        '''Read a handle over the session link'''
+        return self._call(lambda peripheral: peripheral.readCharacteristic(handle))
+
+    def write_handle(self, handle, command):
+        '''Write a value to a handle over the session link'''
+        return self._call(lambda peripheral: peripheral.writeCharacteristic(handle, command, True))
+
+    def close(self):
+        '''Tear down the BLE link'''
+        if self._peripheral is not None:
+            try:
+                self._peripheral.disconnect()
+            except Exception as exception:
+                _LOGGER.debug('Ignoring error while disconnecting from %s: %s', self._device.mac, exception)
+            self._peripheral = None
+
+    def _call(self, operation):
+        '''Run an operation against the peripheral, reconnecting on a dropped link'''
+        for attempt in range(self._retries + 1):
+            try:
+                if self._peripheral is None:
+                    self._peripheral = Peripheral(self._device.mac, iface=self._device._iface)
+                return operation(self._peripheral)
+            except BTLEDisconnectError as exception:
+                self.close()
+                if attempt == self._retries:
+                    raise
+                _LOGGER.warning('Lost connection to %s (%s), reconnecting (attempt %d of %d)',
+                                self._device.mac, exception, attempt + 1, self._retries)
+
 class RealTimeEntry(object):
     '''
     Represents a real time entry of sensor values by parsing the byte array returned by the device.
@@ -151,12 +295,40 @@ class RealTimeEntry(object):
     bytes 10-15: unknown
     '''
 
+    __slots__ = ('temperature', 'light', 'moisture', 'conductivity')
+
     def __init__(self, byte_array):
         self.temperature = int.from_bytes(byte_array[:2], _BYTE_ORDER) / 10.0
         self.light = int.from_bytes(byte_array[3:7], _BYTE_ORDER)
         self.moisture = byte_array[7]
         self.conductivity = int.from_bytes(byte_array[8:10], _BYTE_ORDER)
 
+class SampleEntry(RealTimeEntry):
+    '''
+    Represents a complete sample of a device: the real time sensor values plus
+    the device metadata that was read alongside them.
+    '''
+
+    __slots__ = ('mac', 'firmware_version', 'battery_level', 'timestamp')
+
+    def __init__(self, byte_array, mac, firmware_version, battery_level, timestamp=None):
+        RealTimeEntry.__init__(self, byte_array)
+        self.mac = mac
+        self.firmware_version = firmware_version
+        self.battery_level = battery_level
+        self.timestamp = timestamp if timestamp is not None else datetime.now()
+
+    def to_record(self):
+        '''Return the sample as a reading record as stored in the read files'''
+        return {
+            'Timestamp': timecodes.from_datetime(self.timestamp),
+            'MAC': self.mac,
+            'Temperature': self.temperature,
+            'Moisture': self.moisture,
+            'Light': self.light,
+            'Conductivity': self.conductivity
+        }
+
 class HistoricalEntry(object):
     '''
     Represents a historical entry of sensor values by parsing the byte array returned by the device.
@@ -174,6 +346,9 @@ class HistoricalEntry(object):
     bytes 12-13: conductivity in µS/cm
     bytes 14-15: unknown
     '''
+
+    __slots__ = ('timestamp', 'temperature', 'light', 'moisture', 'conductivity')
+
     def __init__(self, byte_array, epoch_time):
         epoch_offset = int.from_bytes(byte_array[:4], _BYTE_ORDER)
         self.timestamp = datetime.fromtimestamp(epoch_time + epoch_offset)
@@ -182,3 +357,14 @@ class HistoricalEntry(object):
         self.light = int.from_bytes(byte_array[7:10], _BYTE_ORDER)
         self.moisture = byte_array[11]
         self.conductivity = int.from_bytes(byte_array[12:14], _BYTE_ORDER)
+
+    def to_record(self, mac):
+        '''Return the entry as a reading record for the given device'''
+        return {
+            'Timestamp': timecodes.from_datetime(self.timestamp),
+            'MAC': mac,
+            'Temperature': self.temperature,
+            'Moisture': self.moisture,
+            'Light': self.light,
+            'Conductivity': self.conductivity
+        }
@@ -1,7 +1,12 @@
-from re import search
 from bluepy.btle import Scanner, ScanEntry, DefaultDelegate
+from collections import deque
+from datetime import datetime
+from time import time
+
+from agt import timecodes
 
 from .exception import FlowerCareException
+from .interface import parse_interface
 
 _DEVICE_PREFIX = 'c4:7c:8d:'
 _DEVICE_NAMES = ['flower mate', 'flower care']
@@ -11,6 +16,26 @@ _DEFAULT_CALLBACK = lambda dev: print('Found new device', dev.addr, _DEVICE_NAME
 _DEVICE_FILTER = lambda dev: (dev.addr and dev.addr.lower().startswith(_DEVICE_PREFIX)) \
     and (_DEVICE_NAME(dev) and _DEVICE_NAME(dev).lower() in _DEVICE_NAMES)
 
+_BYTE_ORDER = 'little'
+
+# Xiaomi MiBeacon service data, see the frame layout in _decode_service_data
+_SERVICE_DATA_UUID = 0xfe95
+_FRAME_ENCRYPTED = 0x08
+_FRAME_HAS_MAC = 0x10
+_FRAME_HAS_CAPABILITY = 0x20
+_FRAME_HAS_OBJECT = 0x40
+_CAPABILITY_HAS_IO = 0x20
+
+_OBJECT_TEMPERATURE = 0x1004
+_OBJECT_LIGHT = 0x1007
+_OBJECT_MOISTURE = 0x1008
+_OBJECT_CONDUCTIVITY = 0x1009
+_OBJECT_BATTERY = 0x100a
+
+_SENSOR_FIELDS = ('temperature', 'light', 'moisture', 'conductivity')
+
+_TARGET_POLL_INTERVAL = 0.25
+
 
 class FlowerCareScanner(object):
     '''
@@ -22,12 +47,7 @@ class FlowerCareScanner(object):
         self._callback = callback
 
     def _parse_interface(self, interface):
-        match_result = search(r'hci([\d]+)', interface)
-        if match_result is None:
-            raise FlowerCareException(
-                'Invalid pattern "{}" for Bluetooth interface. '
-                'Expected something like "hci0".'.format(interface))
-        return int(match_result.group(1))
+        return parse_interface(interface)
 
     def scan(self, timeout=10.0):
         delegate = _ScanDelegate(self._callback)
@@ -35,6 +55,141 @@ class FlowerCareScanner(object):
         devices = list(filter(_DEVICE_FILTER, scanner.scan(float(timeout))))
         return devices
 
+    def scan_for(self, macs, timeout=10.0):
+        '''
+        Scan until every device in `macs` has been discovered, or until the timeout
+
+        Return a tuple (devices, first_seen): the ScanEntry of each discovered device, and a
+        dict mapping every requested MAC to the seconds it took to be discovered, or None
+        if it was not seen before the timeout.
+        '''
+        delegate = _TargetDelegate(macs, self._callback)
+        scanner = Scanner(self._interface).withDelegate(delegate)
+        deadline = delegate.start + float(timeout)
+
+        scanner.clear()
+        scanner.start()
+        try:
+            while not delegate.complete:
+                remaining = deadline - time()
+                if remaining <= 0:
+                    break
+                scanner.process(min(remaining, _TARGET_POLL_INTERVAL))
+        finally:
+            scanner.stop()
+
+        first_seen = {mac: delegate.first_seen.get(mac.lower()) for mac in macs}
+        return list(delegate.devices.values()), first_seen
+
+    def listen(self, timeout=None, macs=None, passive=True):
+        '''
+        Yield AdvertisementEntry readings decoded from the devices' service data broadcasts
+
+        No connection is made to the devices. Flower Care sensors broadcast one value per
+        advertisement, so a reading is yielded for a device once all 4 sensor values have
+        been received, and again each time one of them is updated. Listens forever unless
+        a timeout in seconds is given; restrict to known devices with `macs`.
+        '''
+        readings = deque()
+        delegate = _AdvertisementDelegate(readings, macs)
+        scanner = Scanner(self._interface).withDelegate(delegate)
+        deadline = None if timeout is None else time() + float(timeout)
+
+        scanner.clear()
+        scanner.start(passive=passive)
+        try:
+            while deadline is None or time() < deadline:
+                remaining = 1.0 if deadline is None else min(1.0, max(deadline - time(), 0.01))
+                scanner.process(remaining)
+                while readings:
+                    yield readings.popleft()
+        finally:
+            scanner.stop()
+
+
+class AdvertisementEntry(object):
+    '''
+    Represents a reading of sensor values assembled from advertisement broadcasts,
+    with the same sensor attributes as a RealTimeEntry.
+    '''
+
+    __slots__ = ('mac', 'temperature', 'light', 'moisture', 'conductivity', 'battery_level', 'timestamp')
+
+    def __init__(self, mac, values, timestamp=None):
+        self.mac = mac
+        self.temperature = values['temperature']
+        self.light = values['light']
+        self.moisture = values['moisture']
+        self.conductivity = values['conductivity']
+        self.battery_level = values.get('battery_level')
+        self.timestamp = timestamp if timestamp is not None else datetime.now()
+
+    def to_record(self):
+        '''Return the reading as a reading record as stored in the read files'''
+        return {
+            'Timestamp': timecodes.from_datetime(self.timestamp),
+            'MAC': self.mac,
+            'Temperature': self.temperature,
+            'Moisture': self.moisture,
+            'Light': self.light,
+            'Conductivity': self.conductivity
+        }
+
+
+def _decode_service_data(data):
+    '''
+    Decode a MiBeacon service data payload into a (field, value) tuple.
+
+    Returns None for payloads that are not MiBeacon frames or carry no readable object.
+
+    Semantics of the data (in little endian encoding):
+    bytes   0-1: service UUID 0xfe95
+    bytes   2-3: frame control flags
+    bytes   4-5: product id
+    byte      6: frame counter
+    bytes  7-12: MAC address, if flagged
+    byte  n    : capability, if flagged (followed by 2 bytes of IO capability, if flagged)
+    bytes n-n+1: object type
+    byte  n+2  : object length
+    bytes n+3..: object value
+    '''
+    if data is None or len(data) < 7 or int.from_bytes(data[:2], _BYTE_ORDER) != _SERVICE_DATA_UUID:
+        return None
+
+    frame_control = int.from_bytes(data[2:4], _BYTE_ORDER)
+    if frame_control & _FRAME_ENCRYPTED or not frame_control & _FRAME_HAS_OBJECT:
+        return None
+
+    offset = 7
+    if frame_control & _FRAME_HAS_MAC:
+        offset += 6
+    if frame_control & _FRAME_HAS_CAPABILITY:
+        if len(data) <= offset:
+            return None
+        if data[offset] & _CAPABILITY_HAS_IO:
+            offset += 2
+        offset += 1
+
+    if len(data) < offset + 3:
+        return None
+    object_type = int.from_bytes(data[offset:offset + 2], _BYTE_ORDER)
+    length = data[offset + 2]
+    value = data[offset + 3:offset + 3 + length]
+    if len(value) < length or length == 0:
+        return None
+
+    if object_type == _OBJECT_TEMPERATURE:
+        return 'temperature', int.from_bytes(value[:2], _BYTE_ORDER, signed=True) / 10.0
+    if object_type == _OBJECT_LIGHT:
+        return 'light', int.from_bytes(value[:3], _BYTE_ORDER)
+    if object_type == _OBJECT_MOISTURE:
+        return 'moisture', value[0]
+    if object_type == _OBJECT_CONDUCTIVITY:
+        return 'conductivity', int.from_bytes(value[:2], _BYTE_ORDER)
+    if object_type == _OBJECT_BATTERY:
+        return 'battery_level', value[0]
+    return None
+
 
 class _ScanDelegate(DefaultDelegate):
     '''
@@ -48,3 +203,57 @@ class _ScanDelegate(DefaultDelegate):
     def handleDiscovery(self, dev, is_new_device, is_new_data):
         if is_new_device and _DEVICE_FILTER(dev):
                 self.callback(dev)
+
+
+class _TargetDelegate(DefaultDelegate):
+    '''
+    Represents a delegate recording when each of a set of expected devices is first seen
+    '''
+
+    def __init__(self, macs, callback):
+        DefaultDelegate.__init__(self)
+        self.callback = callback
+        self.targets = {mac.lower() for mac in macs}
+        self.devices = {}
+        self.first_seen = {}
+        self.start = time()
+
+    @property
+    def complete(self):
+        return len(self.devices) == len(self.targets)
+
+    def handleDiscovery(self, dev, is_new_device, is_new_data):
+        mac = dev.addr.lower() if dev.addr else None
+        if mac in self.targets and mac not in self.devices:
+            self.first_seen[mac] = time() - self.start
+            self.devices[mac] = dev
+            self.callback(dev)
+
+
+class _AdvertisementDelegate(DefaultDelegate):
+    '''
+    Represents a delegate decoding the service data of each advertisement into readings
+    '''
+
+    def __init__(self, readings, macs=None):
+        DefaultDelegate.__init__(self)
+        self.readings = readings
+        self.macs = None if macs is None else {mac.lower() for mac in macs}
+        self.values = {}
+
+    def handleDiscovery(self, dev, is_new_device, is_new_data):
+        if not is_new_data or not dev.addr:
+            return
+        mac = dev.addr.lower()
+        if not mac.startswith(_DEVICE_PREFIX) or (self.macs is not None and mac not in self.macs):
+            return
+
+        decoded = _decode_service_data(dev.getValue(ScanEntry.SERVICE_DATA_16B))
+        if decoded is None:
+            return
+
+        field, value = decoded
+        values = self.values.setdefault(mac, {})
+        values[field] = value
+        if field in _SENSOR_FIELDS and all(name in values for name in _SENSOR_FIELDS):
+            self.readings.append(AdvertisementEntry(dev.addr, dict(values)))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import ast
+import configparser
+import glob
+import os
+import sys
+from agt.store import READ_FILES_DIR, ReadingLog, iter_records
+from flowercare import FlowerCare, HistoryDownloader, MetadataCache
+
+# Downloads saved by earlier versions of this script, outside of the read files
+LEGACY_HISTORY_DIR = "files/history"
+
+def load_config():
+    """Load the device MACs and history options from setup.cfg"""
+    config = configparser.ConfigParser()
+    config.read('setup.cfg')
+
+    try:
+        device_macs = ast.literal_eval(config['DEVICE']['macs'])
+    except (KeyError, SyntaxError, ValueError) as e:
+        print(f"Error reading MAC addresses from config: {e}")
+        sys.exit(1)
+
+    cache = MetadataCache(
+        ttl=config.getint('CACHE', 'ttl', fallback=86400),
+        path=config.get('CACHE', 'path', fallback='files/cache/metadata.json'),
+        battery_ttl=config.getint('CACHE', 'battery_ttl', fallback=3600)
+    )
+    checkpoint_path = config.get('HISTORY', 'checkpoint', fallback='files/cache/history.json')
+    return device_macs, cache, checkpoint_path
+
+def import_legacy_history(log):
+    """Move the readings of earlier files/history downloads into the read files"""
+    for path in sorted(glob.glob(os.path.join(LEGACY_HISTORY_DIR, 'AGT-history-*.jsonl'))):
+        records = list(iter_records(path))
+        log.append(records)
+        log.close()
+        os.replace(path, path + '.imported')
+        print(f"Imported {len(records)} entries of {path} into {READ_FILES_DIR}")
+
+device_macs, metadata_cache, checkpoint_path = load_config()
+
+# The history goes into the daily read files, where agt.data, the columnar store, the
+# ingest manifest and mini_insert.py pick it up. Not through ReadingStore: the session
+# log and the live ring only hold the readings of the running session. Every batch is
+# synced before the next one is requested, which moves the download checkpoint past it.
+log = ReadingLog(READ_FILES_DIR, sync_every=1)
+try:
+    import_legacy_history(log)
+
+    for device_mac in device_macs:
+        device = FlowerCare(mac=device_mac, interface='hci0', cache=metadata_cache)
+        downloader = HistoryDownloader(device, checkpoint_path=checkpoint_path)
+
+        print(f"\n>>> Downloading history of {device_mac} from entry {downloader.next_index}")
+
+        count = 0
+        try:
+            for batch in downloader.batches():
+                log.append(batch.to_records())
+                count += len(batch)
+        except Exception as e:
+            print(f"History download for {device_mac} interrupted: {e}. It will resume on the next run.")
+            continue
+        finally:
+            log.close()
+
+        print(f"Saved {count} entries to {READ_FILES_DIR}")
+finally:
+    log.close()
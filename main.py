@@ -8,13 +8,15 @@ from datetime import datetime
 import os
 import pandas as pd
 
+from agt import timecodes
+
 class CommandManager:
     """Handles command validation and execution."""
     VALID_COMMANDS = [
         "scan", "read", "find", "trend", "update", "sesh", "train", "testing model", "push", 
         "live", "new sesh", "report", "avg", "cluster", "weather", "full anal", "fcast", "fcast 3d", 
         "build", "summary", "corr", "pred", "cleaner", "nn", "export", "export csv", 
-        "export xl", "dbconn", "batch"
+        "export xl", "dbconn", "batch", "history", "compact", "archive", "sync"
     ]
 
     def validate_command(self, command):
@@ -27,8 +29,11 @@ class DataManager:
     @staticmethod
     def clean_data(data):
         """Clean and prepare data for export while preserving precision."""
-        # Convert timestamp to consistent format
-        data['Timestamp'] = pd.to_datetime(data['Timestamp'], errors='coerce').dt.strftime('%Y-%m-%d %H:%M:%S')
+        # Keep timestamps as datetimes, they are only formatted on export. read_json
+        # already returns timecodes as datetimes, a mix with older timestamp strings
+        # is converted in one vectorized pass
+        if not pd.api.types.is_datetime64_any_dtype(data['Timestamp']):
+            data['Timestamp'] = pd.to_datetime(timecodes.to_datetime64(data['Timestamp']))
         
         # Handle missing columns but preserve actual values
         required_columns = ['MAC', 'Moisture', 'Light', 'Temperature', 'Conductivity']
@@ -69,9 +74,6 @@ class DataManager:
         if not os.path.exists("files/export"):
             os.makedirs("files/export")
         
-        # Convert Timestamp column to datetime for filtering
-        data['Timestamp'] = pd.to_datetime(data['Timestamp'])
-        
         # Ask user for how many days of data to export
         try:
             days = int(input("How many days of data would you like to export? (Enter 0 for all data): "))
@@ -101,15 +103,13 @@ class DataManager:
             print("Invalid sort order. Using ascending order by default.")
             data = data.sort_values('Timestamp', ascending=True)
         
-        # Convert Timestamp back to string format for export
-        data['Timestamp'] = data['Timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        
-        # Export data in the specified format
+        # Export data in the specified format, timestamps are formatted only here
         if file_format == 'json':
+            data = data.assign(Timestamp=timecodes.format_many(data['Timestamp']))
             data.to_json(f'files/export/{timestamp}.json', orient='records')
             print(f'Data for the last {days if days > 0 else "all"} days saved as JSON in /AGT/files/export')
         elif file_format == 'csv':
-            data.to_csv(f'files/export/{timestamp}.csv', index=False)
+            data.to_csv(f'files/export/{timestamp}.csv', index=False, date_format=timecodes.TIMESTAMP_FORMAT)
             print(f'Data for the last {days if days > 0 else "all"} days saved as CSV in /AGT/files/export')
         elif file_format == 'excel':
             data.to_excel(f'files/export/{timestamp}.xlsx', index=False)
@@ -178,22 +178,23 @@ class Session:
         if not self.configure_session():
             return  # Exit if session setup is canceled
 
-        while True:
-            print("Starting read session...")
-            start_time = time.time()
-            subprocess.run(["python", "read.py"])
-            self.read_counter += 1
-            self.weather_counter += 1
-
-            # Calculate time taken for the read session
-            time_taken = time.time() - start_time
-            print(f"\nRead session completed in {time_taken:.2f} seconds.\n")
+        # Sample in-process so the scanner, devices and files stay warm between cycles
+        from agt.daemon import SamplingDaemon
+        daemon = SamplingDaemon.from_config(interval=self.session_time)
 
-            time_until_next_ping = self.session_time - time_taken
-            next_ping_seconds = max(0, int(time_until_next_ping))
-            self.ping_counter += 1
+        print("Starting read session...")
+        try:
+            daemon.run(on_cycle=self.complete_read_cycle)
+        except KeyboardInterrupt:
+            daemon.stop()
+            print(f"\nRead session stopped after {self.read_counter} reads.")
 
-            self.countdown(self.session_time, "Waiting for the next read session to start...")
+    def complete_read_cycle(self, records, time_taken):
+        """Updates the counters after each read of the session."""
+        self.read_counter += 1
+        self.weather_counter += 1
+        self.ping_counter += 1
+        print(f"\nRead session completed in {time_taken:.2f} seconds, {len(records)} readings saved.\n")
 
 class App:
     """Main application class to handle user input and command execution."""
@@ -225,8 +226,16 @@ class App:
             subprocess.run(["python", "read.py"])
         elif command == "sesh":
             self.session.start_read_session()
+        elif command == "history":
+            subprocess.run(["python", "history.py"])
+        elif command == "compact":
+            subprocess.run(["python", "-m", "agt.columnar"])
+        elif command == "archive":
+            subprocess.run(["python", "-m", "agt.archive"])
         elif command == "update":
             subprocess.run(["python", "files/mini_insert.py"])
+        elif command == "sync":
+            subprocess.run(["python", "-m", "agt.sync"])
         elif command == "train":
             subprocess.run(["python", "tools/neural_net/modular/model.py", "--from_main"])
         elif command == "cluster":
@@ -258,8 +267,10 @@ class App:
         """Starts a new session after confirmation."""
         confirm = input("Are you sure you want to start a new session? This will clear any current session data. (Y/N)? ")
         if confirm == "Y":
-            print("Deleting previous session data...")
-            subprocess.run(["rm", "-rf", "sesh.json"])
+            print("Archiving previous session data...")
+            from agt.config import load_config, load_session_archive
+            load_session_archive(load_config()).roll_over()
+            subprocess.run(["rm", "-rf", "files/cache/sesh.ring"])
             self.session.start_read_session()
         else:
             print("New session cancelled.")
@@ -267,7 +278,7 @@ class App:
     def export_session_data(self, command):
         """Exports the current session data in the specified format with filtering options."""
         try:
-            data = pd.read_json("sesh.json")
+            data = pd.read_json("sesh.jsonl", lines=True)
             if data.empty:
                 print("No data available to export.")
                 return
@@ -29,13 +29,12 @@ device_mac = "c4:7c:8d:6d:4e:df"
 # Scan for devices and find the specific device
 try:
     print("\nScanning for devices...")
-    devices = scanner.scan(timeout=10)
-    device = next((d for d in devices if d.addr == device_mac), None)
-    if device is None:
+    devices, first_seen = scanner.scan_for([device_mac], timeout=10)
+    if first_seen[device_mac] is None:
         print("\nDevice not found")
         stop_event.set()
         exit()
-    print("\nDevice found.")
+    print(f"\nDevice found after {first_seen[device_mac]:.2f} seconds.")
 except Exception as e:
     print(f"\nError during scanning: {e}")
     stop_event.set()
@@ -53,14 +52,7 @@ except Exception as e:
 
 # Fetch sensor data
 print("\nFetching sensor data...")
-sensor_data = {
-    'Timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-    'MAC': flower_care_device.mac,
-    'Temperature': flower_care_device.real_time_data.temperature,
-    'Moisture': flower_care_device.real_time_data.moisture,
-    'Light': flower_care_device.real_time_data.light,
-    'Conductivity': flower_care_device.real_time_data.conductivity
-}
+sensor_data = flower_care_device.sample().to_record()
 print("\nSensor data fetched.")
 
 # Save data to JSON file
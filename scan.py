@@ -4,7 +4,8 @@ import json
 import os
 import pandas as pd
 from collections import OrderedDict
-from flowercare import FlowerCare, FlowerCareScanner
+from flowercare import FlowerCare, FlowerCareScanner, MetadataCache
+import configparser
 import time
 from datetime import datetime
 import sys
@@ -44,12 +45,23 @@ def animate():
 
 t = threading.Thread(target=animate)
 t.start()
+
+# Share the firmware/battery cache with read.py so fresh values are not re-read
+config = configparser.ConfigParser()
+config.read('setup.cfg')
+metadata_cache = MetadataCache(
+    ttl=config.getint('CACHE', 'ttl', fallback=86400),
+    path=config.get('CACHE', 'path', fallback='files/cache/metadata.json'),
+    battery_ttl=config.getint('CACHE', 'battery_ttl', fallback=3600)
+)
+
 stats = OrderedDict()
 try:
     for device in devices:
         device = FlowerCare(
             mac=device.addr, # address of the device to connect to
-            interface='hci0' # hci0 is default, only explicitly stating for demo purpose
+            interface='hci0', # hci0 is default, only explicitly stating for demo purpose
+            cache=metadata_cache
         )
         stats[device.mac] = OrderedDict([
             ('MAC', device.mac),
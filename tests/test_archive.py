@@ -0,0 +1,87 @@
+import os
+from datetime import date
+
+import pytest
+
+from agt import archive, codec, timecodes
+from agt.manifest import IngestManifest
+from agt.store import ReadingLog, day_files, iter_readings, segment_path
+from agt.timeindex import index_path
+
+MAC = 'c4:7c:8d:6d:24:9e'
+
+def _readings(day, count):
+    return [{'Timestamp': timecodes.parse(day + ' 00:00:00') + index * 60000000, 'MAC': MAC, 'Temperature': 21.5,
+             'Moisture': index, 'Light': 700, 'Conductivity': None if index == 2 else 85} for index in range(count)]
+
+def _log(root, records):
+    log = ReadingLog(root)
+    log.append(records)
+    log.close()
+
+def test_archive_day_replaces_read_files(tmp_path):
+    root = str(tmp_path)
+    records = _readings('2024-05-01', 20)
+    _log(root, records)
+    segment = segment_path(root, '2024-05-01')
+    size = os.path.getsize(segment)
+
+    count, before, after = archive.archive_day('2024-05-01', root)
+    assert (count, before) == (20, size) and after < before
+    assert day_files(root) == [archive.archive_path(root, '2024-05-01')]
+    assert not os.path.exists(index_path(segment))
+    assert list(iter_readings(root)) == records
+    assert archive.archive_day('2024-05-01', root) is None
+
+def test_archive_day_keeps_read_files_when_decoding_differs(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    _log(root, _readings('2024-05-01', 5))
+    segment = segment_path(root, '2024-05-01')
+    read_records = codec.read_records
+
+    def swap_missing_values(path):
+        records = read_records(path)
+        records[2]['Conductivity'], records[3]['Conductivity'] = records[3]['Conductivity'], None
+        return records
+
+    monkeypatch.setattr(codec, 'read_records', swap_missing_values)
+    with pytest.raises(ValueError):
+        archive.archive_day('2024-05-01', root)
+    assert day_files(root) == [segment]
+    assert not os.path.exists(archive.archive_path(root, '2024-05-01') + '.tmp')
+
+def test_appends_after_archiving_are_merged(tmp_path):
+    root = str(tmp_path)
+    _log(root, _readings('2024-05-01', 5))
+    archive.archive_day('2024-05-01', root)
+    late = [dict(record, Moisture=50) for record in _readings('2024-05-01', 2)]
+    _log(root, late)
+
+    assert archive.archive_day('2024-05-01', root)[0] == 7
+    assert [record['Moisture'] for record in iter_readings(root)] == [0, 1, 2, 3, 4, 50, 50]
+
+def test_archive_keeps_recent_and_unarchivable_days(tmp_path):
+    root = str(tmp_path)
+    _log(root, _readings('2024-05-01', 3) + _readings('2024-05-09', 3) + _readings('2024-05-10', 3))
+    _log(root, [dict(_readings('2024-05-02', 1)[0], Temperature=21.55)])
+
+    archived = archive.archive(root, keep_days=2, today=date(2024, 5, 11))
+    assert sorted(archived) == ['2024-05-01']
+    assert day_files(root, '2024-05-02') == [segment_path(root, '2024-05-02')]
+    assert day_files(root, '2024-05-09') == [segment_path(root, '2024-05-09')]
+
+def test_manifest_skips_records_ingested_before_archiving(tmp_path):
+    root = str(tmp_path)
+    _log(root, _readings('2024-05-01', 4))
+    manifest = IngestManifest(str(tmp_path / 'manifest.json'))
+    for path in day_files(root):
+        manifest.mark(path, manifest.read(path)[1])
+
+    _log(root, [dict(_readings('2024-05-01', 1)[0], Moisture=60)])
+    archive.archive_day('2024-05-01', root)
+    path = archive.archive_path(root, '2024-05-01')
+    records, state = manifest.read(path)
+    assert [record['Moisture'] for record in records] == [60]
+    manifest.mark(path, state)
+    assert manifest.records(path) == 5
+    assert manifest.records(segment_path(root, '2024-05-01')) == 0
@@ -0,0 +1,42 @@
+import os
+import struct
+import time
+
+import pytest
+
+pytest.importorskip('bluepy')
+
+from agt import timecodes
+from flowercare import HistoricalEntry, decode_historical
+
+def _payload(epoch_offset, temperature=215, light=1200, moisture=42, conductivity=310):
+    return struct.pack('<IHxIBH2x', epoch_offset, temperature, light, moisture, conductivity)
+
+@pytest.fixture
+def new_york():
+    previous = os.environ.get('TZ')
+    os.environ['TZ'] = 'America/New_York'
+    time.tzset()
+    yield
+    if previous is None:
+        del os.environ['TZ']
+    else:
+        os.environ['TZ'] = previous
+    time.tzset()
+
+def test_decode_historical_across_dst_change(new_york):
+    # Booted 2024-03-09 12:00 EST, hourly readings through the switch to EDT on 2024-03-10 02:00
+    epoch_time = 1710003600.0
+    payloads = [_payload(hour * 3600 + 120) for hour in range(24)]
+
+    batch = decode_historical(payloads, 'c4:7c:8d:6d:24:9e', epoch_time)
+    expected = [HistoricalEntry(payload, epoch_time).timestamp for payload in payloads]
+
+    assert [timestamp.astype('datetime64[s]').item() for timestamp in batch.array['timestamp']] == expected
+    hours = [timestamp.hour for timestamp in expected]
+    assert 2 not in hours and hours.count(3) == 1
+
+def test_entries_record_timecodes():
+    entry = HistoricalEntry(_payload(3600), 1714557600.0)
+    record = entry.to_record('c4:7c:8d:6d:24:9e')
+    assert record['Timestamp'] == timecodes.from_datetime(entry.timestamp)
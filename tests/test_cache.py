@@ -0,0 +1,21 @@
+import pytest
+
+pytest.importorskip('bluepy')
+
+from flowercare import MetadataCache
+from flowercare import cache as cache_module
+
+MAC = 'C4:7C:8D:6D:24:9E'
+
+def test_battery_level_expires_before_firmware(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module, 'time', lambda: now[0])
+    cache = MetadataCache(ttl=86400, battery_ttl=3600)
+    cache.update(MAC, {'firmware_version': '3.2.4', 'battery_level': 97})
+    assert cache.get(MAC) == {'firmware_version': '3.2.4', 'battery_level': 97}
+
+    now[0] += 3601
+    assert cache.get(MAC) == {'firmware_version': '3.2.4'}
+
+def test_battery_ttl_is_capped_by_ttl():
+    assert MetadataCache(ttl=600, battery_ttl=3600).battery_ttl == 600
@@ -0,0 +1,62 @@
+import pytest
+
+from agt import codec, timecodes
+
+MACS = ('c4:7c:8d:6d:24:9e', 'c4:7c:8d:6d:28:fa')
+
+def _readings(count):
+    return [{'Timestamp': timecodes.parse('2024-05-01 00:00:00') + index * 60000000 + (index % 3) * 1000,
+             'MAC': MACS[index % 2], 'Temperature': round(-5.0 + index * 0.3, 1), 'Moisture': index % 101,
+             'Light': index * 1000, 'Conductivity': 65535 - index} for index in range(count)]
+
+def test_round_trip():
+    records = _readings(500)
+    columns, present = codec.decode(codec.encode(records))
+    assert columns['Timestamp'].tolist() == [record['Timestamp'] for record in records]
+    for column in ('MAC',) + codec.FIELDS:
+        assert columns[column].tolist() == [record[column] for record in records]
+    assert all(mask.all() for mask in present.values())
+
+def test_round_trip_through_file_keeps_missing_values(tmp_path):
+    records = _readings(10)
+    records[1]['Temperature'] = None
+    records[4]['Moisture'] = None
+    del records[7]['Light']
+    records[9].update(Conductivity=None, Moisture=None)
+    path = tmp_path / ('AGT-2024-05-01' + codec.ARCHIVE_SUFFIX)
+    path.write_bytes(codec.encode(records))
+
+    expected = [dict({field: None for field in codec.FIELDS}, **record) for record in records]
+    assert codec.read_records(str(path)) == expected
+    _, present = codec.read_columns(str(path))
+    assert present['Moisture'].tolist() == [index not in (4, 9) for index in range(10)]
+
+def test_timestamp_strings_are_stored_as_timecodes():
+    records = [dict(_readings(1)[0], Timestamp='2024-05-01 10:00:00')]
+    columns, _ = codec.decode(codec.encode(records))
+    assert columns['Timestamp'].tolist() == [timecodes.parse('2024-05-01 10:00:00')]
+
+def test_empty_archive():
+    columns, present = codec.decode(codec.encode([]))
+    assert len(columns['Timestamp']) == 0 and len(present['Light']) == 0
+
+@pytest.mark.parametrize('change', [
+    {'Battery': 90},
+    {'Timestamp': None},
+    {'MAC': None},
+    {'Temperature': 22.55},
+    {'Moisture': 256},
+    {'Moisture': -1},
+    {'Light': 2 ** 32},
+    {'Conductivity': 70000},
+    {'Conductivity': 12.5},
+])
+def test_records_that_cannot_be_stored_losslessly_are_rejected(change):
+    records = _readings(3)
+    records[1].update(change)
+    with pytest.raises(ValueError):
+        codec.encode(records)
+
+def test_other_data_is_not_an_archive():
+    with pytest.raises(ValueError):
+        codec.decode(b'AGTRING2' + bytes(64))
@@ -0,0 +1,58 @@
+import os
+
+import pandas as pd
+import pytest
+
+from agt import data, timecodes
+from agt.store import ReadingLog
+
+MACS = ('c4:7c:8d:6d:24:9e', 'c4:7c:8d:6d:28:fa')
+
+def _reading(timestamp, mac=MACS[0], moisture=60):
+    return {'Timestamp': timecodes.parse(timestamp), 'MAC': mac, 'Temperature': 22.5, 'Moisture': moisture,
+            'Light': 700, 'Conductivity': 85}
+
+@pytest.fixture
+def roots(tmp_path):
+    root = str(tmp_path / 'read_files')
+    columnar_root = str(tmp_path / 'columnar')
+    log = ReadingLog(root)
+    for day in ('2024-05-01', '2024-05-02', '2024-05-03'):
+        for hour in range(0, 24, 6):
+            log.append([_reading('{} {:02d}:00:00'.format(day, hour), mac) for mac in MACS])
+    log.append([_reading('2024-05-03 12:30:00', moisture=None)])
+    log.close()
+    return root, columnar_root
+
+def test_days_are_found_from_folder_names(roots):
+    root, columnar_root = roots
+    os.makedirs(os.path.join(root, 'not-a-day'))
+    assert data.days(root=root, columnar_root=columnar_root) == ['2024-05-01', '2024-05-02', '2024-05-03']
+    assert data.days('2024-05-02', '2024-05-02', root, columnar_root) == ['2024-05-02']
+    assert data.latest_date(root, columnar_root) == '2024-05-03'
+
+def test_load_restricts_time_macs_and_columns(roots):
+    root, columnar_root = roots
+    frame = data.load('2024-05-02 06:00:00', '2024-05-02', macs=[MACS[1]], columns=['Timestamp', 'Moisture'],
+                      root=root, columnar_root=columnar_root)
+
+    assert list(frame.columns) == ['Timestamp', 'Moisture']
+    assert list(frame['Timestamp']) == [pd.Timestamp('2024-05-02 {:02d}:00:00'.format(hour)) for hour in (6, 12, 18)]
+    assert frame['Moisture'].dtype == 'int64'
+
+def test_missing_values_load_as_nan(roots):
+    root, columnar_root = roots
+    frame = data.load('2024-05-03 12:30:00', '2024-05-03 12:30:00', root=root, columnar_root=columnar_root)
+    assert len(frame) == 1 and frame['Moisture'].isna().all()
+
+def test_compacted_days_load_like_read_files(roots):
+    pytest.importorskip('pyarrow')
+    from agt import columnar
+
+    root, columnar_root = roots
+    expected = data.load(root=root, columnar_root=columnar_root)
+    columnar.compact(root, columnar_root)
+    assert all(columnar.is_compacted(day, root, columnar_root) for day in data.days(root=root))
+    assert data.days(root=root, columnar_root=columnar_root) == ['2024-05-01', '2024-05-02', '2024-05-03']
+
+    pd.testing.assert_frame_equal(data.load(root=root, columnar_root=columnar_root), expected, check_dtype=False)
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import pytest
+
+from agt import timecodes
+from agt.loader import BulkLoader
+
+MAC = 'c4:7c:8d:6d:24:9e'
+
+class _Connection(object):
+    '''DB-API connection of a table with a unique key on its first two columns, failing the `fail_at`th batch'''
+
+    def __init__(self, fail_at=None):
+        self.rows = {}
+        self.statements = []
+        self.commits = 0
+        self.fail_at = fail_at
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+class _Cursor(object):
+    def __init__(self, connection):
+        self._connection = connection
+        self.rowcount = -1
+
+    def executemany(self, sql, rows):
+        connection = self._connection
+        connection.statements.append(sql)
+        if len(connection.statements) == connection.fail_at:
+            raise ConnectionError('lost connection')
+        self.rowcount = 0
+        for row in rows:
+            if row[:2] not in connection.rows:
+                connection.rows[row[:2]] = row
+                self.rowcount += 1
+
+    def close(self):
+        pass
+
+def _readings(count):
+    return [{'Timestamp': timecodes.parse('2024-05-01 10:00:00') + index * timecodes.PER_MINUTE, 'MAC': MAC,
+             'Temperature': 22.5, 'Moisture': 60, 'Light': 700, 'Conductivity': None} for index in range(count)]
+
+def test_load_inserts_in_committed_batches():
+    connection = _Connection()
+    assert BulkLoader(connection, batch_size=4).load(iter(_readings(10))) == (10, 0)
+    assert connection.commits == 3
+    assert connection.statements[0] == ('INSERT IGNORE INTO AGT_READINGS '
+                                        '(TIMECODE, MAC, Temperature, Moisture, Light, Conductivity) '
+                                        'VALUES (%s, %s, %s, %s, %s, %s)')
+    assert connection.rows[(datetime(2024, 5, 1, 10, 0), MAC)] == (datetime(2024, 5, 1, 10, 0), MAC, 22.5, 60, 700, None)
+
+def test_loaded_readings_are_skipped():
+    connection = _Connection()
+    loader = BulkLoader(connection, batch_size=4)
+    loader.load(_readings(5))
+    assert loader.load(_readings(8)) == (3, 5)
+    assert len(connection.rows) == 8
+
+def test_failed_load_can_be_run_again():
+    connection = _Connection(fail_at=2)
+    with pytest.raises(ConnectionError):
+        BulkLoader(connection, batch_size=4).load(_readings(10))
+    assert len(connection.rows) == 4
+
+    assert BulkLoader(connection, batch_size=4).load(_readings(10)) == (6, 4)
+
+def test_timestamp_strings_are_loaded_as_datetimes():
+    connection = _Connection()
+    reading = dict(_readings(1)[0], Timestamp='2024-05-01 10:00:00')
+    BulkLoader(connection, table='SENSOR_READINGS', columns=('Timestamp', 'MAC', 'Temperature', 'Moisture',
+                                                              'Light', 'Conductivity')).load([reading])
+    assert connection.statements[0].startswith('INSERT IGNORE INTO SENSOR_READINGS (Timestamp, MAC,')
+    assert list(connection.rows) == [(datetime(2024, 5, 1, 10, 0), MAC)]
@@ -0,0 +1,98 @@
+import json
+import os
+
+from agt.manifest import IngestManifest
+from agt.store import AppendOnlyFile
+
+MAC = 'c4:7c:8d:6d:24:9e'
+
+def _readings(first, count):
+    return [{'Timestamp': 1714557600000000 + index * 60000000, 'MAC': MAC, 'Temperature': 22.5,
+             'Moisture': index, 'Light': 700, 'Conductivity': 85} for index in range(first, first + count)]
+
+def _append(path, records):
+    log = AppendOnlyFile(path)
+    log.append(records)
+    log.close()
+
+def _ingest(manifest, path):
+    records, state = manifest.read(path)
+    manifest.mark(path, state)
+    return [record['Moisture'] for record in records]
+
+def test_unchanged_file_is_skipped(tmp_path):
+    path = str(tmp_path / 'AGT-2024-05-01.jsonl')
+    _append(path, _readings(0, 3))
+    manifest = IngestManifest(str(tmp_path / 'manifest.json'))
+    assert _ingest(manifest, path) == [0, 1, 2]
+    assert manifest.read(path) == ([], None)
+    assert manifest.records(path) == 3
+
+def test_grown_log_resumes_after_save(tmp_path):
+    path = str(tmp_path / 'AGT-2024-05-01.jsonl')
+    manifest_path = str(tmp_path / 'manifest.json')
+    _append(path, _readings(0, 3))
+    manifest = IngestManifest(manifest_path)
+    _ingest(manifest, path)
+    manifest.save()
+
+    _append(path, _readings(3, 2))
+    with open(path, 'a') as f:
+        f.write(json.dumps(_readings(5, 1)[0])[:15])
+    manifest = IngestManifest(manifest_path)
+    assert _ingest(manifest, path) == [3, 4]
+    assert manifest.records(path) == 5
+
+    with open(path, 'a') as f:
+        f.write(json.dumps(_readings(5, 1)[0])[15:] + '\n')
+    assert _ingest(manifest, path) == [5]
+
+def test_unmarked_records_are_read_again(tmp_path):
+    path = str(tmp_path / 'AGT-2024-05-01.jsonl')
+    _append(path, _readings(0, 2))
+    manifest = IngestManifest(str(tmp_path / 'manifest.json'))
+    manifest.read(path)
+    assert _ingest(manifest, path) == [0, 1]
+
+def test_rewritten_log_is_read_from_the_start(tmp_path):
+    path = str(tmp_path / 'AGT-2024-05-01.jsonl')
+    _append(path, _readings(0, 3))
+    manifest = IngestManifest(str(tmp_path / 'manifest.json'))
+    _ingest(manifest, path)
+
+    # Same inode, longer, but the ingested part changed
+    with open(path, 'r+') as f:
+        f.write(json.dumps(dict(_readings(0, 1)[0], Moisture=9)))
+    _append(path, _readings(3, 1))
+    assert _ingest(manifest, path) == [9, 1, 2, 3]
+
+def test_replaced_log_is_read_from_the_start(tmp_path):
+    path = str(tmp_path / 'AGT-2024-05-01.jsonl')
+    _append(path, _readings(0, 3))
+    manifest = IngestManifest(str(tmp_path / 'manifest.json'))
+    _ingest(manifest, path)
+
+    _append(path + '.new', _readings(10, 4))
+    os.replace(path + '.new', path)
+    assert _ingest(manifest, path) == [10, 11, 12, 13]
+
+def test_legacy_json_file_is_read_again_only_when_its_content_changes(tmp_path):
+    path = str(tmp_path / 'AGT-2023-06-01.json')
+    with open(path, 'w') as f:
+        json.dump(_readings(0, 2), f)
+    manifest = IngestManifest(str(tmp_path / 'manifest.json'))
+    assert _ingest(manifest, path) == [0, 1]
+
+    os.utime(path, (0, 0))
+    assert _ingest(manifest, path) == []
+    with open(path, 'w') as f:
+        json.dump(_readings(0, 3), f)
+    assert _ingest(manifest, path) == [0, 1, 2]
+
+def test_unreadable_manifest_starts_empty(tmp_path):
+    manifest_path = str(tmp_path / 'manifest.json')
+    with open(manifest_path, 'w') as f:
+        f.write('{"version"')
+    path = str(tmp_path / 'AGT-2024-05-01.jsonl')
+    _append(path, _readings(0, 1))
+    assert _ingest(IngestManifest(manifest_path), path) == [0]
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from agt.ring import ReadingRing, RingFollower, to_records
+
+MAC = 'c4:7c:8d:6d:24:9e'
+
+def _readings(first, count):
+    return [{'Timestamp': 1714557600000000 + index * 60000000, 'MAC': MAC, 'Temperature': 22.5,
+             'Moisture': index % 100, 'Light': 700, 'Conductivity': 85} for index in range(first, first + count)]
+
+def test_read_returns_readings_after_sequence(tmp_path):
+    with ReadingRing(str(tmp_path / 'ring'), capacity=16, writable=True) as ring:
+        ring.append(_readings(0, 5))
+        sequence, readings = ring.read()
+        assert sequence == 5 and to_records(readings) == _readings(0, 5)
+
+        ring.append(_readings(5, 3))
+        sequence, readings = ring.read(since=5)
+        assert sequence == 8 and to_records(readings) == _readings(5, 3)
+        assert len(ring.read(since=8)[1]) == 0
+
+def test_read_keeps_newest_readings_when_overwritten(tmp_path):
+    with ReadingRing(str(tmp_path / 'ring'), capacity=8, writable=True) as ring:
+        ring.append(_readings(0, 5))
+        ring.append(_readings(5, 15))
+        sequence, readings = ring.read(since=3)
+        assert sequence == 20 and to_records(readings) == _readings(12, 8)
+
+def test_reader_cannot_append(tmp_path):
+    path = str(tmp_path / 'ring')
+    ReadingRing(path, capacity=8, writable=True).close()
+    with ReadingRing(path) as ring:
+        with pytest.raises(ValueError):
+            ring.append(_readings(0, 1))
+
+def test_follower_only_copies_new_readings(tmp_path):
+    path = str(tmp_path / 'ring')
+    follower = RingFollower(path)
+    assert follower.poll() == 0
+
+    with ReadingRing(path, capacity=8, writable=True) as ring:
+        ring.append(_readings(0, 3))
+        assert follower.poll() == 3
+        assert follower.poll() == 0
+        ring.append(_readings(3, 7))
+        assert follower.poll() == 7
+    assert to_records(follower.readings) == _readings(2, 8)
+
+    window = follower.window(seconds=120)
+    assert [record['Moisture'] for record in to_records(window)] == [7, 8, 9]
+    follower.close()
+
+def test_follower_starts_over_when_ring_is_recreated(tmp_path):
+    path = str(tmp_path / 'ring')
+    follower = RingFollower(path)
+    with ReadingRing(path, capacity=8, writable=True) as ring:
+        ring.append(_readings(0, 4))
+    follower.poll()
+
+    os.remove(path)
+    with ReadingRing(path, capacity=16, writable=True) as ring:
+        ring.append(_readings(10, 2))
+    assert follower.poll() == 2
+    assert to_records(follower.readings) == _readings(10, 2)
+    follower.close()
@@ -0,0 +1,31 @@
+import os
+
+from agt.schedule import AdaptiveScheduler, PlantProfile
+
+PROFILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tools', 'cherry-tomato')
+MAC = 'c4:7c:8d:6d:24:9e'
+
+def _reading(light):
+    return {'MAC': MAC, 'Temperature': 24.0, 'Moisture': 60, 'Light': light, 'Conductivity': 85}
+
+def test_light_outside_limits_does_not_block_backoff():
+    profile = PlantProfile(PROFILE)
+    assert not profile.within_limits(_reading(light=150))
+
+    scheduler = AdaptiveScheduler([MAC], profiles={MAC: profile}, min_interval=60, max_interval=1800, backoff=2.0)
+    now = 0.0
+    intervals = []
+    for _ in range(4):
+        scheduler.update(MAC, _reading(light=150), now)
+        intervals.append(scheduler.interval(MAC))
+        now += scheduler.interval(MAC)
+
+    assert intervals == [60, 120, 240, 480]
+
+def test_moisture_outside_limits_samples_at_min_interval():
+    scheduler = AdaptiveScheduler([MAC], profiles={MAC: PlantProfile(PROFILE)}, min_interval=60, backoff=2.0)
+    scheduler.update(MAC, _reading(light=700), 0.0)
+    scheduler.update(MAC, _reading(light=700), 60.0)
+    dry = dict(_reading(light=700), Moisture=10)
+    scheduler.update(MAC, dry, 180.0)
+    assert scheduler.interval(MAC) == 60
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+from agt import timecodes
+from agt.session import SessionArchive, iter_segment
+from agt.store import AppendOnlyFile, ReadingStore, iter_records
+
+MAC = 'c4:7c:8d:6d:24:9e'
+
+def _reading(timestamp, moisture=60):
+    return {'Timestamp': timecodes.parse(timestamp), 'MAC': MAC, 'Temperature': 22.0, 'Moisture': moisture,
+            'Light': 700, 'Conductivity': 85}
+
+def _session(path, readings):
+    log = AppendOnlyFile(path)
+    log.append(readings)
+    log.close()
+
+def test_rolls_over_on_size_and_age(tmp_path):
+    session = str(tmp_path / 'sesh.jsonl')
+    archive = SessionArchive(str(tmp_path / 'sessions'), max_bytes=10 ** 6, max_age=3600)
+    assert not archive.should_roll_over(session)
+
+    _session(session, [_reading('2024-05-01 10:00:00')])
+    assert not archive.should_roll_over(session, now=datetime(2024, 5, 1, 10, 30))
+    assert archive.should_roll_over(session, now=datetime(2024, 5, 1, 11, 0))
+    assert SessionArchive(str(tmp_path / 'sessions'), max_bytes=10).should_roll_over(session)
+
+def test_roll_over_writes_indexed_segment(tmp_path):
+    session = str(tmp_path / 'sesh.jsonl')
+    readings = [_reading('2024-05-01 10:00:00'), _reading('2024-05-01 10:05:00'), _reading('2024-05-01 10:10:00')]
+    _session(session, readings)
+    archive = SessionArchive(str(tmp_path / 'sessions'))
+
+    segment_path = archive.roll_over(session)
+    assert segment_path.endswith('sesh-20240501T100000-20240501T101000.jsonl.gz')
+    assert list(iter_segment(segment_path)) == readings
+    assert not (tmp_path / 'sesh.jsonl').exists()
+    assert archive.segments() == [(segment_path, {'first': readings[0]['Timestamp'],
+                                                  'last': readings[-1]['Timestamp'], 'count': 3, 'macs': {MAC: 3}})]
+    assert archive.roll_over(session) is None
+
+def test_store_starts_a_new_session_log_after_roll_over(tmp_path):
+    session = str(tmp_path / 'sesh.jsonl')
+    archive = SessionArchive(str(tmp_path / 'sessions'), max_bytes=1)
+    # Recent readings, the store applies the retention of the archive after a roll over
+    now = timecodes.now()
+    with ReadingStore(str(tmp_path / 'read_files'), session, ring_file=None, archive=archive) as store:
+        store.append([_reading(now)])
+        store.append([_reading(now + timecodes.PER_SECOND)])
+    assert [index['count'] for _, index in archive.segments()] == [1, 1]
+    assert not (tmp_path / 'sesh.jsonl').exists()
+
+def test_retention_downsamples_segments_then_hourly_files(tmp_path):
+    session = str(tmp_path / 'sesh.jsonl')
+    _session(session, [_reading('2024-05-01 10:00:00', moisture=40), _reading('2024-05-01 10:30:00', moisture=60),
+                       _reading('2024-05-01 11:00:00', moisture=None)])
+    archive = SessionArchive(str(tmp_path / 'sessions'), raw_days=30, hourly_days=365)
+    archive.roll_over(session)
+
+    archive.apply_retention(now=datetime(2024, 5, 20))
+    assert len(archive.segments()) == 1
+
+    archive.apply_retention(now=datetime(2024, 6, 15))
+    assert archive.segments() == []
+    hourly = list(iter_records(str(tmp_path / 'sessions' / 'hourly' / '2024-05-01.jsonl')))
+    assert [(record['Count'], record['Moisture']) for record in hourly] == [(2, 50.0), (1, None)]
+
+    archive.apply_retention(now=datetime(2025, 6, 15))
+    assert not (tmp_path / 'sessions' / 'hourly' / '2024-05-01.jsonl').exists()
+    daily = list(iter_records(str(tmp_path / 'sessions' / 'daily' / '2024.jsonl')))
+    assert [(record['Timestamp'], record['Count'], record['Moisture']) for record in daily] == [
+        (timecodes.parse('2024-05-01 00:00:00'), 3, 50.0)]
@@ -0,0 +1,69 @@
+import json
+import os
+
+from agt import timecodes
+from agt.store import AppendOnlyFile, ReadingLog, day_files, iter_readings, iter_records, segment_path
+
+MAC = 'c4:7c:8d:6d:24:9e'
+
+def _reading(timestamp, moisture=60):
+    return {'Timestamp': timecodes.parse(timestamp), 'MAC': MAC, 'Temperature': 22.5, 'Moisture': moisture,
+            'Light': 700, 'Conductivity': 85}
+
+def test_append_reopens_replaced_file(tmp_path):
+    path = str(tmp_path / 'log.jsonl')
+    log = AppendOnlyFile(path, sync_every=1)
+    log.append([_reading('2024-05-01 10:00:00')])
+    os.replace(path, path + '.old')
+    log.append([_reading('2024-05-01 10:01:00')])
+    log.close()
+
+    assert len(list(iter_records(path + '.old'))) == 1
+    assert [record['Timestamp'] for record in iter_records(path)] == [timecodes.parse('2024-05-01 10:01:00')]
+
+def test_append_after_reopening_keeps_records(tmp_path):
+    path = str(tmp_path / 'log.jsonl')
+    for minute in range(3):
+        log = AppendOnlyFile(path)
+        log.append([_reading('2024-05-01 10:0{}:00'.format(minute), moisture=minute)])
+        log.close()
+
+    assert [record['Moisture'] for record in iter_records(path)] == [0, 1, 2]
+
+def test_torn_last_line_is_skipped(tmp_path):
+    path = str(tmp_path / 'log.jsonl')
+    log = AppendOnlyFile(path)
+    log.append([_reading('2024-05-01 10:00:00'), _reading('2024-05-01 10:01:00')])
+    log.close()
+    with open(path, 'a') as f:
+        f.write(json.dumps(_reading('2024-05-01 10:02:00'))[:20])
+
+    assert len(list(iter_records(path))) == 2
+
+def test_unreadable_line_is_skipped(tmp_path):
+    path = str(tmp_path / 'log.jsonl')
+    with open(path, 'w') as f:
+        f.write(json.dumps(_reading('2024-05-01 10:00:00')) + '\n{"Timestamp": \n\n')
+        f.write(json.dumps(_reading('2024-05-01 10:01:00')) + '\n')
+
+    assert len(list(iter_records(path))) == 2
+
+def test_reading_log_splits_records_into_daily_segments(tmp_path):
+    root = str(tmp_path)
+    log = ReadingLog(root)
+    log.append([_reading('2024-05-01 23:59:00'), _reading('2024-05-02 00:00:00')])
+    log.append([_reading('2024-05-02 00:01:00')])
+    log.close()
+
+    assert day_files(root) == [segment_path(root, '2024-05-01'), segment_path(root, '2024-05-02')]
+    assert len(list(iter_records(segment_path(root, '2024-05-02')))) == 2
+    assert len(list(iter_readings(root))) == 3
+
+def test_legacy_json_list_files_are_read(tmp_path):
+    root = str(tmp_path)
+    os.makedirs(os.path.join(root, '2023-06-01'))
+    with open(os.path.join(root, '2023-06-01', 'AGT-2023-06-01.json'), 'w') as f:
+        json.dump([dict(_reading('2023-06-01 08:00:00'), Timestamp='2023-06-01 08:00:00')], f)
+
+    records = list(iter_readings(root))
+    assert [timecodes.parse(record['Timestamp']) for record in records] == [timecodes.parse('2023-06-01 08:00:00')]
@@ -0,0 +1,165 @@
+import time
+from contextlib import contextmanager
+
+from agt import timecodes
+from agt.store import ReadingLog
+from agt.sync import SyncWorker
+
+MACS = ('c4:7c:8d:6d:24:9e', 'c4:7c:8d:6d:28:fa', 'c4:7c:8d:6d:4e:df')
+
+class _Database(object):
+    '''
+    In-memory stand-in of the MySQL database for the statements of SyncWorker
+
+    The readings table exists with its primary key; readings are keyed by (time, MAC)
+    and watermarks by (table, MAC).
+    '''
+
+    def __init__(self):
+        self.readings = {}
+        self.watermarks = {}
+        self.connections = 0
+
+    @contextmanager
+    def connection(self):
+        self.connections += 1
+        yield _Connection(self)
+
+class _Connection(object):
+    def __init__(self, database):
+        self.database = database
+
+    def cursor(self):
+        return _Cursor(self.database)
+
+    def commit(self):
+        pass
+
+class _Cursor(object):
+    def __init__(self, database):
+        self._database = database
+        self._rows = []
+        self.rowcount = 0
+
+    def execute(self, sql, params=()):
+        database = self._database
+        if 'information_schema.TABLES' in sql:
+            self._rows = [(1,)]
+        elif 'information_schema.PARTITIONS' in sql:
+            self._rows = []
+        elif 'information_schema.STATISTICS' in sql:
+            self._rows = [('PRIMARY',)]
+        elif sql.startswith('SELECT COUNT(*) FROM AGT_SYNC_WATERMARKS'):
+            self._rows = [(sum(1 for table, _ in database.watermarks if table == params[0]),)]
+        elif sql.startswith('SELECT MAC, TIMECODE FROM AGT_SYNC_WATERMARKS'):
+            self._rows = [(mac, timecode) for (table, mac), timecode in database.watermarks.items()
+                          if table == params[0]]
+        elif sql.startswith('SELECT MAC, MAX(TIMECODE)'):
+            latest = {}
+            for time, mac in database.readings:
+                latest[mac] = max(latest.get(mac, time), time)
+            self._rows = list(latest.items())
+        elif not sql.startswith('CREATE TABLE IF NOT EXISTS AGT_SYNC_WATERMARKS'):
+            raise AssertionError('Unexpected statement ' + sql)
+
+    def executemany(self, sql, rows):
+        database = self._database
+        self.rowcount = 0
+        for row in rows:
+            if sql.startswith('INSERT IGNORE INTO AGT_READINGS'):
+                if row[:2] not in database.readings:
+                    database.readings[row[:2]] = row
+                    self.rowcount += 1
+            elif sql.startswith('INSERT IGNORE INTO AGT_SYNC_WATERMARKS'):
+                database.watermarks.setdefault(row[:2], row[2])
+            elif sql.startswith('INSERT INTO AGT_SYNC_WATERMARKS'):
+                database.watermarks[row[:2]] = max(database.watermarks.get(row[:2], row[2]), row[2])
+            else:
+                raise AssertionError('Unexpected statement ' + sql)
+
+    def fetchone(self):
+        return self._rows[0]
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+def _reading(timestamp, mac=MACS[0]):
+    return {'Timestamp': timecodes.parse(timestamp), 'MAC': mac, 'Temperature': 22.5, 'Moisture': 60,
+            'Light': 700, 'Conductivity': 85}
+
+def _append(root, readings):
+    log = ReadingLog(root)
+    log.append(readings)
+    log.close()
+
+def _hours(day, hours, mac=MACS[0]):
+    return [_reading('{} {:02d}:00:00'.format(day, hour), mac) for hour in hours]
+
+def test_sync_resumes_from_the_watermarks(tmp_path):
+    root = str(tmp_path)
+    database = _Database()
+    _append(root, _hours('2024-05-01', range(5)) + _hours('2024-05-01', range(3), MACS[1]))
+
+    worker = SyncWorker(database, root=root, batch_size=3)
+    assert worker.sync_once() == 8
+    assert worker.sync_once() == 0
+    assert database.watermarks[('AGT_READINGS', MACS[0])] == _reading('2024-05-01 04:00:00')['Timestamp']
+
+    _append(root, _hours('2024-05-01', range(5, 7)) + _hours('2024-05-02', range(2)))
+    # A new worker, as after a restart, only sends what the database does not hold
+    worker = SyncWorker(database, root=root)
+    assert worker.sync_once() == 4
+    assert len(database.readings) == 12
+
+def test_watermarks_are_seeded_from_the_readings_table(tmp_path):
+    root = str(tmp_path)
+    database = _Database()
+    _append(root, _hours('2024-05-01', range(6)))
+    for reading in _hours('2024-05-01', range(4)):
+        database.readings[(timecodes.to_datetime(reading['Timestamp']), reading['MAC'])] = ()
+
+    assert SyncWorker(database, root=root).sync_once() == 2
+
+def test_only_configured_macs_are_synced(tmp_path):
+    root = str(tmp_path)
+    database = _Database()
+    _append(root, _hours('2024-05-01', range(3)) + _hours('2024-05-01', range(3), MACS[1]))
+
+    assert SyncWorker(database, root=root, macs=[MACS[1]]).sync_once() == 3
+    assert {mac for _, mac in database.readings} == {MACS[1]}
+
+def test_silent_sensor_does_not_pin_the_scan(tmp_path):
+    root = str(tmp_path)
+    database = _Database()
+    _append(root, _hours('2024-04-01', range(2), MACS[2]) + _hours('2024-05-01', range(2)))
+    worker = SyncWorker(database, root=root, lookback=24 * timecodes.PER_HOUR)
+    assert worker.sync_once() == 4
+
+    # The retired sensor's watermark is a month old: the scan starts at the day of the active one
+    _append(root, _hours('2024-04-02', range(1), MACS[2]) + _hours('2024-05-01', range(2, 4)))
+    scanned = []
+    read_log = worker._read_log
+
+    def recording_read_log(path, start, active):
+        scanned.append(path)
+        return read_log(path, start, active)
+
+    worker._read_log = recording_read_log
+    assert worker.sync_once() == 2
+    assert [path[len(root) + 1:len(root) + 11] for path in scanned] == ['2024-05-01']
+
+def test_stop_interrupts_the_retry_backoff(tmp_path):
+    class _Unreachable(object):
+        def connection(self):
+            raise ConnectionError('database unreachable')
+
+    worker = SyncWorker(_Unreachable(), root=str(tmp_path), interval=60, max_backoff=600)
+    worker.start()
+    time.sleep(0.1)
+    started = time.monotonic()
+    worker.stop(timeout=5)
+    assert time.monotonic() - started < 5
+    assert worker.synced == 0
@@ -0,0 +1,33 @@
+from datetime import date, datetime
+
+import numpy as np
+
+from agt import timecodes
+
+def test_datetimes_round_trip():
+    value = datetime(2024, 3, 10, 2, 30, 15, 250000)
+    timecode = timecodes.from_datetime(value)
+    assert timecode == 1710037815250000
+    assert timecodes.to_datetime(timecode) == value
+
+def test_parse_accepts_every_timestamp_form():
+    timecode = timecodes.from_datetime(datetime(2024, 5, 1, 10, 0))
+    assert timecodes.parse(timecode) == timecode
+    assert timecodes.parse('2024-05-01 10:00:00') == timecode
+    assert timecodes.parse(datetime(2024, 5, 1, 10, 0)) == timecode
+    assert timecodes.parse(date(2024, 5, 1)) == timecode - 10 * timecodes.PER_HOUR
+    assert timecodes.parse(None) is None
+
+def test_date_key_of_strings_and_timecodes():
+    assert timecodes.date_key('2024-05-01 23:59:59') == '2024-05-01'
+    assert timecodes.date_key(timecodes.parse('2024-05-01 23:59:59')) == '2024-05-01'
+    assert timecodes.date_key(timecodes.parse('2024-05-02 00:00:00')) == '2024-05-02'
+
+def test_vectorized_conversions_match_parse():
+    values = ['2024-05-01 10:00:00', timecodes.parse('2024-05-01 10:00:01'), None]
+    parsed = timecodes.parse_many(values[:2])
+    assert parsed.dtype == np.int64
+    assert parsed.tolist() == [timecodes.parse(value) for value in values[:2]]
+    assert np.isnat(timecodes.to_datetime64(values)[2])
+    assert timecodes.format_many(parsed).tolist() == ['2024-05-01 10:00:00', '2024-05-01 10:00:01']
+    assert timecodes.to_string(parsed[0]) == '2024-05-01 10:00:00'
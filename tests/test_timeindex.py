@@ -0,0 +1,78 @@
+import json
+import os
+
+from agt import timecodes
+from agt.store import AppendOnlyFile
+from agt.timeindex import TimeIndex, index_path, read_range
+
+MACS = ('c4:7c:8d:6d:24:9e', 'c4:7c:8d:6d:28:fa')
+START = timecodes.parse('2024-05-01 00:00:00')
+
+def _reading(minute, mac=MACS[0]):
+    return {'Timestamp': START + minute * timecodes.PER_MINUTE, 'MAC': mac, 'Temperature': 22.5,
+            'Moisture': minute % 100, 'Light': 700, 'Conductivity': 85}
+
+def _segment(tmp_path, readings):
+    path = str(tmp_path / 'AGT-2024-05-01.jsonl')
+    segment = AppendOnlyFile(path, index=True)
+    segment.append(readings)
+    segment.close()
+    return path
+
+def _minutes(records):
+    return [(record['Timestamp'] - START) // timecodes.PER_MINUTE for record in records]
+
+def test_range_seeks_to_its_first_minute(tmp_path):
+    path = _segment(tmp_path, [_reading(minute) for minute in range(120)])
+    index = TimeIndex.load(path)
+    assert index.loaded_size == index.size == os.path.getsize(path)
+
+    offset = index.offset(START + 60 * timecodes.PER_MINUTE)
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        assert json.loads(f.readline()) == _reading(60)
+
+    records = read_range(path, START + 60 * timecodes.PER_MINUTE, START + 65 * timecodes.PER_MINUTE)
+    assert _minutes(records) == [60, 61, 62, 63, 64, 65]
+    records = read_range(path, START + 60 * timecodes.PER_MINUTE, START + 65 * timecodes.PER_MINUTE, inclusive=False)
+    assert _minutes(records) == [60, 61, 62, 63, 64]
+
+def test_segments_outside_the_range_or_macs_are_skipped(tmp_path):
+    path = _segment(tmp_path, [_reading(minute) for minute in range(10)])
+    assert list(read_range(path, start=START + 10 * timecodes.PER_MINUTE)) == []
+    assert list(read_range(path, end=START - 1)) == []
+    assert list(read_range(path, macs=[MACS[1]])) == []
+    assert _minutes(read_range(path, macs=[MACS[0]])) == list(range(10))
+
+def test_out_of_order_segments_are_scanned_in_full(tmp_path):
+    path = _segment(tmp_path, [_reading(minute) for minute in (5, 6, 7, 1, 2, 8)])
+    index = TimeIndex.load(path)
+    assert not index.ordered and index.offset(START + 6 * timecodes.PER_MINUTE) == 0
+    assert _minutes(read_range(path, START + 2 * timecodes.PER_MINUTE, START + 6 * timecodes.PER_MINUTE)) == [5, 6, 2]
+
+def test_index_catches_up_with_unindexed_appends(tmp_path):
+    path = _segment(tmp_path, [_reading(minute) for minute in range(5)])
+    with open(path, 'a') as f:
+        f.write(json.dumps(_reading(5, MACS[1])) + '\n' + json.dumps(_reading(6))[:10])
+
+    index = TimeIndex.load(path)
+    assert index.macs == {MACS[0]: 5, MACS[1]: 1}
+    assert index.size < os.path.getsize(path)
+    assert _minutes(read_range(path, macs=[MACS[1]])) == [5]
+
+def test_index_is_rebuilt_when_segment_is_replaced(tmp_path):
+    path = _segment(tmp_path, [_reading(minute) for minute in range(5)])
+    with open(path + '.new', 'w') as f:
+        f.write(json.dumps(_reading(30)) + '\n')
+    os.replace(path + '.new', path)
+
+    assert os.path.exists(index_path(path))
+    index = TimeIndex.load(path)
+    assert (index.first, index.last) == (_reading(30)['Timestamp'], _reading(30)['Timestamp'])
+    assert _minutes(read_range(path)) == [30]
+
+def test_unreadable_index_is_rebuilt(tmp_path):
+    path = _segment(tmp_path, [_reading(minute) for minute in range(3)])
+    with open(index_path(path), 'w') as f:
+        f.write('{"version": ')
+    assert TimeIndex.load(path).macs == {MACS[0]: 3}
@@ -0,0 +1,99 @@
+import json
+import os
+from threading import Event
+
+from agt.store import iter_records
+from agt.writer import BackgroundWriter
+
+MAC = 'c4:7c:8d:6d:24:9e'
+
+def _readings(first, count):
+    return [{'Timestamp': 1714557600000000 + index * 60000000, 'MAC': MAC, 'Temperature': 22.5,
+             'Moisture': index, 'Light': 700, 'Conductivity': 85} for index in range(first, first + count)]
+
+class _Store(object):
+    '''Collects appended records, failing the first `failures` appends and waiting for `release`'''
+
+    def __init__(self, failures=0, release=None):
+        self.records = []
+        self.failures = failures
+        self.release = release
+        self.closed = False
+
+    def append(self, records):
+        if self.release is not None:
+            self.release.wait(5)
+        if self.failures:
+            self.failures -= 1
+            raise OSError('disk full')
+        self.records.extend(records)
+
+    def close(self):
+        self.closed = True
+
+class _FailingSink(_Store):
+    def write(self, records):
+        raise ConnectionError('database unreachable')
+
+def _moistures(records):
+    return sorted(record['Moisture'] for record in records)
+
+def test_records_reach_store_and_sinks(tmp_path):
+    store, sink = _Store(), _Store()
+    sink.write = sink.append
+    with BackgroundWriter(store, sinks=[sink], spill_file=str(tmp_path / 'pending.jsonl')) as writer:
+        writer.append(_readings(0, 3))
+        writer.append(_readings(3, 2))
+        writer.flush()
+        assert _moistures(store.records) == list(range(5))
+    assert sink.records == store.records
+    assert store.closed and sink.closed
+
+def test_failed_store_writes_are_spilled_and_replayed(tmp_path):
+    spill_file = str(tmp_path / 'pending.jsonl')
+    store = _Store(failures=1)
+    with BackgroundWriter(store, spill_file=spill_file) as writer:
+        writer.append(_readings(0, 3))
+        writer.flush()
+        assert store.records == [] and len(list(iter_records(spill_file))) == 3
+
+        writer.append(_readings(3, 1))
+        writer.flush()
+    assert _moistures(store.records) == list(range(4))
+    assert not os.path.exists(spill_file)
+
+def test_full_queue_spills_instead_of_dropping(tmp_path):
+    spill_file = str(tmp_path / 'pending.jsonl')
+    release = Event()
+    store = _Store(release=release)
+    writer = BackgroundWriter(store, queue_size=1, put_timeout=0.01, spill_file=spill_file)
+    for first in range(0, 10, 2):
+        writer.append(_readings(first, 2))
+    assert len(list(iter_records(spill_file))) > 0
+
+    release.set()
+    writer.close()
+    assert _moistures(store.records) == list(range(10))
+
+def test_spill_left_by_previous_writer_is_replayed_on_start(tmp_path):
+    spill_file = str(tmp_path / 'pending.jsonl')
+    with open(spill_file, 'w') as f:
+        f.writelines(json.dumps(record) + '\n' for record in _readings(0, 2))
+    with open(spill_file + '.replay', 'w') as f:
+        f.writelines(json.dumps(record) + '\n' for record in _readings(2, 2))
+
+    store = _Store()
+    with BackgroundWriter(store, spill_file=spill_file) as writer:
+        writer.append(_readings(4, 1))
+        writer.flush()
+    assert _moistures(store.records) == list(range(5))
+    assert not os.path.exists(spill_file) and not os.path.exists(spill_file + '.replay')
+
+def test_failing_sink_does_not_spill(tmp_path):
+    spill_file = str(tmp_path / 'pending.jsonl')
+    store = _Store()
+    with BackgroundWriter(store, sinks=[_FailingSink()], spill_file=spill_file) as writer:
+        writer.append(_readings(0, 2))
+        writer.flush()
+    assert len(store.records) == 2
+    assert not os.path.exists(spill_file)
@@ -3,33 +3,27 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.cluster import KMeans
 from datetime import datetime
-import glob
 import os
+import sys
 import time
 import threading
 from tqdm import tqdm
 
-# Function to load all .json files from the main folder and subfolders
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agt import columnar
+from agt.data import load as load_readings
+
+# Function to load every reading, compacting new read files into the columnar store first
 def load_all_files():
-    base_dir = "files/read_files/"
-    
-    # Collect all JSON files from the base directory and all subdirectories
-    files = glob.glob(os.path.join(base_dir, '**', '*.json'), recursive=True)
-    
-    if not files:
-        print("No JSON files found in the specified directories.")
+    compacted = columnar.compact()
+    print(f"Compacted {len(compacted)} new or updated days into {columnar.COLUMNAR_DIR}")
+
+    data = load_readings(columns=['Timestamp', 'Temperature', 'Moisture', 'Light', 'Conductivity'])
+    if data.empty:
+        print("No readings found.")
         return None
 
-    data_list = []
-    print("Files being analyzed:")
-    for file in files:
-        print(f" - {file}")  # Print the file name
-        temp_data = pd.read_json(file)
-        temp_data['Timestamp'] = pd.to_datetime(temp_data['Timestamp'])
-        data_list.append(temp_data)
-    
-    # Append all data into a single DataFrame
-    data = pd.concat(data_list, ignore_index=True)
+    print(f"Readings being analyzed: {len(data)}")
     return data
 
 # Timer function to count down and close plots
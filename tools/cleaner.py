@@ -107,7 +107,7 @@ def main():
     
     ]
 
-    files_list = [os.path.join(project_root, 'sesh.json')]
+    files_list = [os.path.join(project_root, 'sesh.jsonl')]
 
     while True:
         print_menu()
@@ -13,11 +13,11 @@ class MandelbrotVisualizer:
         
     def load_data(self):
         try:
-            self.data = pd.read_json('sesh.json')
-            print("Successfully loaded sesh.json")
+            self.data = pd.read_json('sesh.jsonl', lines=True)
+            print("Successfully loaded sesh.jsonl")
             return True
         except FileNotFoundError:
-            print("Error: sesh.json not found!")
+            print("Error: sesh.jsonl not found!")
             return False
             
     def mandelbrot(self, h, w, max_iter, zoom, center):
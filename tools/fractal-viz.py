@@ -2,11 +2,15 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 import pandas as pd
-import glob
 import os
+import sys
 from matplotlib.colors import LinearSegmentedColormap
 from tqdm import tqdm
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agt import columnar
+from agt.data import load as load_readings
+
 class FractalDataVisualizer:
     def __init__(self):
         self.fig, self.ax = plt.subplots(figsize=(10, 10))
@@ -16,21 +20,14 @@ class FractalDataVisualizer:
         self.normalized_values = None
         
     def load_all_files(self):
-        base_dir = "files/read_files/"
-        files = glob.glob(os.path.join(base_dir, '**', '*.json'), recursive=True)
-        
-        if not files:
-            print("No JSON files found in the specified directories.")
+        columnar.compact()
+        self.data = load_readings(columns=['Temperature', 'Moisture', 'Light', 'Conductivity'])
+
+        if self.data.empty:
+            print("No readings found.")
             return None
 
-        data_list = []
-        print("Loading files for fractal animation:")
-        for file in files:
-            print(f" - {file}")
-            temp_data = pd.read_json(file)
-            data_list.append(temp_data)
-        
-        self.data = pd.concat(data_list, ignore_index=True)
+        print(f"Loaded {len(self.data)} readings for fractal animation")
         
         # Normalize numerical columns for fractal parameters
         numerical_columns = self.data.select_dtypes(include=[np.number]).columns
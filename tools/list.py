@@ -3,39 +3,28 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.cluster import KMeans
 from datetime import datetime
-import glob
 import os
+import sys
 import time
 import threading
 from tqdm import tqdm
 
-# Function to load all .json files from the main folder and subfolders
-def load_all_files():
-    base_dir = "files/read_files/"
-    
-    # Collect all JSON files from the base directory and all subdirectories
-    files = glob.glob(os.path.join(base_dir, '**', '*.json'), recursive=True)
-    
-    if not files:
-        print("No JSON files found in the specified directories.")
-        return None
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agt import columnar
+from agt.data import load as load_readings
 
-    data_list = []
-    print("Files being analyzed:")
-    for file in files:
-        print(f" - {file}")  # Print the file name
-        temp_data = pd.read_json(file)
+# Function to load every reading, compacting new read files into the columnar store first
+def load_all_files():
+    compacted = columnar.compact()
+    print(f"Compacted {len(compacted)} new or updated days into {columnar.COLUMNAR_DIR}")
 
-        # Convert 'Timestamp' column to datetime if it isn't already
-        temp_data['Timestamp'] = pd.to_datetime(temp_data['Timestamp'])
+    data = load_readings()
+    if data.empty:
+        print("No readings found.")
+        return None
 
-        # Replace the 'Timestamp' column with the desired format: 'YYYY:MM:DD:hh:mm:ss:SSS'
-        temp_data['Timestamp'] = temp_data['Timestamp'].dt.strftime('%Y:%m:%d:%H:%M:%S')[:-3]
-        
-        data_list.append(temp_data)
-    
-    # Append all data into a single DataFrame
-    data = pd.concat(data_list, ignore_index=True)
+    # Replace the 'Timestamp' column with the desired format: 'YYYY:MM:DD:hh:mm:ss:SSS'
+    data['Timestamp'] = data['Timestamp'].dt.strftime('%Y:%m:%d:%H:%M:%S')
     return data
 
 # Function to display data 50 rows at a time
@@ -4,8 +4,8 @@ from mpl_toolkits.mplot3d import Axes3D
 import statsmodels.api as sm
 
 # Load the JSON data from the file
-with open('sesh.json') as f:
-    data = json.load(f)
+with open('sesh.jsonl') as f:
+    data = [json.loads(line) for line in f if line.strip()]
 
 # Convert timestamp to integer if necessary
 for i in range(len(data)):
@@ -10,6 +10,9 @@ from datetime import datetime, timedelta
 import torch.optim as optim
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+from agt import data
 from nn import SoilHealthPredictor
 from sklearn.metrics import r2_score
 
@@ -49,55 +52,21 @@ np.random.seed(20)
 X_train = torch.tensor(features, dtype=torch.float32)
 y_train = torch.tensor(targets, dtype=torch.float32)
 
-current_day = datetime.now().day
-
-num_days_loaded = 0
-num_days_missing = 0
-
-# Initialize some things
-test_data = []
-num_days_loaded = 0
-num_days_missing = 0
-
 # Get today's date
 today = datetime.now()
 
-# Load the past 30 days of test data
-for i in range(1, 15):
-    # Calculate the date for each file
-    test_date = today - timedelta(days=i)
-    
-    # Format the date as a string in the desired format
-    # date_string = test_date.strftime('%Y-%m-%d')
-
-    date_string = '2024-02-29'
-
-    filename = f'files/read_files/{date_string}/AGT-{date_string}.json'
-    
-    if os.path.isfile(filename):
-        with open(filename, 'r') as f:
-            day_data = json.load(f)
-            test_data.extend(day_data)
-            num_days_loaded += 1
-    else:
-        num_days_missing += 1
-
-print(f"Loaded {num_days_loaded} days of data out of {i} days expected.")
-if num_days_missing > 0:
-    print(f"Data not found for {num_days_missing} day(s).")
+# Load the past 14 days of test data, only the day folders in that range are read
+# test_start, test_end = today - timedelta(days=14), today - timedelta(days=1)
+test_start = test_end = '2024-02-29'
+test_data = data.load(test_start, test_end, columns=['Timestamp', 'Temperature', 'Moisture', 'Light', 'Conductivity'])
 
-test_features = []
-test_targets = []
+num_days_loaded = test_data['Timestamp'].dt.date.nunique()
+print(f"Loaded {len(test_data)} readings from {num_days_loaded} day(s) of data.")
+if test_data.empty:
+    print("Data not found for the requested days.")
 
-for entry in test_data:
-    test_features.append([
-        entry["Light"], entry["Moisture"], entry["Conductivity"],
-        entry["Temperature"]
-    ])
-    test_targets.append([
-        entry["Temperature"], entry["Moisture"], entry["Light"],
-        entry["Conductivity"]
-    ])
+test_features = test_data[['Light', 'Moisture', 'Conductivity', 'Temperature']].to_numpy()
+test_targets = test_data[['Temperature', 'Moisture', 'Light', 'Conductivity']].to_numpy()
 
 test_features = scaler.transform(test_features)  # use the same scaler to ensure the same scale is used
 
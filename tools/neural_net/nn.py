@@ -1,3 +1,5 @@
+import os
+import sys
 import torch
 import json
 import torch.nn as nn
@@ -10,6 +12,9 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from agt import data
+
 print('Testing neural net file...')
 # Build input, hidden and output layers with PyTorch
 class SoilHealthPredictor(nn.Module):
@@ -34,27 +39,11 @@ criterion = nn.MSELoss()
 optimizer = optim.Adam(model.parameters(), lr=0.01)
 
 # Load spider plant ideal dataset
-ideal_data = []
-for i in range(1, 10):
-    with open(
-            f'files/read_files/2023-04-{i:02d}/AGT-2023-04-{i:02d}.json',
-            'r') as f:
-        day_data = json.load(f)
-        ideal_data.extend(day_data)
+ideal_data = data.load('2023-04-01', '2023-04-09', columns=['Temperature', 'Moisture', 'Light', 'Conductivity'])
 
 # Extract features and normalize
-features = []
-targets = []
-
-for entry in ideal_data:
-    features.append([
-        entry["Light"], entry["Moisture"], entry["Conductivity"],
-        entry["Temperature"]
-    ])
-    targets.append([
-        entry["Temperature"], entry["Moisture"], entry["Light"],
-        entry["Conductivity"]
-    ])
+features = ideal_data[['Light', 'Moisture', 'Conductivity', 'Temperature']].to_numpy()
+targets = ideal_data[['Temperature', 'Moisture', 'Light', 'Conductivity']].to_numpy()
 
 scaler = StandardScaler()
 features = scaler.fit_transform(features)
@@ -1,7 +1,10 @@
 import os
+import sys
 import json
 import matplotlib.pyplot as plt
-from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from agt import data
 
 def plot_sensor_data(data, title):
     # Extract timestamps and sensor data
@@ -46,21 +49,9 @@ def plot_sensor_data(data, title):
     plt.tight_layout()
     plt.show()
 
-# Read from date folders and json files
-read_files_dir = './files/read_files/'
-
-# Find the most recent folder
-latest_data = max(
-    [f for f in os.listdir(read_files_dir) if os.path.isdir(os.path.join(read_files_dir, f))],
-    key=lambda date_str: datetime.strptime(date_str, '%Y-%m-%d')
-)
-
-# Construct the path to the most recent JSON file
-test_json_file_path = os.path.join(read_files_dir, latest_data, f'AGT-{latest_data}.json')
-
-# Load and plot test data
-with open(test_json_file_path, 'r') as file:
-    test_data = json.load(file)
+# Load and plot the readings of the most recent day
+latest_data = data.latest_date()
+test_data = data.load(latest_data, latest_data).to_dict('records')
 plot_sensor_data(test_data, 'Test Data Average')
 
 # Load and plot control data
@@ -1,26 +1,18 @@
 import os
-from datetime import datetime
+import sys
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from agt import data
+
 # Load data from the static test JSON file
 test = pd.read_json("./files/batches/t_parsley.json")
 
-# Dynamic loading of the most recent control JSON file
-read_files_dir = './files/read_files/'
-
-# Find the most recent folder
-latest_data = max(
-    [f for f in os.listdir(read_files_dir) if os.path.isdir(os.path.join(read_files_dir, f))],
-    key=lambda date_str: datetime.strptime(date_str, '%Y-%m-%d')
-)
-
-# Construct the path to the most recent JSON file
-control_json_file_path = os.path.join(read_files_dir, latest_data, f'AGT-{latest_data}.json')
-
-# Load the most recent control JSON file
-control = pd.read_json(control_json_file_path)
+# Load the readings of the most recent day as control data
+latest_data = data.latest_date()
+control = data.load(latest_data, latest_data)
 
 # Combine the data from both DataFrames
 df = pd.concat([test, control], ignore_index=True)
@@ -4,7 +4,7 @@ import pandas as pd
 # Display historical dsata as dataframe
 
 # reading the file
-data = pd.read_json("sesh.json")
+data = pd.read_json("sesh.jsonl", lines=True)
   
 # displaying the DataFrame
 print(data)
\ No newline at end of file
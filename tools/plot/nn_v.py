@@ -4,8 +4,8 @@ import numpy as np
 import statsmodels.api as sm
 
 # Prepare train data for input
-with open('sesh.json', 'r') as f:
-    input_data = json.load(f)
+with open('sesh.jsonl', 'r') as f:
+    input_data = [json.loads(line) for line in f if line.strip()]
 
 samples = []
 for d in input_data:
@@ -1,8 +1,11 @@
 import os
+import sys
 import json
 import matplotlib.pyplot as plt
 import pandas as pd
-from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from agt import data
 
 def plot_sensor_data(test_data, control_data, title):
     # Convert to DataFrames for easy manipulation
@@ -67,22 +70,9 @@ def plot_sensor_data(test_data, control_data, title):
     plt.tight_layout()
     plt.show()
 
-# Load test data
-# Directory where the JSON files are stored
-read_files_dir = './files/read_files/'
-
-# Find the most recent folder
-latest_folder = max(
-    [f for f in os.listdir(read_files_dir) if os.path.isdir(os.path.join(read_files_dir, f))],
-    key=lambda date_str: datetime.strptime(date_str, '%Y-%m-%d')
-)
-
-# Construct the path to the most recent JSON file within that folder
-test_json_file_path = os.path.join(read_files_dir, latest_folder, f'AGT-{latest_folder}.json')
-
-# Load the most recent test data
-with open(test_json_file_path, 'r') as file:
-    test_data = json.load(file)
+# Load the most recent day of test data
+latest_folder = data.latest_date()
+test_data = data.load(latest_folder, latest_folder)
 
 # Load control data
 control_json_file_path = './files/batches/t_parsley.json'
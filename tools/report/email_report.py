@@ -56,8 +56,8 @@ def send_email(graph_image_path, to_email, from_email, password):
 
 def send_averages_email():
     # Read the saved data
-    with open('sesh.json', 'r') as f:
-        data = json.load(f)
+    with open('sesh.jsonl', 'r') as f:
+        data = [json.loads(line) for line in f if line.strip()]
     df = pd.DataFrame(data)
 
     # Calculate averages and create a bar graph
@@ -4,8 +4,8 @@ import os
 from datetime import datetime
 
 # Load the JSON data from the file
-with open('sesh.json') as f:
-    data = json.load(f)
+with open('sesh.jsonl') as f:
+    data = [json.loads(line) for line in f if line.strip()]
 
 # Convert timestamp to integer if necessary
 for i in range(len(data)):
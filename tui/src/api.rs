@@ -1,9 +1,19 @@
 use warp::Filter;
-use chrono::{NaiveDateTime, Utc, Duration, TimeZone};
+use chrono::{DateTime, NaiveDateTime, Utc, Duration, TimeZone};
 use serde::{Deserialize, Serialize};
-use std::fs;
+use std::collections::VecDeque;
+use std::fs::{self, File};
+use std::io::{Read, Seek, SeekFrom};
+use std::os::unix::fs::MetadataExt;
+use std::sync::{Mutex, OnceLock};
 use serde_json::Value;
 
+// Live reading ring written by the sampler, see agt/ring.py for the layout
+const RING_FILE: &str = "files/cache/sesh.ring";
+const RING_MAGIC: &[u8] = b"AGTRING2";
+const RING_HEADER_SIZE: usize = 64;
+const RING_SLOT_SIZE: usize = 48;
+
 #[derive(Serialize, Deserialize)]
 pub struct SensorData {
     pub timestamp: String,
@@ -17,7 +27,10 @@ pub struct SensorData {
 pub fn sensor_data_route() -> impl Filter<Extract = impl warp::Reply, Error = warp::Rejection> + Clone {
     warp::path!("api" / "sensor_data")
         .map(|| {
-            let file_path = "sesh.json";
+            if let Ok(filtered_data) = get_ring_sensor_data(RING_FILE) {
+                return warp::reply::json(&filtered_data);
+            }
+            let file_path = "sesh.jsonl";
             match get_filtered_sensor_data(file_path) {
                 Ok(filtered_data) => warp::reply::json(&filtered_data),
                 Err(_) => warp::reply::json(&Vec::<SensorData>::new()),
@@ -25,33 +38,173 @@ pub fn sensor_data_route() -> impl Filter<Extract = impl warp::Reply, Error = wa
         })
 }
 
+fn get_ring_sensor_data(file_path: &str) -> Result<Vec<SensorData>, Box<dyn std::error::Error>> {
+    let follower = RING_FOLLOWER.get_or_init(|| Mutex::new(RingFollower::default()));
+    let mut follower = follower.lock().unwrap_or_else(|poisoned| poisoned.into_inner());
+    follower.poll(file_path)?;
+
+    let twenty_four_hours_ago = Utc::now() - Duration::hours(24);
+    let mut filtered_data = Vec::new();
+    for reading in &follower.readings {
+        // Timecode: microseconds since 1970-01-01 of the local wall-clock time
+        let timestamp = match DateTime::from_timestamp_micros(reading.timecode) {
+            Some(timestamp) => timestamp.naive_utc(),
+            None => continue,
+        };
+        let timestamp_utc = Utc.from_local_datetime(&timestamp).unwrap();
+        if timestamp_utc < twenty_four_hours_ago {
+            continue;
+        }
+        filtered_data.push(SensorData {
+            timestamp: timestamp_utc.to_string(),
+            mac_address: reading.mac_address.clone(),
+            temperature: reading.temperature,
+            light: reading.light,
+            moisture: reading.moisture,
+            conductivity: reading.conductivity,
+        });
+    }
+
+    Ok(filtered_data)
+}
+
+// Copy of the readings of the ring kept between requests, like agt.ring.RingFollower:
+// a request only reads the ring header and the slots written since the previous one
+#[derive(Default)]
+struct RingFollower {
+    inode: u64,
+    sequence: u64,
+    readings: VecDeque<RingReading>,
+}
+
+struct RingReading {
+    timecode: i64,
+    mac_address: String,
+    temperature: f64,
+    light: f64,
+    moisture: f64,
+    conductivity: f64,
+}
+
+static RING_FOLLOWER: OnceLock<Mutex<RingFollower>> = OnceLock::new();
+
+impl RingFollower {
+    fn poll(&mut self, file_path: &str) -> Result<(), Box<dyn std::error::Error>> {
+        let mut file = File::open(file_path)?;
+        let metadata = file.metadata()?;
+        let mut header = [0u8; RING_HEADER_SIZE];
+        file.read_exact(&mut header)?;
+        if &header[0..8] != RING_MAGIC {
+            return Err("not a reading ring".into());
+        }
+
+        let slot_size = u32::from_le_bytes(header[8..12].try_into()?) as usize;
+        let capacity = u32::from_le_bytes(header[12..16].try_into()?) as u64;
+        let sequence = u64::from_le_bytes(header[16..24].try_into()?);
+        if slot_size != RING_SLOT_SIZE || capacity == 0
+            || metadata.len() < (RING_HEADER_SIZE + capacity as usize * slot_size) as u64 {
+            return Err("not a reading ring".into());
+        }
+
+        if metadata.ino() != self.inode || sequence < self.sequence {
+            // The ring was recreated or reset, start over
+            self.inode = metadata.ino();
+            self.sequence = 0;
+            self.readings.clear();
+        }
+
+        let first = self.sequence.max(sequence.saturating_sub(capacity)) + 1;
+        if first <= sequence {
+            // Seqlock: the sampler zeroes the sequence of a slot before rewriting it and sets the new
+            // one after, so a slot is whole when it held its sequence in a copy and in a second copy
+            let before = read_slots(&mut file, first, sequence, capacity)?;
+            let after = read_slots(&mut file, first, sequence, capacity)?;
+            for (index, slot_sequence) in (first..=sequence).enumerate() {
+                let slot = &before[index * RING_SLOT_SIZE..(index + 1) * RING_SLOT_SIZE];
+                let check = &after[index * RING_SLOT_SIZE..index * RING_SLOT_SIZE + 8];
+                if u64::from_le_bytes(slot[0..8].try_into()?) != slot_sequence
+                    || u64::from_le_bytes(check.try_into()?) != slot_sequence {
+                    continue;
+                }
+                self.readings.push_back(RingReading::decode(slot)?);
+            }
+            while self.readings.len() > capacity as usize {
+                self.readings.pop_front();
+            }
+        }
+        self.sequence = sequence;
+        Ok(())
+    }
+}
+
+impl RingReading {
+    fn decode(slot: &[u8]) -> Result<RingReading, Box<dyn std::error::Error>> {
+        let mac_bytes = &slot[27..44];
+        let mac_length = mac_bytes.iter().position(|&byte| byte == 0).unwrap_or(mac_bytes.len());
+        Ok(RingReading {
+            timecode: i64::from_le_bytes(slot[8..16].try_into()?),
+            mac_address: String::from_utf8_lossy(&mac_bytes[..mac_length]).to_string(),
+            temperature: f32::from_le_bytes(slot[16..20].try_into()?) as f64,
+            light: u32::from_le_bytes(slot[20..24].try_into()?) as f64,
+            moisture: slot[26] as f64,
+            conductivity: u16::from_le_bytes(slot[24..26].try_into()?) as f64,
+        })
+    }
+}
+
+// Read the slots of the sequences first..=last; they are contiguous up to the end of the ring
+fn read_slots(file: &mut File, first: u64, last: u64, capacity: u64) -> std::io::Result<Vec<u8>> {
+    let mut bytes = vec![0u8; (last - first + 1) as usize * RING_SLOT_SIZE];
+    let mut filled = 0;
+    let mut slot_sequence = first;
+    while slot_sequence <= last {
+        let position = slot_sequence % capacity;
+        let count = (capacity - position).min(last - slot_sequence + 1);
+        let length = count as usize * RING_SLOT_SIZE;
+        file.seek(SeekFrom::Start((RING_HEADER_SIZE + position as usize * RING_SLOT_SIZE) as u64))?;
+        file.read_exact(&mut bytes[filled..filled + length])?;
+        filled += length;
+        slot_sequence += count;
+    }
+    Ok(bytes)
+}
+
 fn get_filtered_sensor_data(file_path: &str) -> Result<Vec<SensorData>, Box<dyn std::error::Error>> {
     let content = fs::read_to_string(file_path)?;
     if content.trim().is_empty() {
         return Ok(Vec::new());
     }
 
-    let raw_data: Value = serde_json::from_str(&content)?;
+    // The session log holds one JSON record per line; skip a line still being written
+    let sensor_data_list: Vec<Value> = content
+        .lines()
+        .filter_map(|line| serde_json::from_str(line).ok())
+        .collect();
     let twenty_four_hours_ago = Utc::now() - Duration::hours(24);
     let mut filtered_data = Vec::new();
 
-    if let Some(sensor_data_list) = raw_data.as_array() {
-        for entry in sensor_data_list {
-            if let Some(timestamp_str) = entry.get("Timestamp").and_then(|v| v.as_str()) {
-                if let Ok(timestamp) = NaiveDateTime::parse_from_str(timestamp_str, "%Y-%m-%d %H:%M:%S") {
-                    let timestamp_utc = Utc.from_local_datetime(&timestamp).unwrap();
-                    if timestamp_utc >= twenty_four_hours_ago {
-                        let sensor_data = SensorData {
-                            timestamp: timestamp_utc.to_string(),
-                            mac_address: entry.get("MAC").and_then(|v| v.as_str()).unwrap_or("").to_string(),
-                            temperature: entry.get("Temperature").and_then(|v| v.as_f64()).unwrap_or(0.0),
-                            light: entry.get("Light").and_then(|v| v.as_f64()).unwrap_or(0.0),
-                            moisture: entry.get("Moisture").and_then(|v| v.as_f64()).unwrap_or(0.0),
-                            conductivity: entry.get("Conductivity").and_then(|v| v.as_f64()).unwrap_or(0.0),
-                        };
-                        filtered_data.push(sensor_data);
-                    }
-                }
+    for entry in &sensor_data_list {
+        // Records carry timecodes, older session logs timestamp strings
+        let timestamp = match entry.get("Timestamp") {
+            Some(Value::Number(timecode)) => timecode
+                .as_i64()
+                .and_then(DateTime::from_timestamp_micros)
+                .map(|timestamp| timestamp.naive_utc()),
+            Some(Value::String(timestamp_str)) => NaiveDateTime::parse_from_str(timestamp_str, "%Y-%m-%d %H:%M:%S").ok(),
+            _ => None,
+        };
+        if let Some(timestamp) = timestamp {
+            let timestamp_utc = Utc.from_local_datetime(&timestamp).unwrap();
+            if timestamp_utc >= twenty_four_hours_ago {
+                let sensor_data = SensorData {
+                    timestamp: timestamp_utc.to_string(),
+                    mac_address: entry.get("MAC").and_then(|v| v.as_str()).unwrap_or("").to_string(),
+                    temperature: entry.get("Temperature").and_then(|v| v.as_f64()).unwrap_or(0.0),
+                    light: entry.get("Light").and_then(|v| v.as_f64()).unwrap_or(0.0),
+                    moisture: entry.get("Moisture").and_then(|v| v.as_f64()).unwrap_or(0.0),
+                    conductivity: entry.get("Conductivity").and_then(|v| v.as_f64()).unwrap_or(0.0),
+                };
+                filtered_data.push(sensor_data);
             }
         }
     }
@@ -1,10 +1,13 @@
 import os
-import json
+import sys
 import configparser
 from datetime import datetime, timedelta
 from flask import Flask, jsonify, render_template
 from flask_sqlalchemy import SQLAlchemy
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agt import data, ring, timecodes
+
 # Initialize Flask app and database
 app = Flask(__name__)
 app.debug = True
@@ -47,70 +50,50 @@ def api():
 def settings():
     return render_template('settings.html')
 
+# Follows the live reading ring written by the sampler, each poll only copies the new readings
+live_readings = ring.RingFollower()
+
 @app.route('/api/sensor_data', methods=['GET'])
 def get_sensor_data():
-    # Define the full path to the sesh.json file
-    file_path = os.path.join('/home/jerremy/Documents/GitHub/AGT/sesh.json')
-    sensor_data_list = []
-    
-    try:
-        with open(file_path, 'r') as f:
-            content = f.read().strip()
-            
-        if not content:
-            return jsonify([])  # Return an empty list if the file is empty
-            
-        raw_sensor_data = json.loads(content)
-        
-        if not raw_sensor_data:
-            return jsonify([])  # Return empty list if no data
-        
-        # Convert all timestamps and find the latest one
-        timestamped_data = []
-        latest_timestamp = None
-        
-        for data in raw_sensor_data:
-            try:
-                timestamp = datetime.strptime(data.get('Timestamp'), '%Y-%m-%d %H:%M:%S')
-                timestamped_data.append((timestamp, data))
-                
-                # Track the latest timestamp
-                if latest_timestamp is None or timestamp > latest_timestamp:
-                    latest_timestamp = timestamp
-            except (ValueError, TypeError):
-                continue
-        
-        if latest_timestamp is None:
-            return jsonify([])
-        
-        # Calculate 12 hours before the latest sample  
-        twelve_hours_before_latest = latest_timestamp - timedelta(hours=12)
-        
-        # Filter data from 12 hours before the latest sample
-        for timestamp, data in timestamped_data:
-            if timestamp >= twelve_hours_before_latest:
-                new_entry = {
-                    'timestamp': timestamp.isoformat(),
-                    'mac_address': data.get('MAC'),
-                    'temperature': data.get('Temperature'),
-                    'light': data.get('Light'),
-                    'moisture': data.get('Moisture'),
-                    'conductivity': data.get('Conductivity')
-                }
-                sensor_data_list.append(new_entry)
-        
-        # Sort by timestamp
-        sensor_data_list.sort(key=lambda x: x['timestamp'])
-        
-    except FileNotFoundError:
-        print(f"File not found: {file_path}")
-        return jsonify([])  # Return an empty list if the file doesn't exist
-    except json.JSONDecodeError:
-        print(f"Invalid JSON in file: {file_path}")
-        return jsonify([])  # Return an empty list if the JSON is invalid
-    
+    # Readings from 12 hours before the latest sample of the live session
+    window = live_readings.window(12 * 60 * 60)
+    if len(window):
+        # Timecodes are only formatted here, for the response
+        timestamps = timecodes.format_many(window['timestamp'], sep='T')
+        return jsonify([{
+            'timestamp': str(timestamp),
+            'mac_address': reading['MAC'],
+            'temperature': reading['Temperature'],
+            'light': reading['Light'],
+            'moisture': reading['Moisture'],
+            'conductivity': reading['Conductivity']
+        } for timestamp, reading in zip(timestamps, ring.to_records(window))])
+
+    # Without a live ring only the day folders holding the last 12 hours of readings are read
+    latest_day = data.latest_date()
+    if latest_day is None:
+        return jsonify([])  # Return an empty list if nothing was recorded yet
+
+    previous_day = datetime.strptime(latest_day, '%Y-%m-%d') - timedelta(days=1)
+    readings = data.load(previous_day, latest_day)
+    if readings.empty:
+        return jsonify([])  # Return empty list if no data
+
+    # Keep the readings from 12 hours before the latest sample
+    twelve_hours_before_latest = readings['Timestamp'].max() - timedelta(hours=12)
+    readings = readings[readings['Timestamp'] >= twelve_hours_before_latest]
+
+    sensor_data_list = [{
+        'timestamp': reading.Timestamp.isoformat(),
+        'mac_address': reading.MAC,
+        'temperature': reading.Temperature,
+        'light': reading.Light,
+        'moisture': reading.Moisture,
+        'conductivity': reading.Conductivity
+    } for reading in readings.itertuples(index=False)]
+
     # Return the sensor data as a JSON response
     return jsonify(sensor_data_list)
 
 if __name__ == "__main__":
-    app.run(host=HOST, port=PORT)
\ No newline at end of file
+    app.run(host=HOST, port=PORT)
\ No newline at end of file
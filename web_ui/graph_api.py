@@ -1,31 +1,30 @@
-import json
 import matplotlib.pyplot as plt
 import os
+import sys
 from datetime import datetime
-import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agt import timecodes
+from agt.ring import ReadingRing
 
 # Generate a graph of the sensor data and save it as an image file.
 
 def image_graph():
-    # Load the JSON data from the file
-    with open('/home/jerremy/Documents/GitHub/AGT/sesh.json') as f:
-        data = json.load(f)
-
-    # Convert timestamp to integer if necessary and filter the data for the last 12 hours
-    current_time = time.time() * 1e9  # convert current time to nanoseconds
-    twelve_hours_in_nanoseconds = 48 * 60 * 60 * 1e9
-    filtered_data = [
-    item for item in data
-    if current_time - int(item['Timestamp'][0]) <= twelve_hours_in_nanoseconds
-]
-
-
-    # Extract data from the JSON into separate lists
-    timestamps = [i['Timestamp'][0] for i in filtered_data]
-    temperatures = [i['Temperature'][0] for i in filtered_data]
-    moistures = [i['Moisture'][0] for i in filtered_data]
-    lights = [i['Light'][0] for i in filtered_data] 
-    conductivities = [i['Conductivity'][0] for i in filtered_data]
+    # Read the live session window from the reading ring written by the sampler
+    with ReadingRing() as ring:
+        _, readings = ring.read()
+
+    # Filter the data for the last 48 hours, ring timestamps are timecodes
+    current_time = timecodes.now()
+    forty_eight_hours = 48 * timecodes.PER_HOUR
+    filtered_data = readings[current_time - readings['timestamp'] <= forty_eight_hours]
+
+    # Extract the sensor columns of the readings
+    timestamps = timecodes.to_datetime64(filtered_data['timestamp'])
+    temperatures = filtered_data['temperature']
+    moistures = filtered_data['moisture']
+    lights = filtered_data['light']
+    conductivities = filtered_data['conductivity']
 
     # Create subplots for each sensor value
     fig, axs = plt.subplots(2, 2)